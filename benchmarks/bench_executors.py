@@ -0,0 +1,154 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+:samp:`Benchmark the executors of all strategies on synthetic collections`
+
+Measures throughput, peak memory and output size of the executors on collections generated by
+:class:`~benchmarks.synthetic.SyntheticGenerator`. Changelist and changedump executors are measured on version 1 of
+a collection, after version 0 was published. Each execution runs in a fresh process, so the peak resident set size
+is that of one execution. The results are written as json, label them to compare releases::
+
+    $ python3 -m benchmarks.bench_executors --sizes 10000 100000 --label 0.1.3 --output bench_0.1.3.json
+    $ python3 -m benchmarks.bench_executors --strategies resourcelist --sizes 10000000
+
+Dump executors zip a file per resource, they are measured on the collections of ``--dump-sizes``.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.synthetic import SyntheticGenerator
+from resourcesync.executor.changedump import IncrementalChangeDumpExecutor, NewChangeDumpExecutor
+from resourcesync.executor.changelist import IncrementalChangeListExecutor, NewChangeListExecutor
+from resourcesync.executor.resourcedump import ResourceDumpExecutor
+from resourcesync.executor.resourcelist import ResourceListExecutor
+from resourcesync.parameters.parameters import Parameters
+from resourcesync.utils.observe import MetricsObserver
+
+EXECUTORS = {
+    "ResourceListExecutor": ResourceListExecutor,
+    "NewChangeListExecutor": NewChangeListExecutor,
+    "IncrementalChangeListExecutor": IncrementalChangeListExecutor,
+    "ResourceDumpExecutor": ResourceDumpExecutor,
+    "NewChangeDumpExecutor": NewChangeDumpExecutor,
+    "IncrementalChangeDumpExecutor": IncrementalChangeDumpExecutor,
+}
+
+# strategy: (executor that publishes version 0 or None, measured executor, writes dumps)
+STRATEGIES = {
+    "resourcelist": (None, "ResourceListExecutor", False),
+    "new_changelist": ("ResourceListExecutor", "NewChangeListExecutor", False),
+    "inc_changelist": ("ResourceListExecutor", "IncrementalChangeListExecutor", False),
+    "resourcedump": (None, "ResourceDumpExecutor", True),
+    "new_changedump": ("NewChangeDumpExecutor", "NewChangeDumpExecutor", True),
+    "inc_changedump": ("NewChangeDumpExecutor", "IncrementalChangeDumpExecutor", True),
+}
+
+
+def directory_size(path) -> int:
+    size = 0
+    for dir_path, _, filenames in os.walk(path):
+        size += sum(os.path.getsize(os.path.join(dir_path, filename)) for filename in filenames)
+    return size
+
+
+def execute(executor_name, tmp_dir, count, version, with_files, max_items_in_list, ratios):
+    """
+    :samp:`Execute an executor on a synthetic collection, in a worker process`
+
+    :return: dict with the measurements
+    """
+    params = Parameters(resource_dir=tmp_dir, metadata_dir="metadata", url_prefix="http://example.com",
+                        max_items_in_list=max_items_in_list)
+    files_dir = os.path.join(tmp_dir, "files") if with_files else None
+    generator = SyntheticGenerator(params=params, count=count, version=version, files_dir=files_dir, **ratios)
+    metrics = MetricsObserver()
+    executor = EXECUTORS[executor_name](params, generator)
+    executor.register(metrics)
+    start = time.perf_counter()
+    executor.execute(generator.generate())
+    seconds = time.perf_counter() - start
+    report = metrics.report()
+    return {
+        "seconds": seconds,
+        "generated_per_second": (count + generator.created) / seconds,
+        "published_resources": report["resources"],
+        "steps": {step: times["wall_time"] for step, times in report["steps"].items()},
+        "peak_rss_bytes": report["peak_rss_bytes"],
+        "output_bytes": directory_size(params.abs_metadata_dir()),
+        "expected_changes": generator.expected_changes() if version > 0 else None,
+    }
+
+
+def in_process(func, *args):
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(func, *args).result()
+
+
+def run(strategies=tuple(STRATEGIES), sizes=(10000, 100000), dump_sizes=(1000,), max_items_in_list=50000,
+        ratios=None):
+    ratios = ratios or {}
+    results = []
+    print("%-15s %9s %9s %12s %10s %12s" % ("strategy", "resources", "seconds", "resources/s", "rss MB",
+                                          "output MB"))
+    for strategy in strategies:
+        setup_executor, executor_name, with_files = STRATEGIES[strategy]
+        for count in (dump_sizes if with_files else sizes):
+            tmp_dir = tempfile.mkdtemp(prefix="bench_executors_")
+            result = {"strategy": strategy, "executor": executor_name, "resources": count}
+            try:
+                version = 0
+                if setup_executor:
+                    in_process(execute, setup_executor, tmp_dir, count, 0, with_files, max_items_in_list, ratios)
+                    version = 1
+                result.update(in_process(execute, executor_name, tmp_dir, count, version, with_files,
+                                         max_items_in_list, ratios))
+            except Exception as err:
+                # a failing executor is a result too, the other strategies are still measured
+                result["error"] = "%s: %s" % (type(err).__name__, err)
+            finally:
+                shutil.rmtree(tmp_dir)
+            results.append(result)
+            if "error" in result:
+                print("%-15s %9d FAILED %s" % (strategy, count, result["error"]))
+                continue
+            print("%-15s %9d %9.3f %12.0f %10.1f %12.1f" % (strategy, count, result["seconds"],
+                                                          result["generated_per_second"],
+                                                          (result["peak_rss_bytes"] or 0) / 2**20,
+                                                          result["output_bytes"] / 2**20))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--strategies", nargs="+", choices=list(STRATEGIES), default=list(STRATEGIES),
+                        help="strategies to measure")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000],
+                        help="number of resources of the collections")
+    parser.add_argument("--dump-sizes", type=int, nargs="+", default=[1000],
+                        help="number of resources of the collections of dump strategies")
+    parser.add_argument("--max-items", type=int, default=50000, help="max_items_in_list")
+    parser.add_argument("--update-ratio", type=float, default=0.1, help="fraction of resources updated")
+    parser.add_argument("--delete-ratio", type=float, default=0.01, help="fraction of resources deleted")
+    parser.add_argument("--create-ratio", type=float, default=0.01, help="fraction of resources created")
+    parser.add_argument("--label", default=None, help="label of the results, i.e. the release measured")
+    parser.add_argument("--output", default="bench_executors.json", help="path of the json results")
+    args = parser.parse_args()
+    ratios = {"update_ratio": args.update_ratio, "delete_ratio": args.delete_ratio,
+              "create_ratio": args.create_ratio}
+    results = run(args.strategies, args.sizes, args.dump_sizes, args.max_items, ratios)
+    with open(args.output, "w") as file:
+        json.dump({"label": args.label, "date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                   "python": sys.version.split()[0], "platform": platform.platform(), "ratios": ratios,
+                   "max_items_in_list": args.max_items, "results": results}, file, indent=2)
+    print("Results written to %s" % args.output)
+
+
+if __name__ == "__main__":
+    main()
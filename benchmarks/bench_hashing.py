@@ -0,0 +1,82 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+:samp:`Benchmark file hashing on a synthetic tree of small and large files`
+
+Compares sequential :func:`~resourcesync.utils.defaults.md5_for_file` with the multi-algorithm, parallel
+:class:`~resourcesync.utils.defaults.FileHasher`::
+
+    $ python3 -m benchmarks.bench_hashing --small 2000 --large 4 --large-size 64
+
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from resourcesync.utils import defaults
+
+
+def create_tree(root, small, small_size, large, large_size):
+    filenames = []
+    for i in range(small):
+        sub_dir = os.path.join(root, "small", str(i % 16))
+        os.makedirs(sub_dir, exist_ok=True)
+        filename = os.path.join(sub_dir, "file_%d.bin" % i)
+        with open(filename, "wb") as f:
+            f.write(os.urandom(small_size))
+        filenames.append(filename)
+    os.makedirs(os.path.join(root, "large"), exist_ok=True)
+    for i in range(large):
+        filename = os.path.join(root, "large", "file_%d.bin" % i)
+        with open(filename, "wb") as f:
+            for _ in range(large_size):
+                f.write(os.urandom(2**20))
+        filenames.append(filename)
+    return filenames
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def run(small=2000, small_size=4096, large=4, large_size=64, workers=None):
+    root = tempfile.mkdtemp(prefix="bench_hashing_")
+    try:
+        filenames = create_tree(root, small, small_size, large, large_size)
+        total_mb = (small * small_size + large * large_size * 2**20) / 2**20
+        results = [
+            ("md5_for_file, sequential",
+             timed(lambda: [defaults.md5_for_file(f, block_size=2**14) for f in filenames])),
+            ("digests_for_file md5+sha256, sequential",
+             timed(lambda: [defaults.digests_for_file(f) for f in filenames])),
+        ]
+        with defaults.FileHasher(algorithms=("md5",), max_workers=workers) as hasher:
+            results.append(("FileHasher md5, parallel", timed(hasher.hash_files, filenames)))
+        with defaults.FileHasher(algorithms=("md5", "sha256"), max_workers=workers) as hasher:
+            results.append(("FileHasher md5+sha256, parallel", timed(hasher.hash_files, filenames)))
+
+        print("%d files, %.1f MiB" % (len(filenames), total_mb))
+        for name, seconds in results:
+            print("%-42s %8.3f s %10.1f MiB/s" % (name, seconds, total_mb / seconds))
+        return results
+    finally:
+        shutil.rmtree(root)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--small", type=int, default=2000, help="number of small files")
+    parser.add_argument("--small-size", type=int, default=4096, help="size of small files in bytes")
+    parser.add_argument("--large", type=int, default=4, help="number of large files")
+    parser.add_argument("--large-size", type=int, default=64, help="size of large files in MiB")
+    parser.add_argument("--workers", type=int, default=None, help="size of the thread pool")
+    args = parser.parse_args()
+    run(args.small, args.small_size, args.large, args.large_size, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+:samp:`Benchmark generators against a local stub server with network delay`
+
+Serves scaled-up versions of the recorded responses in `tests/test_oaipmh_generator_mock_responses.py` and
+`tests/test_elastic_generator_mock_responses.py` from a local HTTP server that delays each response by a latency
+and limits the bandwidth of the response bodies. Measures the end-to-end throughput of the
+:class:`~resourcesync.generators.oaipmh_generator.OAIPMHGenerator`, the
+:class:`~resourcesync.generators.solr_generator.SolrGenerator` and the
+:class:`~resourcesync.generators.elastic_generator.ElasticGenerator`::
+
+    $ python3 -m benchmarks.bench_replay --sizes 1000 10000 --latency 20 --bandwidth 1024
+
+There are no recorded Solr responses, the Solr stub answers cursor paged queries in the format the
+:class:`~resourcesync.generators.solr_generator.SolrGenerator` reads and serves the recorded OAI-PMH record as
+metadata record. Run from the root of the repository, the recorded responses are read from the tests package.
+"""
+import argparse
+import json
+import platform
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from tests.test_elastic_generator_mock_responses import elastic_mock_responses
+from tests.test_oaipmh_generator_mock_responses import mock_responses
+
+OAI_LIST_URL = "http://example.com/oai?verb=ListIdentifiers&set=test&metadataPrefix=oai_dc"
+OAI_RECORD_URL = "http://example.com/oai?verb=GetRecord&identifier=A&metadataPrefix=oai_dc"
+ELASTIC_SEARCH_URL = "http://example.com:9200/resync-test/resource/_search?scroll=2m&size=2"
+
+
+class OAIPMHFixture(object):
+    """
+    :samp:`ListIdentifiers and GetRecord responses for a collection of any size`
+
+    """
+    content_type = "text/xml"
+
+    def __init__(self, count, page_size=100):
+        self.count = count
+        self.page_size = page_size
+        list_response = mock_responses[0][OAI_LIST_URL].strip()
+        start = list_response.index("<header>")
+        end = list_response.rindex("</header>") + len("</header>")
+        self.list_head = list_response[:start]
+        self.list_tail = list_response[end:]
+        self.header = re.search(r"<header>.*?</header>", list_response, re.DOTALL).group(0)
+        self.record = mock_responses[0][OAI_RECORD_URL].strip()
+
+    def identifier(self, number) -> str:
+        return "rec-%d" % number
+
+    def list_identifiers(self, token):
+        page = int(token) if token else 0
+        first = page * self.page_size
+        last = min(first + self.page_size, self.count)
+        headers = [self.header.replace("<identifier>A</identifier>",
+                                       "<identifier>%s</identifier>" % self.identifier(number))
+                   for number in range(first, last)]
+        if last < self.count:
+            headers.append('<resumptionToken completeListSize="%d" cursor="%d">%d</resumptionToken>'
+                           % (self.count, first, page + 1))
+        return self.list_head + "\n    ".join(headers) + self.list_tail
+
+    def get_record(self, identifier):
+        return self.record.replace("<identifier>A</identifier>", "<identifier>%s</identifier>" % identifier) \
+            .replace('identifier="A"', 'identifier="%s"' % identifier)
+
+    def respond(self, method, path, query, body):
+        verb = query.get("verb")
+        if verb == "ListIdentifiers":
+            return 200, self.list_identifiers(query.get("resumptionToken"))
+        if verb == "GetRecord":
+            return 200, self.get_record(query["identifier"])
+        return 404, ""
+
+    def generator(self, base_url):
+        from resourcesync.generators.oaipmh_generator import OAIPMHGenerator
+        return OAIPMHGenerator(params={"oaipmh_base_url": base_url + "/oai", "oaipmh_set": "test",
+                                       "oaipmh_metadataprefix": "oai_dc"})
+
+
+class SolrFixture(OAIPMHFixture):
+    """
+    :samp:`Cursor paged Solr responses and metadata records for a collection of any size`
+
+    """
+    def respond(self, method, path, query, body):
+        if path == "/solr/select":
+            cursor = query.get("cursorMark", "*")
+            page = 0 if cursor == "*" else int(cursor)
+            first = page * self.page_size
+            docs = [{"id": self.identifier(number), "timestamp": "2017-06-14T10:00:00Z"}
+                    for number in range(first, min(first + self.page_size, self.count))]
+            # the cursor of the last page is the cursor that was asked for
+            next_cursor = str(page + 1) if docs else cursor
+            return 200, json.dumps({"response": {"numFound": self.count, "start": 0, "docs": docs},
+                                    "nextCursorMark": next_cursor})
+        if path.startswith("/record/"):
+            return 200, self.get_record(path[len("/record/"):])
+        return 404, ""
+
+    def generator(self, base_url):
+        from resourcesync.generators.solr_generator import SolrGenerator
+        return SolrGenerator(params={"solr_base_url": base_url + "/solr/select?q=", "solr_query": "*:*",
+                                     "solr_params": "&wt=json&rows=%d&cursorMark=_*_" % self.page_size,
+                                     "metadata_identifier": "id", "metadata_timestamp": "timestamp",
+                                     "metadata_disseminator": base_url + "/record/_ID_", "metadata_type": "oai_dc"})
+
+
+class ElasticFixture(object):
+    """
+    :samp:`Scan and scroll responses for a collection of any size`
+
+    """
+    content_type = "application/json"
+
+    def __init__(self, count, page_size=100):
+        self.count = count
+        self.page_size = page_size
+        self.search = json.loads(elastic_mock_responses[0][ELASTIC_SEARCH_URL])
+        self.hit = self.search["hits"]["hits"][0]
+
+    def hit_for(self, number):
+        source = dict(self.hit["_source"])
+        resync_id = "%064x" % number
+        source["resync_id"] = resync_id
+        source["location"] = {"type": "rel_path", "value": "data/foo/item_%d.json" % number}
+        source["ln"] = [dict(link, href={"type": "rel_path", "value": "data/foo/item_%d.pdf" % number})
+                        for link in source.get("ln") or []]
+        return dict(self.hit, _id=resync_id, _source=source)
+
+    def page(self, page, size):
+        first = page * size
+        response = dict(self.search, _scroll_id="%d:%d" % (page + 1, size))
+        response["hits"] = dict(self.search["hits"], total=self.count,
+                                hits=[self.hit_for(number) for number in range(first, min(first + size,
+                                                                                           self.count))])
+        return json.dumps(response)
+
+    def respond(self, method, path, query, body):
+        if method == "DELETE" and path.endswith("/_query"):
+            return 200, json.dumps({"_indices": {}})
+        if path == "/_search/scroll":
+            scroll_id = query.get("scroll_id") or body.decode("utf-8")
+            if scroll_id.startswith("{"):
+                scroll_id = json.loads(scroll_id)["scroll_id"]
+            page, size = scroll_id.split(":")
+            return 200, self.page(int(page), int(size))
+        if path.endswith("/_search"):
+            return 200, self.page(0, int(query.get("size", self.page_size)))
+        return 404, json.dumps({})
+
+    def generator(self, base_url):
+        from resourcesync.generators.elastic_generator import ElasticGenerator
+        host, port = urlsplit(base_url).netloc.split(":")
+        return ElasticGenerator(params={"resource_set": "foo-set", "strategy": 0, "elastic_host": host,
+                                        "elastic_port": int(port), "elastic_index": "resync-test",
+                                        "elastic_resource_doc_type": "resource",
+                                        "elastic_change_doc_type": "change", "url_prefix": "http://example.com",
+                                        "resource_root_dir": "tmp/dir", "max_items_in_list": self.page_size})
+
+
+FIXTURES = {"oaipmh": OAIPMHFixture, "solr": SolrFixture, "elastic": ElasticFixture}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.respond("GET")
+
+    def do_POST(self):
+        self.respond("POST")
+
+    def do_DELETE(self):
+        self.respond("DELETE")
+
+    def respond(self, method):
+        server = self.server
+        parts = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        status, text = server.fixture.respond(method, unquote(parts.path), query, body)
+        payload = text.encode("utf-8")
+        if server.latency:
+            time.sleep(server.latency)
+        self.send_response(status)
+        self.send_header("Content-Type", server.fixture.content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if server.bandwidth:
+            # send in slices of 10 milliseconds at the bandwidth
+            chunk = max(1, server.bandwidth // 100)
+            for start in range(0, len(payload), chunk):
+                self.wfile.write(payload[start:start + chunk])
+                time.sleep(min(chunk, len(payload) - start) / server.bandwidth)
+        else:
+            self.wfile.write(payload)
+        with server.lock:
+            server.requests += 1
+            server.bytes_sent += len(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    """
+    :samp:`A local HTTP server that serves a fixture with network delay`
+
+    """
+    daemon_threads = True
+
+    def __init__(self, fixture, latency=0.0, bandwidth=0):
+        """
+        :samp:`Initialization`
+
+        :param fixture: the fixture that answers requests
+        :param float latency: seconds each response is delayed
+        :param int bandwidth: bytes per second of response bodies, 0 for unlimited
+        """
+        HTTPServer.__init__(self, ("127.0.0.1", 0), StubHandler)
+        self.fixture = fixture
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+
+    @property
+    def base_url(self) -> str:
+        return "http://127.0.0.1:%d" % self.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+def measure(name, count, page_size, latency, bandwidth) -> dict:
+    fixture = FIXTURES[name](count, page_size=page_size)
+    with StubServer(fixture, latency=latency, bandwidth=bandwidth) as server:
+        generator = fixture.generator(server.base_url)
+        start = time.perf_counter()
+        resources = sum(1 for _ in generator.generate())
+        seconds = time.perf_counter() - start
+        return {"generator": name, "resources": resources, "seconds": seconds,
+                "resources_per_second": resources / seconds, "requests": server.requests,
+                "bytes": server.bytes_sent}
+
+
+def run(generators=tuple(FIXTURES), sizes=(1000,), page_size=100, latency=0.005, bandwidth=0):
+    results = []
+    print("%-9s %9s %9s %12s %9s %10s" % ("generator", "resources", "seconds", "resources/s", "requests", "MB"))
+    for name in generators:
+        for count in sizes:
+            result = measure(name, count, page_size, latency, bandwidth)
+            results.append(result)
+            print("%-9s %9d %9.3f %12.0f %9d %10.2f" % (name, result["resources"], result["seconds"],
+                                                       result["resources_per_second"], result["requests"],
+                                                       result["bytes"] / 2**20))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--generators", nargs="+", choices=list(FIXTURES), default=list(FIXTURES),
+                        help="generators to measure")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000], help="number of records served")
+    parser.add_argument("--page-size", type=int, default=100, help="records per page of list responses")
+    parser.add_argument("--latency", type=float, default=5, help="milliseconds each response is delayed")
+    parser.add_argument("--bandwidth", type=int, default=0, help="kilobytes per second, 0 for unlimited")
+    parser.add_argument("--label", default=None, help="label of the results, i.e. the release measured")
+    parser.add_argument("--output", default="bench_replay.json", help="path of the json results")
+    args = parser.parse_args()
+    results = run(args.generators, args.sizes, args.page_size, args.latency / 1000, args.bandwidth * 1024)
+    with open(args.output, "w") as file:
+        json.dump({"label": args.label, "date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                   "python": sys.version.split()[0], "platform": platform.platform(), "latency_ms": args.latency,
+                   "bandwidth_kb": args.bandwidth, "page_size": args.page_size, "results": results}, file, indent=2)
+    print("Results written to %s" % args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+:samp:`Benchmark sitemap serialization`
+
+Compares resync's element tree serialization with the
+:class:`~resourcesync.rsxml.sitemap_writer.SitemapWriter`, with and without pretty xml::
+
+    $ python3 -m benchmarks.bench_serializer --sizes 1000 10000 50000
+
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from resync import ChangeList, Resource, ResourceList
+
+from resourcesync.rsxml.sitemap_writer import SitemapWriter
+
+
+def create_sitemap(cls, size):
+    sitemap = cls()
+    sitemap.md_at = "2017-06-14T10:00:00Z"
+    sitemap.link_set(rel="up", href="http://example.com/.well-known/resourcesync")
+    for i in range(size):
+        resource = Resource(uri="http://example.com/resources/%d/file_%d.xml" % (i % 100, i),
+                            lastmod="2017-06-14T10:%02d:%02dZ" % (i // 60 % 60, i % 60),
+                            md5="%032x" % i, length=i, mime_type="application/xml")
+        if cls is ChangeList:
+            resource.change = ("created", "updated", "deleted")[i % 3]
+        sitemap.add(resource)
+    return sitemap
+
+
+def resync_write(sitemap, path, pretty_xml):
+    sitemap.pretty_xml = pretty_xml
+    sitemap.write(path)
+
+
+def fast_write(sitemap, path, pretty_xml):
+    SitemapWriter(pretty_xml=pretty_xml).write(sitemap, path)
+
+
+def timed(func, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def run(sizes=(1000, 10000, 50000), repeat=3):
+    tmp_dir = tempfile.mkdtemp(prefix="bench_serializer_")
+    results = []
+    try:
+        print("%-13s %7s %-7s %10s %10s %8s %s" % ("document", "entries", "pretty", "resync s", "fast s",
+                                                  "speedup", "same"))
+        for cls in (ResourceList, ChangeList):
+            for size in sizes:
+                sitemap = create_sitemap(cls, size)
+                for pretty_xml in (True, False):
+                    resync_path = os.path.join(tmp_dir, "resync.xml")
+                    fast_path = os.path.join(tmp_dir, "fast.xml")
+                    resync_seconds = timed(resync_write, sitemap, resync_path, pretty_xml, repeat=repeat)
+                    fast_seconds = timed(fast_write, sitemap, fast_path, pretty_xml, repeat=repeat)
+                    with open(resync_path, "rb") as resync_file, open(fast_path, "rb") as fast_file:
+                        same = resync_file.read() == fast_file.read()
+                    results.append((cls.__name__, size, pretty_xml, resync_seconds, fast_seconds, same))
+                    print("%-13s %7d %-7s %10.3f %10.3f %7.1fx %s" % (cls.__name__, size, pretty_xml, resync_seconds,
+                                                                     fast_seconds, resync_seconds / fast_seconds,
+                                                                     same))
+        return results
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="number of entries per document")
+    parser.add_argument("--repeat", type=int, default=3, help="best of this many runs")
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+:samp:`Synthetic collections for benchmarks`
+
+A :class:`SyntheticGenerator` generates a deterministic collection of any size, with urls spread over a directory
+tree, mixed mime types, links on a part of the resources and a version. Version 0 is the initial state of the
+collection. Compared to version 0 a later version updates, deletes and creates resources in the ratios given, so
+that changelist executors find a known amount of changes::
+
+    >>> generator = SyntheticGenerator(count=10000, version=1, update_ratio=0.1, delete_ratio=0.01)
+    >>> changes = generator.expected_changes()
+
+"""
+import os
+
+from resync import Resource
+
+from resourcesync.core.generator import Generator
+
+MIME_TYPES = ("application/xml", "text/html", "application/pdf", "image/jpeg", "text/plain")
+# every LINK_INTERVAL-th resource has links
+LINK_INTERVAL = 10
+# resources are assigned to buckets of changes by a multiplicative hash of their number and the version
+BUCKETS = 10000
+
+
+def bucket(number, version) -> int:
+    return (number * 2654435761 + version * 40503) % BUCKETS
+
+
+class SyntheticGenerator(Generator):
+    """
+    :samp:`Generates a synthetic collection`
+
+    """
+    def __init__(self, params=None, count=10000, version=0, update_ratio=0.1, delete_ratio=0.01, create_ratio=0.01,
+                 files_dir=None, file_size=256):
+        """
+        :samp:`Initialization`
+
+        :param params: :class:`~resourcesync.parameters.parameters.Parameters`, not used
+        :param int count: the amount of resources in version 0
+        :param int version: the version of the collection
+        :param float update_ratio: fraction of the resources of version 0 that is updated in later versions
+        :param float delete_ratio: fraction of the resources of version 0 that is deleted in later versions
+        :param float create_ratio: resources created in later versions, as a fraction of ``count``
+        :param str files_dir: if not None, a file is written in this directory for each resource and set as its
+            path, as dump executors need
+        :param int file_size: the size in bytes of the files written
+        """
+        Generator.__init__(self, params=params)
+        self.count = count
+        self.version = version
+        self.update_limit = int(update_ratio * BUCKETS)
+        self.delete_limit = int(delete_ratio * BUCKETS)
+        self.created = int(create_ratio * count) if version > 0 else 0
+        self.files_dir = files_dir
+        self.file_size = file_size
+
+    def change(self, number):
+        """
+        :samp:`The change of a resource of version 0 in this version`
+
+        :param int number: the number of the resource
+        :return: 'deleted', 'updated' or None
+        """
+        if self.version == 0:
+            return None
+        b = bucket(number, self.version)
+        if b < self.delete_limit:
+            return "deleted"
+        if b < self.delete_limit + self.update_limit:
+            return "updated"
+        return None
+
+    def expected_changes(self) -> dict:
+        """
+        :samp:`The changes of this version compared to version 0`
+
+        :return: dict with the amount of created, updated and deleted resources
+        """
+        changes = {"created": self.created, "updated": 0, "deleted": 0}
+        for number in range(self.count):
+            change = self.change(number)
+            if change:
+                changes[change] += 1
+        return changes
+
+    def resource(self, number, updated=False) -> Resource:
+        version = self.version if updated else 0
+        uri = "http://example.com/collection/%03d/%d/item_%d.xml" % (number % 997, number // 10000, number)
+        resource = Resource(uri=uri, lastmod="2017-06-%02dT10:%02d:%02dZ" % (14 + version % 14, number // 60 % 60,
+                                                                            number % 60),
+                            md5="%016x%016x" % (number, version), length=number % 100000 + 1,
+                            mime_type=MIME_TYPES[number % len(MIME_TYPES)])
+        if number % LINK_INTERVAL == 0:
+            resource.link_set(rel="describedby", href=uri[:-len(".xml")] + "/metadata.json", type="application/json")
+            resource.link_set(rel="alternate", href=uri[:-len(".xml")] + ".html", type="text/html")
+        if self.files_dir:
+            resource.path = self.write_file(number, version)
+        return resource
+
+    def write_file(self, number, version) -> str:
+        path = os.path.join(self.files_dir, "%03d" % (number % 997), "item_%d_%d.bin" % (number, version))
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as file:
+                file.write(b"%d %d " % (number, version) + b"x" * self.file_size)
+        return path
+
+    def generate(self):
+        for number in range(self.count):
+            change = self.change(number)
+            if change != "deleted":
+                yield self.resource(number, updated=change == "updated")
+        for number in range(self.count, self.count + self.created):
+            yield self.resource(number)
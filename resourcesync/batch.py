@@ -0,0 +1,227 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+:samp:`Publish many collections in parallel`
+
+A :class:`BatchPublisher` executes :class:`~resourcesync.resourcesync.ResourceSync` for a list of previously saved
+configurations, each collection in a worker process of its own. The
+:class:`~resourcesync.parameters.parameters.Parameters` are a singleton per process, so a worker loads the
+configuration of a collection without affecting the configurations of other collections. A collection that fails
+does not stop the publication of the other collections, its error is reported in the :class:`BatchReport`.
+
+The resources of a collection are provided by a generator factory: a callable, or the name of a callable as
+`module:name`, that is called with the parameters of the collection and returns a
+:class:`~resourcesync.core.generator.Generator`. Publish all saved configurations from the command line::
+
+    $ python3 -m resourcesync.batch --generator resourcesync.generators.eg_generator:EgGenerator
+
+or a selection of them::
+
+    $ python3 -m resourcesync.batch --generator mypackage.generators:collection_generator spam_config eggs_config
+
+"""
+import argparse
+import importlib
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from resourcesync.parameters.parameters import ParameterUtils, Parameters
+from resourcesync.resourcesync import ResourceSync
+from resourcesync.utils.observe import EventObserver
+
+LOG = logging.getLogger(__name__)
+
+
+class PublicationCounter(EventObserver):
+    """
+    :samp:`Counts the documents and resources published by an execution`
+
+    """
+    def __init__(self):
+        self.documents = 0
+        self.resources = 0
+
+    def accepts(self, event):
+        return getattr(event, "name", None) == "completed_document"
+
+    def inform_completed_document(self, *args, **kwargs):
+        self.documents += 1
+        sitemap_data = kwargs["sitemap_data"]
+        # indexes, capabilitylists and descriptions have no ordinal
+        if sitemap_data.ordinal >= 0:
+            self.resources += sitemap_data.resource_count
+
+
+class CollectionResult(object):
+    """
+    :samp:`The outcome of the publication of one collection`
+
+    """
+    def __init__(self, name, seconds=0.0, documents=0, resources=0, error=None):
+        """
+        :samp:`Initialization`
+
+        :param str name: the name of the configuration of the collection
+        :param float seconds: the duration of the publication
+        :param int documents: the amount of documents written
+        :param int resources: the amount of resources in resourcelists, changelists and dumps written
+        :param str error: description of the error if the publication failed, None otherwise
+        """
+        self.name = name
+        self.seconds = seconds
+        self.documents = documents
+        self.resources = resources
+        self.error = error
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+    def __str__(self):
+        outcome = "ok" if self.succeeded else "FAILED: " + self.error
+        return "%s, %.3f s, documents: %d, resources: %d, %s" \
+               % (self.name, self.seconds, self.documents, self.resources, outcome)
+
+
+class BatchReport(object):
+    """
+    :samp:`The outcome of the publication of a batch of collections`
+
+    """
+    def __init__(self, results, seconds):
+        """
+        :samp:`Initialization`
+
+        :param results: list of :class:`CollectionResult`, in the order of the configurations
+        :param float seconds: the wall time of the batch
+        """
+        self.results = results
+        self.seconds = seconds
+
+    @property
+    def failed(self) -> list:
+        return [result for result in self.results if not result.succeeded]
+
+    @property
+    def documents(self) -> int:
+        return sum(result.documents for result in self.results)
+
+    @property
+    def resources(self) -> int:
+        return sum(result.resources for result in self.results)
+
+    @property
+    def collection_seconds(self) -> float:
+        # the time the publication would have taken without parallel workers
+        return sum(result.seconds for result in self.results)
+
+    def __str__(self):
+        lines = [str(result) for result in self.results]
+        lines.append("%d collections, %d failed, documents: %d, resources: %d, wall time %.3f s, total time %.3f s"
+                     % (len(self.results), len(self.failed), self.documents, self.resources, self.seconds,
+                        self.collection_seconds))
+        return "\n".join(lines)
+
+
+def resolve_generator_factory(generator_factory):
+    """
+    :samp:`The callable that creates generators`
+
+    :param generator_factory: a callable, or the name of a callable as `module:name`
+    :return: the callable
+    """
+    if callable(generator_factory):
+        return generator_factory
+    module_name, _, name = generator_factory.partition(":")
+    if not name:
+        raise ValueError("Generator factory should be given as 'module:name'. Given: '%s'" % generator_factory)
+    factory = importlib.import_module(module_name)
+    for part in name.split("."):
+        factory = getattr(factory, part)
+    return factory
+
+
+def publish_collection(name, generator_factory) -> CollectionResult:
+    """
+    :samp:`Publish the collection of a saved configuration in the current process`
+
+    :param str name: the name of a previously saved configuration
+    :param generator_factory: a callable, or the name of a callable as `module:name`, that returns the generator
+        for the parameters of the collection
+    :return: :class:`CollectionResult`
+    """
+    result = CollectionResult(name)
+    counter = PublicationCounter()
+    start = time.perf_counter()
+    try:
+        # loading the configuration resets the parameters of this process
+        ParameterUtils.load_configuration(name)
+        resourcesync = ResourceSync(config_name=name)
+        resourcesync.generator = resolve_generator_factory(generator_factory)(params=resourcesync.params)
+        resourcesync.register(counter)
+        resourcesync.execute()
+    except Exception as err:
+        LOG.exception("Publication of collection %s failed", name)
+        result.error = "%s: %s" % (type(err).__name__, err)
+    finally:
+        Parameters.reset()
+    result.seconds = time.perf_counter() - start
+    result.documents = counter.documents
+    result.resources = counter.resources
+    return result
+
+
+class BatchPublisher(object):
+    """
+    :samp:`Publishes the collections of saved configurations in a process pool`
+
+    """
+    def __init__(self, generator_factory, max_workers=None):
+        """
+        :samp:`Initialization`
+
+        :param generator_factory: a callable, or the name of a callable as `module:name`, that is called with the
+            parameters of a collection and returns its :class:`~resourcesync.core.generator.Generator`. A callable
+            must be picklable, i.e. a class or a function at module level.
+        :param int max_workers: the amount of worker processes, if None the amount of processors
+        """
+        self.generator_factory = generator_factory
+        self.max_workers = max_workers if max_workers else os.cpu_count()
+
+    def publish(self, names=None) -> BatchReport:
+        """
+        :samp:`Publish collections`
+
+        :param names: names of previously saved configurations, if None all saved configurations
+        :return: :class:`BatchReport`
+        """
+        if names is None:
+            names = ParameterUtils.list_configurations()
+        start = time.perf_counter()
+        results = []
+        if names:
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(names))) as pool:
+                futures = [pool.submit(publish_collection, name, self.generator_factory) for name in names]
+                results = [future.result() for future in futures]
+        report = BatchReport(results, time.perf_counter() - start)
+        LOG.info("Published %d collections in %.3f s, %d failed", len(results), report.seconds, len(report.failed))
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish the collections of saved configurations in parallel.")
+    parser.add_argument("names", nargs="*", help="names of saved configurations, all configurations if none given")
+    parser.add_argument("--generator", required=True,
+                        help="the generator factory as 'module:name', called with the parameters of a collection")
+    parser.add_argument("--workers", type=int, default=None, help="the amount of worker processes")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    report = BatchPublisher(args.generator, max_workers=args.workers).publish(args.names or None)
+    print(report)
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
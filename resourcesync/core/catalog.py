@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+:samp:`Catalog of the documents in a metadata directory`
+
+The :class:`Catalog` keeps a manifest of the sitemaps and dumps in a metadata directory: their capability, ordinal,
+resource count, top-level md timestamps, index link, size and checksum. Executors record every document they write
+and consult the catalog instead of listing and parsing the metadata directory. Changes are kept in memory until
+:func:`Catalog.save` replaces the manifest, a JSON file in the metadata directory, atomically. Executors save the
+catalog after every build step.
+
+If the manifest does not exist, for instance in a metadata directory written by an earlier version, or if it was
+changed without being saved because the process died, it is built from the documents found in the metadata
+directory.
+"""
+import json
+import logging
+import os
+import re
+from glob import glob
+
+from resourcesync.rsxml.compression import DOCUMENT_PATTERNS
+from resourcesync.rsxml.sitemap_header import read_header
+from resourcesync.utils import defaults
+
+LOG = logging.getLogger(__name__)
+
+CATALOG_FILENAME = ".resourcesync-catalog.json"
+# exists while the catalog has changes that were not saved
+PENDING_FILENAME = CATALOG_FILENAME + ".pending"
+CATALOG_VERSION = 1
+SITEMAP = "sitemap"
+DUMP = "dump"
+DOCUMENT_NAME = re.compile(r"(?P<capability>[a-z-]+?)(?P<index>-index)?(?:_(?P<ordinal>\d+))?\.xml(?:\.gz)?$")
+DUMP_NAME = re.compile(r"(?P<prefix>cd|rd)_(?P<ordinal>\d+)\.zip$")
+DUMP_CAPABILITIES = {"cd": "changedump", "rd": "resourcedump"}
+
+
+class Catalog(object):
+    """
+    :samp:`Persistent manifest of documents in a metadata directory`
+
+    Documents are keyed by file name. Every entry is a dict with the keys `kind` ('sitemap' or 'dump'),
+    `capability`, `ordinal`, `sitemapindex`, `resource_count`, `md_at`, `md_completed`, `md_from`,
+    `md_until`, `index` (href of the rel="index" link), `md5`, `size` and `mtime_ns`. Recording a document only
+    takes its size and modification time, the `md5` is calculated by :func:`md5` when it is asked for. Executors may
+    annotate entries with other keys, which are kept until the document is written again.
+    """
+
+    def __init__(self, metadata_dir):
+        """
+        :samp:`Initialization`
+
+        Loads the manifest, or builds it if it does not exist. Documents that are changed or removed by other means
+        than the executors are not noticed, call :func:`rebuild` after such changes.
+
+        :param str metadata_dir: absolute path of the metadata directory
+        """
+        self.metadata_dir = metadata_dir
+        self.catalog_file = os.path.join(metadata_dir, CATALOG_FILENAME)
+        self.pending_file = os.path.join(metadata_dir, PENDING_FILENAME)
+        self.documents = {}
+        self.changed = False
+        if not self.load():
+            self.rebuild()
+
+    def load(self) -> bool:
+        """
+        :samp:`Load the manifest`
+
+        :return: **True** if a manifest of the current version was loaded, **False** otherwise
+        """
+        if os.path.exists(self.pending_file):
+            LOG.warning("Catalog %s has changes that were not saved", self.catalog_file)
+            return False
+        try:
+            with open(self.catalog_file, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            return False
+        except ValueError as err:
+            LOG.warning("Unreadable catalog %s: %s", self.catalog_file, err)
+            return False
+        if manifest.get("version") != CATALOG_VERSION:
+            return False
+        self.documents = manifest["documents"]
+        return True
+
+    def save(self):
+        """
+        :samp:`Atomically replace the manifest, if the catalog changed since it was loaded or saved`
+
+        """
+        if self.changed and os.path.isdir(self.metadata_dir):
+            manifest = {"version": CATALOG_VERSION, "documents": self.documents}
+            defaults.write_json_atomically(self.catalog_file, manifest)
+            if os.path.exists(self.pending_file):
+                os.remove(self.pending_file)
+            self.changed = False
+
+    def _changed(self):
+        if not self.changed and os.path.isdir(self.metadata_dir):
+            # if the process dies before the catalog is saved, the manifest is built again when it is loaded
+            open(self.pending_file, "w").close()
+        self.changed = True
+
+    def rebuild(self):
+        """
+        :samp:`Build the manifest from the documents in the metadata directory`
+
+        """
+        self.documents = {}
+        paths = [path for pattern in DOCUMENT_PATTERNS for path in glob(os.path.join(self.metadata_dir, pattern))]
+        for path in sorted(paths):
+            match = DOCUMENT_NAME.match(os.path.basename(path))
+            if match is None:
+                continue
+            try:
+                header = read_header(path)
+            except Exception as err:
+                LOG.warning("Not cataloged, cannot read %s: %s", path, err)
+                continue
+            capability = header.capability or match.group("capability")
+            ordinal = int(match.group("ordinal")) if match.group("ordinal") else -1
+            self._put(path, SITEMAP, capability, ordinal, header.sitemapindex, None, header.md, header.link_href("index"))
+        for path in sorted(glob(os.path.join(self.metadata_dir, "*.zip"))):
+            match = DUMP_NAME.match(os.path.basename(path))
+            if match is not None:
+                self._put(path, DUMP, DUMP_CAPABILITIES[match.group("prefix")], int(match.group("ordinal")), False,
+                          None, {}, None)
+        LOG.info("Rebuilt catalog of %d documents in %s", len(self.documents), self.metadata_dir)
+        self.changed = True
+        self.save()
+
+    def _put(self, path, kind, capability, ordinal, sitemapindex, resource_count, md, index):
+        st = os.stat(path)
+        self.documents[os.path.basename(path)] = {
+            "kind": kind,
+            "capability": capability,
+            "ordinal": ordinal,
+            "sitemapindex": sitemapindex,
+            "resource_count": resource_count,
+            "md_at": md.get("md_at"),
+            "md_completed": md.get("md_completed"),
+            "md_from": md.get("md_from"),
+            "md_until": md.get("md_until"),
+            "index": index,
+            "md5": None,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns
+        }
+        self._changed()
+
+    def md5(self, path):
+        """
+        :samp:`The md5 of a cataloged document`
+
+        The md5 is calculated once and kept until the size or modification time of the document changes.
+
+        :param str path: the local path of the document
+        :return: the hex md5 or None if the document is not cataloged
+        """
+        entry = self.entry(path)
+        if entry is None:
+            return None
+        st = os.stat(path)
+        if entry["md5"] is None or entry["size"] != st.st_size or entry.get("mtime_ns") != st.st_mtime_ns:
+            entry.update(md5=defaults.md5_for_file(path), size=st.st_size, mtime_ns=st.st_mtime_ns)
+            self._changed()
+        return entry["md5"]
+
+    def record_sitemap(self, path, sitemap, ordinal, resource_count=None):
+        """
+        :samp:`Record a sitemap that was written to path`
+
+        :param str path: the local path of the sitemap
+        :param sitemap: the sitemap document, or a :class:`~resourcesync.rsxml.sitemap_reader.SitemapHeader`
+        :param int ordinal: the ordinal of the sitemap, -1 for indexes and unnumbered documents
+        :param int resource_count: the amount of records in the sitemap
+        """
+        index_link = sitemap.link("index")
+        md = dict(sitemap.md)
+        md.setdefault("capability", getattr(sitemap, "capability_name", None))
+        self._put(path, SITEMAP, md["capability"], ordinal, bool(sitemap.sitemapindex), resource_count, md,
+                  index_link.get("href") if index_link else None)
+
+    def record_header(self, path, header):
+        """
+        :samp:`Record a new header of a cataloged sitemap`
+
+        The entries of the sitemap did not change, its resource count and annotations are kept.
+
+        :param str path: the local path of the sitemap
+        :param header: the new :class:`~resourcesync.rsxml.sitemap_reader.SitemapHeader`
+        """
+        entry = self.entry(path)
+        if entry is None:
+            self.record_sitemap(path, header, -1)
+            return
+        st = os.stat(path)
+        entry.update({key: header.md.get(key) for key in ("md_at", "md_completed", "md_from", "md_until")})
+        entry.update(index=header.link_href("index"), md5=None, size=st.st_size, mtime_ns=st.st_mtime_ns)
+        self._changed()
+
+    def annotate(self, path, **annotations):
+        """
+        :samp:`Add annotations to the entry of a cataloged document`
+
+        :param str path: the local path of the document
+        :param annotations: keys and values to add to the entry
+        """
+        if annotations:
+            self.documents[os.path.basename(path)].update(annotations)
+            self._changed()
+
+    def record_dump(self, path, capability, ordinal):
+        """
+        :samp:`Record a dump file that was written to path`
+
+        :param str path: the local path of the dump
+        :param str capability: the capability of the dump
+        :param int ordinal: the ordinal of the dump
+        """
+        self._put(path, DUMP, capability, ordinal, False, None, {}, None)
+
+    def remove(self, path):
+        """
+        :samp:`Remove the document at path from the catalog`
+
+        """
+        if self.documents.pop(os.path.basename(path), None) is not None:
+            self._changed()
+
+    def clear(self, kind=SITEMAP, keep=()):
+        """
+        :samp:`Remove all documents of the given kind from the catalog`
+
+        :param str kind: 'sitemap' or 'dump'
+        :param keep: paths of documents that are not removed
+        """
+        keep = {os.path.basename(path) for path in keep}
+        self.documents = {name: entry for name, entry in self.documents.items()
+                          if entry["kind"] != kind or name in keep}
+        self._changed()
+
+    def entry(self, path) -> dict:
+        return self.documents.get(os.path.basename(path))
+
+    def paths(self, capability, kind=SITEMAP) -> [str]:
+        """
+        :samp:`Sorted paths of the numbered documents with the given capability`
+
+        :param str capability: the capability, i.e. 'resourcelist'
+        :param str kind: 'sitemap' or 'dump'
+        :return: list of absolute paths, sorted by file name
+        """
+        return [os.path.join(self.metadata_dir, name) for name, entry in sorted(self.documents.items())
+                if entry["kind"] == kind and entry["capability"] == capability and entry["ordinal"] >= 0
+                and not entry["sitemapindex"]]
+
+    def index_path(self, capability):
+        """
+        :samp:`Path of the sitemapindex with the given capability`
+
+        :param str capability: the capability, i.e. 'resourcelist'
+        :return: the absolute path of the index or None if there is no index
+        """
+        for name, entry in self.documents.items():
+            if entry["kind"] == SITEMAP and entry["capability"] == capability and entry["sitemapindex"]:
+                return os.path.join(self.metadata_dir, name)
+        return None
+
+    def last_ordinal(self, capability) -> int:
+        """
+        :samp:`The highest ordinal of the sitemaps with the given capability`
+
+        :param str capability: the capability, i.e. 'resourcelist'
+        :return: the ordinal or -1 if there are no numbered sitemaps with this capability
+        """
+        ordinals = [entry["ordinal"] for entry in self.documents.values()
+                    if entry["kind"] == SITEMAP and entry["capability"] == capability and not entry["sitemapindex"]]
+        return max(ordinals, default=-1)
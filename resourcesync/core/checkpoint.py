@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+:samp:`Checkpoints of long executions`
+
+A :class:`Checkpoint` records the progress of an execution in the metadata directory: the documents completed so
+far, the amount of resources they hold and the position of the generator after the last of them. An execution that
+is interrupted can be resumed from its checkpoint, without generating the completed documents again.
+"""
+import json
+import logging
+import os
+
+from resourcesync.utils import defaults
+
+LOG = logging.getLogger(__name__)
+
+CHECKPOINT_FILENAME = ".resourcesync-checkpoint.json"
+
+
+class Checkpoint(object):
+    """
+    :samp:`Progress of an execution`
+
+    """
+    def __init__(self, path, capability, date_start_processing):
+        """
+        :samp:`Initialization`
+
+        :param str path: the local path of the checkpoint file
+        :param str capability: the capability of the documents, i.e. 'resourcelist'
+        :param str date_start_processing: the start date of the execution
+        """
+        self.path = path
+        self.capability = capability
+        self.date_start_processing = date_start_processing
+        # ordinal of the last completed document
+        self.ordinal = -1
+        # amount of resources in completed documents
+        self.resource_count = 0
+        # position of the generator after the last resource of the completed documents
+        self.resume_token = None
+        # dicts with file_name, ordinal, resource_count, doc_start and doc_end of completed documents
+        self.documents = []
+
+    @staticmethod
+    def load(path, capability):
+        """
+        :samp:`Load the checkpoint at path`
+
+        :param str path: the local path of the checkpoint file
+        :param str capability: the expected capability
+        :return: the :class:`Checkpoint` or None if there is no checkpoint of the expected capability
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            return None
+        except ValueError as err:
+            LOG.warning("Ignoring unreadable checkpoint %s: %s", path, err)
+            return None
+        if state.get("capability") != capability:
+            LOG.warning("Ignoring checkpoint of %s executions in %s", state.get("capability"), path)
+            return None
+        checkpoint = Checkpoint(path, capability, state["date_start_processing"])
+        checkpoint.ordinal = state["ordinal"]
+        checkpoint.resource_count = state["resource_count"]
+        checkpoint.resume_token = state["resume_token"]
+        checkpoint.documents = state["documents"]
+        return checkpoint
+
+    def record(self, file_name, ordinal, resource_count, document_resource_count, resume_token=None,
+               doc_start=None, doc_end=None):
+        """
+        :samp:`Record a completed document and save the checkpoint`
+
+        :param str file_name: file name of the document
+        :param int ordinal: ordinal of the document
+        :param int resource_count: amount of resources in this and all previous documents
+        :param int document_resource_count: amount of resources in this document
+        :param resume_token: position of the generator after the last resource of the document
+        :param str doc_start: start date of the document
+        :param str doc_end: completion date of the document
+        """
+        self.ordinal = ordinal
+        self.resource_count = resource_count
+        self.resume_token = resume_token
+        self.documents.append({"file_name": file_name, "ordinal": ordinal, "resource_count": document_resource_count,
+                               "doc_start": doc_start, "doc_end": doc_end})
+        self.save()
+
+    def save(self):
+        defaults.write_json_atomically(self.path, {
+            "capability": self.capability,
+            "date_start_processing": self.date_start_processing,
+            "ordinal": self.ordinal,
+            "resource_count": self.resource_count,
+            "resume_token": self.resume_token,
+            "documents": self.documents
+        })
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -2,8 +2,9 @@
 
 import logging
 import os
-import re
+import time
 from abc import ABCMeta, abstractmethod
+from contextlib import contextmanager
 from enum import Enum
 from glob import glob
 
@@ -11,10 +12,19 @@ from resync import CapabilityList
 from resync import Resource
 from resync import SourceDescription
 from resync.list_base_with_index import ListBaseWithIndex
-from resync.sitemap import Sitemap
 
+from resourcesync.core.catalog import Catalog
+from resourcesync.core.generator import Generator
+from resourcesync.core.publication import StagedPublication
+from resourcesync.core.sink import DocumentSink, ProcessPoolDocumentSink, write_sitemap
+from resourcesync.core.validation import ResourceValidator
+from resourcesync.parameters.derived import DerivedParameters
 from resourcesync.parameters.parameters import Parameters
+from resourcesync.rsxml.compression import DOCUMENT_PATTERNS, GZIP_XML_EXTENSION, XML_EXTENSION
+from resourcesync.rsxml.sitemap_header import append_entries, read_header, write_header
+from resourcesync.rsxml.sitemap_reader import SitemapReader
 from resourcesync.utils.observe import Observable, ObserverInterruptException
+from resourcesync.utils.profiling import DEFAULT_PROFILE_DIR, StepProfiler
 from resourcesync.utils import defaults
 from resourcesync.parameters.enum import Capability
 
@@ -53,12 +63,22 @@ class ExecutorEvent(Enum):
     created_resource = 3
     """
     ``3`` ``inform`` :samp:`The metadata for a resource was created`
+
+    Opt-in, only delivered to observers that accept it by name.
     """
     # common mid-level events
     completed_document = 10
     """
     ``10`` ``inform`` :samp:`A sitemap document was completed`
     """
+    step_start = 11
+    """
+    ``11`` ``inform`` :samp:`A build step was started`
+    """
+    step_end = 12
+    """
+    ``12`` ``inform`` :samp:`A build step did end`
+    """
     # common high-level events
     found_changes = 20
     """
@@ -78,6 +98,41 @@ class ExecutorEvent(Enum):
     ``100`` ``confirm`` :samp:`Files in metadata directory will be erased`
     """
 
+    @property
+    def is_opt_in(self) -> bool:
+        # fired for every resource, see resourcesync.utils.observe.is_opt_in
+        return self is ExecutorEvent.created_resource
+
+
+class BuildStep(Enum):
+    """
+    :samp:`The build steps of an execution, as measured by` :func:`Executor.build_step`
+    """
+    prepare = 1
+    """
+    ``1`` :func:`Executor.prepare_metadata_dir`
+    """
+    generate = 2
+    """
+    ``2`` :func:`Executor.generate_rs_documents`, including writing the documents
+    """
+    post_process = 3
+    """
+    ``3`` :func:`Executor.post_process_documents`
+    """
+    index = 4
+    """
+    ``4`` :func:`Executor.create_index`
+    """
+    capabilitylist = 5
+    """
+    ``5`` :func:`Executor.create_capabilitylist`
+    """
+    description = 6
+    """
+    ``6`` :func:`Executor.update_resource_sync`
+    """
+
 
 class SitemapData(object):
     """
@@ -120,7 +175,10 @@ class Executor(Observable, metaclass=ABCMeta):
     and :func:`create_index`. Steps :func:`create_capabilitylist` and :func:`update_resource_sync` are not abstract -
     they can safely be done by this :class:`Executor`.
     """
-    def __init__(self, parameters: Parameters=None):
+    # executors that build on previously published documents stage a copy of them
+    stages_previous_documents = True
+
+    def __init__(self, parameters: Parameters=None, generator: Generator=None):
         """
         :samp:`Initialization`
 
@@ -129,10 +187,17 @@ class Executor(Observable, metaclass=ABCMeta):
         configuration found under :func:`~rspub.core.config.Configurations.current_configuration_name`.
 
         :param parameters: :class:`~rspub.core.rs_paras.RsParameters` for execution
+        :param generator: the :class:`~resourcesync.core.generator.Generator` that provides the resource metadata
         """
 
         Observable.__init__(self)
         self.param = parameters if parameters else Parameters()
+        self.generator = generator
+        self.document_sink = DocumentSink(self.save_sitemap)
+        self._catalog = None
+        self._derived = None
+        self.validator = None
+        self.profiler = None
         self.passes_resource_gate = None
         self.date_start_processing = None
         self.date_end_processing = None
@@ -163,21 +228,96 @@ class Executor(Observable, metaclass=ABCMeta):
          instances
         """
         self.date_start_processing = defaults.w3c_now()
+        self._derived = None
+        self.validator = ResourceValidator(self.param.validation_mode)
         self.observers_inform(self, ExecutorEvent.execution_start, date_start_processing=self.date_start_processing)
-        if not os.path.exists(self.param.abs_metadata_dir()):
-            os.makedirs(self.param.abs_metadata_dir())
+        self.start_profiling()
+        try:
+            with self.open_publication():
+                if not os.path.exists(self.param.abs_metadata_dir()):
+                    os.makedirs(self.param.abs_metadata_dir())
+
+                with self.build_step(BuildStep.prepare):
+                    self.prepare_metadata_dir()
+                with self.build_step(BuildStep.generate), self.open_document_sink():
+                    sitemap_data_iter = self.generate_rs_documents(resource_metadata)
+                with self.build_step(BuildStep.post_process):
+                    self.post_process_documents(sitemap_data_iter)
+                self.date_end_processing = defaults.w3c_now()
+                with self.build_step(BuildStep.index):
+                    self.create_index(sitemap_data_iter)
+
+                with self.build_step(BuildStep.capabilitylist):
+                    capabilitylist_data = self.create_capabilitylist()
+                with self.build_step(BuildStep.description):
+                    self.update_resource_sync(capabilitylist_data)
+        finally:
+            self.profiler = None
+
+        self.validator.report()
+        self.observers_inform(self, ExecutorEvent.execution_end, date_end_processing = self.date_end_processing,
+                              new_sitemaps=sitemap_data_iter, validation=self.validator.summary())
+        self.flush_observers()
+
+    @contextmanager
+    def build_step(self, step):
+        """
+        :samp:`Measure a build step`
 
-        self.prepare_metadata_dir()
-        sitemap_data_iter = self.generate_rs_documents(resource_metadata)
-        self.post_process_documents(sitemap_data_iter)
-        self.date_end_processing = defaults.w3c_now()
-        self.create_index(sitemap_data_iter)
+        Fires :attr:`ExecutorEvent.step_start` when the build step starts and :attr:`ExecutorEvent.step_end`, with
+        the wall time and processor time of the step in seconds, when it ends without error.
 
-        capabilitylist_data = self.create_capabilitylist()
-        self.update_resource_sync(capabilitylist_data)
+        If profiling, the build step is profiled, see :func:`profile`. The catalog is saved when the build step ends,
+        also if it ends with an error.
 
-        self.observers_inform(self, ExecutorEvent.execution_end, date_end_processing = self.date_end_processing,
-                              new_sitemaps=sitemap_data_iter)
+        :param step: the :class:`BuildStep`
+        """
+        with self.profile(step.name), self.saving_catalog():
+            if not (self.has_observers(ExecutorEvent.step_start) or self.has_observers(ExecutorEvent.step_end)):
+                yield
+                return
+
+            self.observers_inform(self, ExecutorEvent.step_start, step=step)
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            yield
+            self.observers_inform(self, ExecutorEvent.step_end, step=step,
+                                  wall_time=time.perf_counter() - wall_start, cpu_time=time.process_time() - cpu_start)
+
+    @contextmanager
+    def saving_catalog(self):
+        try:
+            yield
+        finally:
+            if self._catalog is not None:
+                self._catalog.save()
+
+    def start_profiling(self):
+        """
+        :samp:`Start profiling the steps of an execution`
+
+        Does nothing if :param:`is_profiling` is **False** or profiling has started. The profiles of an execution
+        are written to the history directory, or to :data:`~resourcesync.utils.profiling.DEFAULT_PROFILE_DIR`, with the
+        start time of profiling as prefix.
+        """
+        if not self.param.is_profiling or self.profiler is not None:
+            return
+        directory = self.param.abs_history_dir() or DEFAULT_PROFILE_DIR
+        self.profiler = StepProfiler(directory, time.strftime("%Y%m%dT%H%M%S", time.gmtime()))
+
+    @contextmanager
+    def profile(self, name):
+        """
+        :samp:`Profile a step if profiling has started`
+
+        :param str name: the name of the step, used in the file names of the profile
+        :return: a context manager
+        """
+        if self.profiler is None:
+            yield
+        else:
+            with self.profiler.profile(name):
+                yield
 
     # # Execution steps - start
     def prepare_metadata_dir(self):
@@ -228,20 +368,20 @@ class Executor(Observable, metaclass=ABCMeta):
 
         :return: :class:`SitemapData` over the newly created capabilitylist
         """
-        capabilitylist_path = self.param.abs_metadata_path("capabilitylist.xml")
-        if os.path.exists(capabilitylist_path) and self.param.is_saving_sitemaps:
-            os.remove(capabilitylist_path)
+        capabilitylist_path = self.derived().capabilitylist_path
+        if self.param.is_saving_sitemaps:
+            self.remove_document(capabilitylist_path)
 
         doc_types = ["resourcelist", "changelist", "resourcedump", "changedump"]
         capabilitylist = CapabilityList()
         for doc_type in doc_types:
-            index_path = self.param.abs_metadata_path(doc_type + "-index.xml")
-            if os.path.exists(index_path):
-                capabilitylist.add(Resource(uri=self.param.uri_from_path(index_path), capability=doc_type))
+            index_path = self.catalog().index_path(doc_type)
+            if index_path is not None:
+                capabilitylist.add(Resource(uri=self.derived().uri_from_path(index_path), capability=doc_type))
             else:
-                doc_list_files = sorted(glob(self.param.abs_metadata_path(doc_type + "_*.xml")))
+                doc_list_files = self.catalog().paths(doc_type)
                 for doc_list in doc_list_files:
-                    capabilitylist.add(Resource(uri=self.param.uri_from_path(doc_list), capability=doc_type))
+                    capabilitylist.add(Resource(uri=self.derived().uri_from_path(doc_list), capability=doc_type))
 
         return self.finish_sitemap(-1, capabilitylist)
 
@@ -262,7 +402,7 @@ class Executor(Observable, metaclass=ABCMeta):
 
         src_description.add(Resource(uri=capabilitylist_data.uri, capability=Capability.capabilitylist.name),
                             replace=True)
-        sitemap_data = SitemapData(len(src_description), -1, self.param.description_url(), src_desc_path,
+        sitemap_data = SitemapData(len(src_description), -1, self.derived().description_url, src_desc_path,
                                    Capability.description.name)
         if self.param.is_saving_sitemaps:
             self.save_sitemap(src_description, src_desc_path)
@@ -272,85 +412,141 @@ class Executor(Observable, metaclass=ABCMeta):
         return sitemap_data
     # # Execution steps - end
 
-    def clear_metadata_dir(self):
+    def clear_metadata_dir(self, keep=()):
+        """
+        :samp:`Remove sitemaps and the description from the metadata directory`
+
+        :param keep: paths of sitemaps that are not removed
+        """
         ok = self.observers_confirm(self, ExecutorEvent.clear_metadata_directory, metadata_dir=self.param.abs_metadata_dir())
         if not ok:
             raise ObserverInterruptException("Process interrupted by observer: event: %s, metadata directory: %s"
                                              % (ExecutorEvent.clear_metadata_directory, self.param.abs_metadata_dir()))
-        xml_files = glob(self.param.abs_metadata_path("*.xml"))
-        for xml_file in xml_files:
-            os.remove(xml_file)
+        keep = set(keep)
+        for pattern in DOCUMENT_PATTERNS:
+            for xml_file in glob(self.param.abs_metadata_path(pattern)):
+                if xml_file not in keep:
+                    os.remove(xml_file)
+        self.catalog().clear(keep=keep)
 
         wellknown = os.path.join(self.param.abs_metadata_dir(), WELL_KNOWN_PATH)
         if os.path.exists(wellknown):
             os.remove(wellknown)
 
+    @contextmanager
+    def open_publication(self):
+        """
+        :samp:`Stage documents for the duration of the context`
+
+        If :param:`is_staging_publication` is **True**, documents are written to a staging directory within the
+        context and published when the context exits without error. Paths of documents, as in :class:`SitemapData`,
+        are in the staging directory.
+        """
+        if not self.param.is_staging_publication or not self.param.is_saving_sitemaps:
+            yield
+            return
+
+        parameters = self.param
+        publication = StagedPublication(parameters, copy_documents=self.stages_previous_documents)
+        self.param = publication.parameters
+        self._catalog = None
+        try:
+            yield
+        except BaseException:
+            publication.discard()
+            raise
+        finally:
+            self.param = parameters
+            self._catalog = None
+        publication.publish()
+
+    @contextmanager
+    def open_document_sink(self):
+        """
+        :samp:`Write documents in worker processes for the duration of the context`
+
+        If :param:`max_serialization_workers` is greater than 0, documents finished within the context are
+        serialized and written by a process pool. All documents are written when the context exits.
+        """
+        if self.param.max_serialization_workers < 1 or not self.param.is_saving_sitemaps:
+            yield self.document_sink
+            return
+
+        synchronous_sink = self.document_sink
+        self.document_sink = ProcessPoolDocumentSink(self.param.max_serialization_workers,
+                                                     writer_options=self.writer_options())
+        try:
+            with self.document_sink:
+                yield self.document_sink
+        finally:
+            self.document_sink = synchronous_sink
+
     def resource_generator(self) -> iter:
+        """
+        :samp:`Count and validate resources`
+
+        Resources are validated according to :param:`validation_mode`, violations are reported at the end of the
+        execution.
+
+        :return: function that takes an iter over resources and the count of preceding resources, and returns an
+            iter over (count, resource)
+        """
+        if self.validator is None:
+            self.validator = ResourceValidator(self.param.validation_mode)
+        validate = self.validator.validate
+        if not self.has_observers(ExecutorEvent.created_resource):
+            return validate
 
         def generator(resource_metadata: [Resource], count=0) -> [int, Resource]:
-            for res in resource_metadata:
-                if not isinstance(res, Resource):
-                    LOG.warning("Resource metadata is not of type Resource. Received type: %s" % type(res))
-                    #filename = str(filename)
-
-                count += 1
-                if not res.length:
-                    LOG.warning("Resource %s does not have the mandatory parameter length." % count)
-                if not res.md5:
-                    LOG.warning("Resource %s does not have the mandatory parameter md5." % count)
-                if not res.lastmod:
-                    LOG.warning("Resource %s does not have the mandatory parameter lastmod." % count)
-                if not res.mime_type:
-                    LOG.warning("Resource %s does not have the mandatory parameter mimetype." % count)
-                yield count, res
-
-                #file = os.path.abspath(filename)
-                #if not os.path.exists(file):
-                #    LOG.warning("File does not exist: %s" % file)
-                #elif os.path.isdir(file):
-                #    for cr, rsc in generator(self.walk_directories(file), count=count):
-                #        yield cr, rsc
-                #        count = cr
-                #elif os.path.isfile(file):
-                #    count += 1
-                #    path = os.path.relpath(file, self.param.resource_dir)
-                #    uri = self.param.url_prefix + defaults.sanitize_url_path(path)
-                #    stat = os.stat(file)
-                #    resource = Resource(uri=uri, length=stat.st_size,
-                #                        lastmod=defaults.w3c_datetime(stat.st_ctime),
-                #                        md5=defaults.md5_for_file(file),
-                #                        mime_type=defaults.mime_type(file))
-                #    yield count, resource
-                #    self.observers_inform(self, ExecutorEvent.created_resource, resource=resource,
-                #                          count=count, file=file)
-                #else:
-                #    LOG.warning("Not a regular file: %s" % file)
+            for count, resource in validate(resource_metadata, count=count):
+                self.observers_inform(self, ExecutorEvent.created_resource, resource=resource, count=count)
+                yield count, resource
 
         return generator
 
-    """
-    def walk_directories(self, *directories) -> [str]:
-        for directory in directories:
-            abs_dir = os.path.abspath(directory)
-            self.observers_inform(self, ExecutorEvent.start_file_search, directory=abs_dir)
-            for root, _directories, _filenames in os.walk(abs_dir):
-                for filename in _filenames:
-                    file = os.path.join(root, filename)
-                    yield file
-    """
+    def generator_resume_token(self):
+        """
+        :samp:`The position of the generator after the last resource it generated`
+
+        :return: the token returned by :func:`~resourcesync.core.generator.Generator.resume_token` or None
+        """
+        return None if self.generator is None else self.generator.resume_token()
+
+    def generator_reports_changes(self):
+        """
+        :samp:`Does the generator report created, updated and deleted resources`
+
+        :return: **True** if the generator sets the change of the resources it generates, **False** otherwise
+        """
+        return self.generator is not None and self.generator.reports_changes
+
+    def catalog(self) -> Catalog:
+        """
+        :samp:`The catalog of documents in the metadata directory`
+
+        :return: the :class:`~resourcesync.core.catalog.Catalog` of the current metadata directory
+        """
+        metadata_dir = self.param.abs_metadata_dir()
+        if self._catalog is None or self._catalog.metadata_dir != metadata_dir:
+            self._catalog = Catalog(metadata_dir)
+        return self._catalog
+
+    def derived(self) -> DerivedParameters:
+        """
+        :samp:`The derived parameters of the current execution`
+
+        :return: :class:`~resourcesync.parameters.derived.DerivedParameters`, calculated once per execution
+        """
+        if self._derived is None or self._derived.parameters is not self.param:
+            self._derived = self.param.derived()
+        return self._derived
 
     def find_ordinal(self, capability):
-        rs_files = sorted(glob(self.param.abs_metadata_path(capability + "_*.xml")))
-        if len(rs_files) == 0:
-            return -1
-        else:
-            filename = os.path.basename(rs_files[len(rs_files) - 1])
-            digits = re.findall("\d+", filename)
-            return int(digits[0]) if len(digits) > 0 else 0
+        return self.catalog().last_ordinal(capability)
 
     def format_ordinal(self, ordinal):
         # prepends '_' before zfill to distinguish between indexes (*list-index.xml) and regular lists (*list_001.xml)
-        return "_" + str(ordinal).zfill(self.param.zero_fill_filename)
+        return "_" + str(ordinal).zfill(self.derived().zero_fill_filename)
 
     def finish_sitemap(self, ordinal, sitemap, doc_start=None, doc_end=None) -> SitemapData:
         capability_name = sitemap.capability_name
@@ -360,44 +556,127 @@ class Executor(Observable, metaclass=ABCMeta):
         elif ordinal >= 0:
             file_name += self.format_ordinal(ordinal)
 
-        file_name += ".xml"
-
-        path = self.param.abs_metadata_path(file_name)
-        url = self.param.uri_from_path(path)
+        derived = self.derived()
+        path = derived.abs_document_path(file_name)
+        if derived.is_saving_sitemaps:
+            # a document written before the compression level changed has the other extension
+            for extension in (XML_EXTENSION, GZIP_XML_EXTENSION):
+                if not path.endswith(extension):
+                    self.remove_document(derived.abs_metadata_path(file_name + extension))
+        url = derived.uri_from_path(path)
         sitemap.link_set(rel="up", href=self.current_rel_up_for(sitemap))
         sitemap_data = SitemapData(len(sitemap), ordinal, url, path, capability_name)
         sitemap_data.doc_start = doc_start
         sitemap_data.doc_end = doc_end if doc_end else defaults.w3c_now()
 
-        if self.param.is_saving_sitemaps:
-            sitemap.pretty_xml = self.param.is_saving_pretty_xml
-            self.save_sitemap(sitemap, path)
+        def document_saved():
             sitemap_data.document_saved = True
+            self.catalog().record_sitemap(path, sitemap, ordinal, len(sitemap))
+            self.on_document_saved(sitemap_data)
+            self.observers_inform(self, ExecutorEvent.completed_document, document=sitemap,
+                                  sitemap_data=sitemap_data)
+
+        if derived.is_saving_sitemaps:
+            # completed_document is fired when the sink has written the document
+            self.document_sink.submit(sitemap, path, on_saved=document_saved)
+        else:
+            self.observers_inform(self, ExecutorEvent.completed_document, document=sitemap,
+                                  sitemap_data=sitemap_data)
+        return sitemap_data
+
+    def append_sitemap(self, ordinal, path, sitemap, resource_count) -> SitemapData:
+        """
+        :samp:`Append the resources of sitemap to the saved document at path`
 
+        The document keeps its header, with the up link of the current parameters. Documents submitted to the
+        document sink are written before the resources are appended.
+
+        :param int ordinal: the ordinal of the document
+        :param str path: the local path of an uncompressed document in the metadata directory
+        :param sitemap: the sitemap document with the resources to append
+        :param int resource_count: the amount of records in the document, after the resources are appended
+        :return: :class:`SitemapData` of the document
+        """
+        self.document_sink.drain()
+        header = read_header(path)
+        header.link_set(rel="up", href=self.current_rel_up_for(sitemap))
+        append_entries(path, sitemap, header)
+        sitemap_data = SitemapData(resource_count, ordinal, self.derived().uri_from_path(path), path,
+                                   sitemap.capability_name)
+        sitemap_data.doc_end = defaults.w3c_now()
+        sitemap_data.document_saved = True
+        self.catalog().record_sitemap(path, header, ordinal, resource_count)
+        self.on_document_saved(sitemap_data)
         self.observers_inform(self, ExecutorEvent.completed_document, document=sitemap, sitemap_data=sitemap_data)
         return sitemap_data
 
+    def on_document_saved(self, sitemap_data: SitemapData):
+        """
+        :samp:`Called when a document was written to disk`
+
+        Documents are written in the order in which they were finished. Subclasses that want to keep track of
+        saved documents may override.
+
+        :param sitemap_data: :class:`SitemapData` of the saved document
+        """
+        pass
+
+    def resume_generator(self):
+        """
+        :samp:`Does nothing`
+
+        Called before the generator generates the resources for :func:`execute`. Subclasses that can resume an
+        interrupted execution may override and position the generator.
+        """
+        pass
+
     def current_rel_up_for(self, sitemap):
         if sitemap.capability_name == Capability.capabilitylist.name:
-            return self.param.description_url()
+            return self.derived().description_url
         else:
-            return self.param.capabilitylist_url()
+            return self.derived().capabilitylist_url
 
     def update_rel_index(self, index_url, path):
-        sitemap = self.read_sitemap(path)
-        sitemap.link_set(rel="index", href=index_url)
-        self.save_sitemap(sitemap, path)
+        entry = self.catalog().entry(path)
+        if entry is not None and entry["index"] == index_url:
+            return
+        header = read_header(path)
+        header.link_set(rel="index", href=index_url)
+        self.patch_header(path, header)
+
+    def patch_header(self, path, header):
+        """
+        :samp:`Replace the header of a document in the metadata directory`
+
+        :param str path: the local path of the document
+        :param header: the new :class:`~resourcesync.rsxml.sitemap_reader.SitemapHeader`
+        """
+        write_header(path, header, self.param.compression_level)
+        self.catalog().record_header(path, header)
+
+    def remove_document(self, path):
+        """
+        :samp:`Remove a document from the metadata directory, if it exists`
+
+        :param str path: the local path of the document
+        """
+        if os.path.exists(path):
+            os.remove(path)
+        self.catalog().remove(path)
+
+    def writer_options(self) -> dict:
+        """
+        :samp:`Keyword arguments for` :func:`~resourcesync.core.sink.write_sitemap`
+
+        :return: dict of writer options derived from current parameters
+        """
+        return {"pretty_xml": self.param.is_saving_pretty_xml, "fast_xml": self.param.is_saving_fast_xml,
+                "compression_level": self.param.compression_level}
 
     def save_sitemap(self, sitemap, path):
-        sitemap.pretty_xml = self.param.is_saving_pretty_xml
-        # writing the string sitemap.as_xml() to disk results in encoding=ASCII on some systems.
-        # due to https://docs.python.org/3.4/library/xml.etree.elementtree.html#write
-        sitemap.write(path)
+        write_sitemap(sitemap, path, **self.writer_options())
 
     def read_sitemap(self, path, sitemap=None):
         if sitemap is None:
             sitemap = ListBaseWithIndex()
-        with open(path, "r", encoding="utf-8") as file:
-            sm = Sitemap()
-            sm.parse_xml(file, resources=sitemap)
-        return sitemap
\ No newline at end of file
+        return SitemapReader().read(path, resources=sitemap)
\ No newline at end of file
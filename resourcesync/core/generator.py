@@ -11,6 +11,11 @@ import logging
 
 class Generator():
 
+    # True if generated resources have their change set to 'created', 'updated' or 'deleted'.
+    # Changelist executors will then publish the reported changes in stead of comparing
+    # all generated resources to the previously published state.
+    reports_changes = False
+
     def __init__(self, params=None, rsxml=None):
         self.params = params
         self.rsxml = rsxml
@@ -21,6 +26,21 @@ class Generator():
     def generate(self) -> [Resource]:
         raise NotImplementedError("Generator not implemented")
 
+    def commit(self):
+        # called after the generated resources were published successfully
+        pass
+
+    def resume_token(self):
+        # a json serializable token for the position after the last generated resource,
+        # or None if the generator cannot resume. Executors that checkpoint their progress
+        # store this token and pass it to resume when an interrupted execution is resumed.
+        return None
+
+    def resume(self, token):
+        # continue generating after the position of a token returned by resume_token.
+        # Called before generate.
+        raise NotImplementedError("Generator cannot resume")
+
 
 class Filter(object, metaclass=ABCMeta):
 
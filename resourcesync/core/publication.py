@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+:samp:`Publication of documents from a staging directory`
+
+A :class:`StagedPublication` lets an executor write all documents of an execution to a staging directory next to
+the metadata directory, while clients keep reading the previous documents. When the execution completes,
+:func:`StagedPublication.publish` makes the new documents visible:
+
+- if the metadata directory is a symbolic link, the staging directory is a new generation directory and the link
+  is swapped to it in one atomic step;
+- otherwise the documents are moved into the metadata directory with atomic renames. Sitemaps are moved before
+  the indexes, capabilitylist and description that point to them, documents that were not published again are
+  removed last.
+
+An execution that fails calls :func:`StagedPublication.discard`, which leaves the metadata directory untouched.
+"""
+import logging
+import os
+import shutil
+import tempfile
+from fnmatch import fnmatch
+from glob import glob
+
+from resourcesync.core.catalog import Catalog, CATALOG_FILENAME
+from resourcesync.parameters.derived import DerivedParameters
+from resourcesync.parameters.parameters import WELL_KNOWN_PATH
+from resourcesync.rsxml.compression import DOCUMENT_PATTERNS, strip_document_extension
+
+LOG = logging.getLogger(__name__)
+
+GENERATION_INFIX = ".gen-"
+STAGING_INFIX = ".staging-"
+
+
+class StagedParameters(object):
+    """
+    :samp:`Parameters that write to a staging directory`
+
+    Wraps :class:`~resourcesync.parameters.parameters.Parameters`. Paths in the metadata directory are positioned in
+    the staging directory, urls are calculated as if the documents were in the metadata directory.
+    """
+    def __init__(self, parameters, staging_dir):
+        self._parameters = parameters
+        self._staging_dir = staging_dir
+
+    def __getattr__(self, name):
+        return getattr(self._parameters, name)
+
+    def abs_metadata_dir(self) -> str:
+        return self._staging_dir
+
+    def abs_metadata_path(self, filename):
+        return os.path.join(self._staging_dir, filename)
+
+    def abs_document_path(self, name):
+        return self.abs_metadata_path(name + self._parameters.document_extension())
+
+    def abs_description_path(self):
+        desc_dir = self._parameters.description_dir
+        if desc_dir is None or desc_dir == "":
+            desc_dir = self._staging_dir
+        return os.path.join(desc_dir, WELL_KNOWN_PATH)
+
+    def published_path(self, path):
+        """
+        :samp:`The path a staged file will have when it is published`
+
+        :param str path: a path in the staging directory
+        :return: the corresponding path in the metadata directory
+        """
+        rel_path = os.path.relpath(path, self._staging_dir)
+        if rel_path.startswith(os.pardir):
+            return path
+        return os.path.join(self._parameters.abs_metadata_dir(), rel_path)
+
+    def uri_from_path(self, path):
+        return self._parameters.uri_from_path(self.published_path(path))
+
+    def derived(self) -> DerivedParameters:
+        return DerivedParameters(self)
+
+
+class StagedPublication(object):
+    """
+    :samp:`Stages documents next to the metadata directory and publishes them`
+
+    """
+    def __init__(self, parameters, copy_documents=True):
+        """
+        :samp:`Initialization`
+
+        Creates the staging directory.
+
+        :param parameters: the :class:`~resourcesync.parameters.parameters.Parameters` of the execution
+        :param bool copy_documents: **True** to start with a copy of the published documents, **False** to start with
+            an empty metadata directory. Documents are copied as hard links where the file system allows.
+        """
+        self.metadata_dir = parameters.abs_metadata_dir().rstrip(os.sep)
+        self.is_symlink = os.path.islink(self.metadata_dir)
+        name = os.path.basename(self.metadata_dir)
+        if self.is_symlink:
+            self.previous_generation = os.path.realpath(self.metadata_dir)
+            self.staging_dir = tempfile.mkdtemp(dir=os.path.dirname(self.previous_generation),
+                                                prefix=name + GENERATION_INFIX)
+            # generation directories are served, they are readable like any other directory
+            os.chmod(self.staging_dir, 0o755)
+        else:
+            LOG.warning("Metadata directory %s is not a symbolic link, documents are published one at a time",
+                        self.metadata_dir)
+            self.previous_generation = None
+            self.staging_dir = tempfile.mkdtemp(dir=os.path.dirname(self.metadata_dir),
+                                                prefix="." + name + STAGING_INFIX)
+        self.parameters = StagedParameters(parameters, self.staging_dir)
+        if os.path.isdir(self.metadata_dir):
+            self._copy_published(copy_documents)
+        LOG.info("Staging documents of %s in %s", self.metadata_dir, self.staging_dir)
+
+    def _copy_published(self, copy_documents):
+        # the catalog also holds dumps, which are kept
+        Catalog(self.metadata_dir)
+        if copy_documents:
+            link_tree(self.metadata_dir, self.staging_dir)
+        elif self.is_symlink:
+            # a new generation has everything but the sitemaps of the previous generation
+            link_tree(self.metadata_dir, self.staging_dir, exclude=DOCUMENT_PATTERNS)
+        else:
+            shutil.copy2(os.path.join(self.metadata_dir, CATALOG_FILENAME), self.staging_dir)
+
+    def publish(self):
+        """
+        :samp:`Make the staged documents visible in the metadata directory`
+
+        Only a symbolically linked metadata directory is published in one atomic step. A plain metadata directory
+        receives the staged documents one rename at a time.
+        """
+        if self.is_symlink:
+            self._swap_link()
+        else:
+            self._move_documents()
+        LOG.info("Published documents of %s", self.metadata_dir)
+
+    def discard(self):
+        """
+        :samp:`Remove the staging directory`
+
+        """
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+    def _swap_link(self):
+        target = self.staging_dir
+        if not os.path.isabs(os.readlink(self.metadata_dir)):
+            target = os.path.relpath(target, os.path.dirname(self.metadata_dir))
+        tmp_link = os.path.join(os.path.dirname(self.metadata_dir),
+                                ".%s.link-%d" % (os.path.basename(self.metadata_dir), os.getpid()))
+        os.symlink(target, tmp_link)
+        os.replace(tmp_link, self.metadata_dir)
+        # only remove previous generations created by a staged publication
+        if os.path.basename(self.previous_generation).startswith(os.path.basename(self.metadata_dir) + GENERATION_INFIX):
+            shutil.rmtree(self.previous_generation, ignore_errors=True)
+
+    def _move_documents(self):
+        staged = []
+        for dir_path, dir_names, file_names in os.walk(self.staging_dir):
+            for file_name in file_names:
+                staged.append(os.path.relpath(os.path.join(dir_path, file_name), self.staging_dir))
+
+        os.makedirs(self.metadata_dir, exist_ok=True)
+        for rel_path in sorted(staged, key=publication_order):
+            path = os.path.join(self.metadata_dir, rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(os.path.join(self.staging_dir, rel_path), path)
+
+        staged = set(staged)
+        for pattern in DOCUMENT_PATTERNS:
+            for path in glob(os.path.join(self.metadata_dir, pattern)):
+                if os.path.basename(path) not in staged:
+                    os.remove(path)
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+
+def link_or_copy(src, dst):
+    """
+    :samp:`Hard link dst to src, or copy src if it cannot be linked`
+
+    Staged documents are linked to the published documents. Documents are given their own file before they are
+    written, see :func:`~resourcesync.utils.defaults.break_hard_link`.
+
+    :param str src: the published file
+    :param str dst: the staged file
+    :return: dst
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        # i.e. another file system or a file system without hard links
+        shutil.copy2(src, dst)
+    return dst
+
+
+def link_tree(src, dst, exclude=()):
+    """
+    :samp:`Link or copy the files under src to the existing directory dst`
+
+    Symbolic links are copied as symbolic links, other files with :func:`link_or_copy`.
+
+    :param str src: the directory to copy
+    :param str dst: the directory to copy to
+    :param exclude: glob patterns of the names of files that are not copied
+    """
+    for dir_path, dir_names, file_names in os.walk(src):
+        target_dir = os.path.normpath(os.path.join(dst, os.path.relpath(dir_path, src)))
+        os.makedirs(target_dir, exist_ok=True)
+        for name in dir_names + file_names:
+            path = os.path.join(dir_path, name)
+            if os.path.islink(path):
+                os.symlink(os.readlink(path), os.path.join(target_dir, name))
+            elif name in file_names and not any(fnmatch(name, pattern) for pattern in exclude):
+                link_or_copy(path, os.path.join(target_dir, name))
+
+
+def publication_order(rel_path) -> (int, str):
+    """
+    :samp:`Sort key that orders documents before the documents that point to them`
+
+    :param str rel_path: path of a document relative to the metadata directory
+    :return: sort key
+    """
+    name = strip_document_extension(rel_path)
+    if rel_path == WELL_KNOWN_PATH:
+        rank = 3
+    elif rel_path == CATALOG_FILENAME:
+        rank = 4
+    elif name == "capabilitylist":
+        rank = 2
+    elif name.endswith("-index"):
+        rank = 1
+    else:
+        rank = 0
+    return rank, rel_path
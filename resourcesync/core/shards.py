@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+:samp:`Distribution of resources over shards`
+
+Resources are assigned to a shard by a stable hash of their uri, so that a resource stays in the same shard
+whatever the order in which resources are generated. A :class:`ShardSpill` collects the resources of all shards in
+temporary files, after which the shards can be read one at a time.
+"""
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import zlib
+
+from resync import Resource
+
+SPILL_BATCH_SIZE = 1024
+
+
+def shard_of(uri, shards) -> int:
+    """
+    :samp:`The shard of a uri`
+
+    :param str uri: the uri of a resource
+    :param int shards: the amount of shards
+    :return: the shard, a number from 0 up to `shards`
+    """
+    return zlib.crc32(uri.encode("utf-8")) % shards
+
+
+# the attributes of a resource that are kept in a spill, as named by the constructor of Resource; the uri comes first
+STATE_FIELDS = ("uri", "timestamp", "length", "mime_type", "md5", "sha1", "sha256", "change", "ts_datetime", "path",
+                "ln", "capability", "ts_at", "ts_completed", "ts_from", "ts_until")
+
+
+def resource_state(resource) -> tuple:
+    return tuple(getattr(resource, field) for field in STATE_FIELDS)
+
+
+def resource_from_state(state) -> Resource:
+    return Resource(**dict(zip(STATE_FIELDS, state)))
+
+
+def shard_digest(states) -> str:
+    """
+    :samp:`Digest of the resources of a shard`
+
+    :param states: the states of the resources, as returned by :func:`ShardSpill.states`
+    :return: hex digest that changes if any resource in the shard changes
+    """
+    digest = hashlib.md5()
+    for state in states:
+        digest.update(repr(state).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+class ShardSpill(object):
+    """
+    :samp:`Resources of all shards, kept in temporary files`
+
+    """
+    def __init__(self, shards, directory=None, batch_size=SPILL_BATCH_SIZE):
+        """
+        :samp:`Initialization`
+
+        :param int shards: the amount of shards
+        :param str directory: directory to create the temporary files in, if None the default temporary directory
+        :param int batch_size: amount of resources of a shard that are kept in memory before they are spilled
+        """
+        self.shards = shards
+        self.batch_size = batch_size
+        self.spill_dir = tempfile.mkdtemp(prefix=".shards_", dir=directory)
+        self.buffers = [[] for _ in range(shards)]
+        self.counts = [0] * shards
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def add(self, shard, resource) -> int:
+        """
+        :samp:`Add a resource to a shard`
+
+        :param int shard: the shard
+        :param resource: the resource
+        :return: the amount of resources in the shard
+        """
+        buffer = self.buffers[shard]
+        buffer.append(resource_state(resource))
+        self.counts[shard] += 1
+        if len(buffer) >= self.batch_size:
+            self._spill(shard)
+        return self.counts[shard]
+
+    def _spill(self, shard):
+        with open(self._spill_path(shard), "ab") as file:
+            pickle.dump(self.buffers[shard], file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.buffers[shard] = []
+
+    def _spill_path(self, shard):
+        return os.path.join(self.spill_dir, "%d.pickle" % shard)
+
+    def states(self, shard) -> [tuple]:
+        """
+        :samp:`The states of the resources in a shard, sorted by uri`
+
+        :param int shard: the shard
+        :return: list of states, convert with :func:`resource_from_state`
+        """
+        states = []
+        if os.path.exists(self._spill_path(shard)):
+            with open(self._spill_path(shard), "rb") as file:
+                while True:
+                    try:
+                        states.extend(pickle.load(file))
+                    except EOFError:
+                        break
+        states.extend(self.buffers[shard])
+        states.sort(key=lambda state: state[0])
+        return states
+
+    def close(self):
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+        self.buffers = [[] for _ in range(self.shards)]
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+:samp:`Sinks that serialize and write completed sitemap documents`
+
+A :class:`DocumentSink` writes documents in the calling thread. A :class:`ProcessPoolDocumentSink` hands documents
+over to worker processes, so that the executor can continue to consume resources while earlier documents are
+serialized. Both sinks call back in the calling thread, in order of submission, once a document is written.
+"""
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from resourcesync.rsxml.compression import DEFAULT_COMPRESSION_LEVEL
+from resourcesync.rsxml.sitemap_writer import SitemapWriter, resync_write
+from resourcesync.utils import defaults
+
+LOG = logging.getLogger(__name__)
+
+
+def write_sitemap(sitemap, path, pretty_xml=True, fast_xml=False, compression_level=DEFAULT_COMPRESSION_LEVEL):
+    """
+    :samp:`Serialize sitemap and write it to path`
+
+    Module-level, so that it can be pickled and run in worker processes.
+
+    :param sitemap: the sitemap document to write
+    :param str path: the local path of the document
+    :param bool pretty_xml: write the document with linebreaks and indentation
+    :param bool fast_xml: write the document with the :class:`~resourcesync.rsxml.sitemap_writer.SitemapWriter`
+    :param int compression_level: compression level of a document with a path that ends in .gz
+    :return: path
+    """
+    defaults.break_hard_link(path, copy=False)
+    if fast_xml:
+        SitemapWriter(pretty_xml=pretty_xml, compression_level=compression_level).write(sitemap, path)
+    else:
+        resync_write(sitemap, path, pretty_xml=pretty_xml, compression_level=compression_level)
+    return path
+
+
+class DocumentSink(object):
+    """
+    :samp:`Writes documents synchronously`
+
+    """
+    def __init__(self, save_sitemap):
+        """
+        :samp:`Initialization`
+
+        :param save_sitemap: function(sitemap, path) that writes a document
+        """
+        self.save_sitemap = save_sitemap
+
+    def submit(self, sitemap, path, on_saved=None):
+        """
+        :samp:`Write sitemap to path`
+
+        :param sitemap: the sitemap document to write
+        :param str path: the local path of the document
+        :param on_saved: function without arguments, called after the document was written
+        """
+        self.save_sitemap(sitemap, path)
+        if on_saved:
+            on_saved()
+
+    def drain(self):
+        """
+        :samp:`Wait until all submitted documents are written`
+
+        """
+        pass
+
+    def close(self):
+        self.drain()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ProcessPoolDocumentSink(DocumentSink):
+    """
+    :samp:`Writes documents in worker processes`
+
+    At most `max_pending` documents are in flight. When this number is reached :func:`submit` waits for the
+    oldest document to be written, which bounds the memory held by documents that are waiting to be serialized.
+    Errors raised in a worker are raised again in the calling thread.
+    """
+    def __init__(self, max_workers, writer_options=None, max_pending=None):
+        """
+        :samp:`Initialization`
+
+        :param int max_workers: the number of worker processes
+        :param dict writer_options: keyword arguments for :func:`write_sitemap`
+        :param int max_pending: maximum number of documents in flight, default twice `max_workers`
+        """
+        DocumentSink.__init__(self, None)
+        self.writer_options = writer_options or {}
+        self.max_pending = max_pending if max_pending else 2 * max_workers
+        self.pending = deque()
+        self.pool = ProcessPoolExecutor(max_workers=max_workers)
+
+    def submit(self, sitemap, path, on_saved=None):
+        future = self.pool.submit(write_sitemap, sitemap, path, **self.writer_options)
+        self.pending.append((future, on_saved))
+        while len(self.pending) > self.max_pending:
+            self._complete_oldest()
+
+    def _complete_oldest(self):
+        future, on_saved = self.pending.popleft()
+        path = future.result()
+        LOG.debug("Saved %s", path)
+        if on_saved:
+            on_saved()
+
+    def drain(self):
+        while self.pending:
+            self._complete_oldest()
+
+    def close(self):
+        try:
+            self.drain()
+        finally:
+            self.pending.clear()
+            self.pool.shutdown(wait=True)
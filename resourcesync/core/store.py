@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+"""
+:samp:`Compact storage of resource metadata`
+
+Executors that compare generated resources to the previously published state keep that state in memory. A
+:class:`ResourceStore` keeps the uri, md5, length, lastmod and mime type of resources in columns of arrays instead
+of in :class:`~resync.resource.Resource` objects. Uris are stored as an interned prefix, up to and including the
+last '/', and an utf-8 encoded remainder. Md5 values are stored as 16 bytes, lengths as int64, lastmods as epoch
+seconds and mime types as an index into a list of distinct mime types. Local paths, which only resources in dumps
+have, are kept per row. Resources are found by uri through an open addressing hash index.
+
+Other attributes of resources, like links, are not kept. Resources are recreated with the kept attributes when
+they are asked for.
+
+:func:`detect_changes` compares generated resources to a store on binary digests and epoch lastmods, without
+recreating the resources of the store.
+"""
+import base64
+import binascii
+import math
+from array import array
+from collections.abc import MutableMapping
+
+from resync import Resource
+
+# rows in the hash index
+EMPTY = -1
+REMOVED = -2
+MIN_INDEX_SIZE = 8
+
+# encodings of the md5 of a row
+MD5_NONE = 0
+MD5_HEX = 1
+MD5_BASE64 = 2
+# an md5 without binary form, kept as string
+MD5_OTHER = 3
+NO_MD5 = bytes(16)
+
+
+def md5_digest(md5):
+    """
+    :samp:`The digest of an md5`
+
+    :param str md5: hex or base64 encoded md5
+    :return: the 16 bytes of the digest, None if the md5 is not a hex or base64 encoded digest
+    """
+    try:
+        if len(md5) == 32:
+            return bytes.fromhex(md5)
+        if len(md5) == 24:
+            raw = base64.b64decode(md5, validate=True)
+            return raw if len(raw) == 16 else None
+    except (binascii.Error, ValueError):
+        pass
+    return None
+
+
+def pack_md5(md5) -> tuple:
+    """
+    :samp:`The binary form of an md5`
+
+    :param str md5: hex or base64 encoded md5, or None
+    :return: tuple of encoding and 16 bytes
+    """
+    if md5 is None:
+        return MD5_NONE, NO_MD5
+    raw = md5_digest(md5)
+    if raw is not None:
+        # the encoding must give back the md5 as it was
+        if len(md5) == 32 and raw.hex() == md5:
+            return MD5_HEX, raw
+        if len(md5) == 24 and base64.b64encode(raw).decode("ascii") == md5:
+            return MD5_BASE64, raw
+    return MD5_OTHER, NO_MD5
+
+
+def uri_prefix(uri) -> int:
+    # the length of the prefix of a uri, up to and including the last '/'
+    return uri.rfind("/") + 1
+
+
+class ResourceStore(MutableMapping):
+    """
+    :samp:`Resource metadata by uri, kept in columns of arrays`
+
+    A store is a mapping of uri to :class:`~resync.resource.Resource`. Besides the mapping methods, the rows of the
+    store can be used directly: :func:`index` gives the row of a uri and :func:`md5_at` the md5 of a row, without
+    recreating resources.
+    """
+    def __init__(self, resources=None):
+        """
+        :samp:`Initialization`
+
+        :param resources: iter over resources to add, or None
+        """
+        self._prefixes = []
+        self._prefix_ids = {}
+        self._prefix = array("I")
+        self._suffixes = bytearray()
+        self._offsets = array("Q", [0])
+        self._hashes = array("q")
+        self._md5 = bytearray()
+        self._md5_kind = bytearray()
+        self._md5_other = {}
+        self._length = array("q")
+        self._lastmod = array("d")
+        self._mime_types = [None]
+        self._mime_ids = {None: 0}
+        self._mime = array("I")
+        self._paths = {}
+        self._live = bytearray()
+        self._size = 0
+        # slots in the index that are not empty
+        self._used = 0
+        self._index = array("i", [EMPTY]) * MIN_INDEX_SIZE
+        if resources is not None:
+            for resource in resources:
+                self.add(resource)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, uri):
+        return self.index(uri) >= 0
+
+    def __getitem__(self, uri):
+        row = self.index(uri)
+        if row < 0:
+            raise KeyError(uri)
+        return self.resource_at(row)
+
+    def __setitem__(self, uri, resource):
+        row = self.index(uri)
+        if row < 0:
+            row = self._append(uri)
+        self._set_row(row, resource)
+
+    def __delitem__(self, uri):
+        slot = self._find_slot(uri)
+        if slot < 0:
+            raise KeyError(uri)
+        row = self._index[slot]
+        self._index[slot] = REMOVED
+        self._live[row] = 0
+        self._md5_other.pop(row, None)
+        self._paths.pop(row, None)
+        self._size -= 1
+
+    def __iter__(self):
+        for row in self.rows():
+            yield self.uri_at(row)
+
+    def values(self):
+        return (self.resource_at(row) for row in self.rows())
+
+    def add(self, resource):
+        """
+        :samp:`Add a resource, replacing the resource with the same uri`
+
+        :param resource: the :class:`~resync.resource.Resource` to add
+        """
+        self[resource.uri] = resource
+
+    @property
+    def row_count(self) -> int:
+        """
+        :samp:`The amount of rows, including the rows of removed resources`
+
+        Rows are numbered from 0 up to the row count. The row of a resource does not change while it is in the store.
+        """
+        return len(self._live)
+
+    def rows(self) -> iter:
+        """
+        :samp:`The rows of the resources in the store, in the order the resources were added`
+
+        :return: iter over row numbers
+        """
+        live = self._live
+        return (row for row in range(len(live)) if live[row])
+
+    def index(self, uri) -> int:
+        """
+        :samp:`The row of a uri`
+
+        :param str uri: the uri of a resource
+        :return: the row of the resource, -1 if the uri is not in the store
+        """
+        slot = self._find_slot(uri)
+        return self._index[slot] if slot >= 0 else -1
+
+    def uri_at(self, row) -> str:
+        return self._prefixes[self._prefix[row]] \
+               + self._suffixes[self._offsets[row]:self._offsets[row + 1]].decode("utf-8")
+
+    def md5_at(self, row):
+        """
+        :samp:`The md5 of a row`
+
+        :param int row: the row
+        :return: the md5 as it was added, or None
+        """
+        kind = self._md5_kind[row]
+        if kind == MD5_HEX:
+            return self._md5[16 * row:16 * row + 16].hex()
+        if kind == MD5_BASE64:
+            return base64.b64encode(self._md5[16 * row:16 * row + 16]).decode("ascii")
+        if kind == MD5_OTHER:
+            return self._md5_other[row]
+        return None
+
+    def resource_at(self, row, lastmod=True) -> Resource:
+        """
+        :samp:`Recreate the resource of a row`
+
+        :param int row: the row
+        :param bool lastmod: **False** to recreate the resource without lastmod, i.e. as deleted resource
+        :return: :class:`~resync.resource.Resource` with uri, md5, length, lastmod, mime type and path
+        """
+        length = self._length[row]
+        timestamp = self._lastmod[row]
+        if not lastmod or math.isnan(timestamp):
+            timestamp = None
+        return Resource(uri=self.uri_at(row), timestamp=timestamp,
+                        length=None if length < 0 else length, md5=self.md5_at(row),
+                        mime_type=self._mime_types[self._mime[row]], path=self._paths.get(row))
+
+    def unchanged(self, row, resource, lenient=False) -> bool:
+        """
+        :samp:`Compare a resource to a row`
+
+        Md5 values are compared as digests, a hex and a base64 encoded md5 of the same digest are equal. If the
+        resource or the row has no md5 the resource is unchanged if both have no md5, or, if ``lenient``, if the
+        length and lastmod of the resource are those of the row.
+
+        :param int row: the row of the uri of the resource
+        :param resource: the :class:`~resync.resource.Resource`
+        :param bool lenient: compare length and lastmod if there is no md5 to compare
+        :return: **True** if the resource is unchanged, **False** otherwise
+        """
+        md5 = resource.md5
+        kind = self._md5_kind[row]
+        if md5 is None or kind == MD5_NONE:
+            if not lenient:
+                return md5 is None and kind == MD5_NONE
+            length = self._length[row]
+            timestamp = self._lastmod[row]
+            return (resource.length is None if length < 0 else resource.length == length) \
+                and (resource.timestamp is None if math.isnan(timestamp) else resource.timestamp == timestamp)
+        raw = md5_digest(md5)
+        if kind == MD5_OTHER:
+            other = self._md5_other[row]
+            other_raw = md5_digest(other)
+            return md5 == other if raw is None or other_raw is None else raw == other_raw
+        # the digest is compared in place
+        return raw is not None and self._md5.startswith(raw, 16 * row)
+
+    def nbytes(self) -> int:
+        """
+        :samp:`The size of the arrays of the store`
+
+        :return: size in bytes, without the interned prefixes, mime types, paths and md5 values without binary form
+        """
+        return sum(len(column) * column.itemsize for column in (self._prefix, self._offsets, self._hashes,
+                                                                self._length, self._lastmod, self._mime,
+                                                                self._index)) \
+            + len(self._suffixes) + len(self._md5) + len(self._md5_kind) + len(self._live)
+
+    def _find_slot(self, uri) -> int:
+        # the slot of a uri in the index, -1 if the uri is not in the store
+        index = self._index
+        mask = len(index) - 1
+        uri_hash = hash(uri)
+        slot = uri_hash & mask
+        while True:
+            row = index[slot]
+            if row == EMPTY:
+                return -1
+            if row >= 0 and self._hashes[row] == uri_hash and self.uri_at(row) == uri:
+                return slot
+            slot = (slot + 1) & mask
+
+    def _append(self, uri) -> int:
+        if 3 * (self._used + 1) > 2 * len(self._index):
+            self._rebuild_index()
+        split = uri_prefix(uri)
+        prefix = uri[:split]
+        prefix_id = self._prefix_ids.get(prefix)
+        if prefix_id is None:
+            prefix_id = self._prefix_ids[prefix] = len(self._prefixes)
+            self._prefixes.append(prefix)
+        row = len(self._live)
+        self._prefix.append(prefix_id)
+        self._suffixes += uri[split:].encode("utf-8")
+        self._offsets.append(len(self._suffixes))
+        self._hashes.append(hash(uri))
+        self._md5 += NO_MD5
+        self._md5_kind.append(MD5_NONE)
+        self._length.append(-1)
+        self._lastmod.append(math.nan)
+        self._mime.append(0)
+        self._live.append(1)
+        self._size += 1
+        self._insert(row)
+        return row
+
+    def _set_row(self, row, resource):
+        kind, raw = pack_md5(resource.md5)
+        self._md5[16 * row:16 * row + 16] = raw
+        self._md5_kind[row] = kind
+        if kind == MD5_OTHER:
+            self._md5_other[row] = resource.md5
+        else:
+            self._md5_other.pop(row, None)
+        self._length[row] = -1 if resource.length is None else resource.length
+        self._lastmod[row] = math.nan if resource.timestamp is None else resource.timestamp
+        mime_type = resource.mime_type
+        mime_id = self._mime_ids.get(mime_type)
+        if mime_id is None:
+            mime_id = self._mime_ids[mime_type] = len(self._mime_types)
+            self._mime_types.append(mime_type)
+        self._mime[row] = mime_id
+        if resource.path is None:
+            self._paths.pop(row, None)
+        else:
+            self._paths[row] = resource.path
+
+    def _insert(self, row):
+        index = self._index
+        mask = len(index) - 1
+        slot = self._hashes[row] & mask
+        while index[slot] >= 0:
+            slot = (slot + 1) & mask
+        if index[slot] == EMPTY:
+            self._used += 1
+        index[slot] = row
+
+    def _rebuild_index(self):
+        size = MIN_INDEX_SIZE
+        while size < 2 * (self._size + 1):
+            size *= 2
+        self._index = array("i", [EMPTY]) * size
+        self._used = 0
+        for row in self.rows():
+            self._insert(row)
+
+
+def detect_changes(previous, resources, lenient=False) -> tuple:
+    """
+    :samp:`Compare resources to a previous state`
+
+    Resources are compared one at a time, only created and updated resources are kept. Of resources with the same
+    uri the last one counts.
+
+    :param previous: :class:`ResourceStore` with the previous state
+    :param resources: iter over the current resources
+    :param bool lenient: resources without md5 are unchanged if their length and lastmod did not change,
+        see :func:`ResourceStore.unchanged`
+    :return: tuple of dict of change type to list of resources and the amount of unchanged resources
+    """
+    index = previous.index
+    unchanged = previous.unchanged
+    # rows of the previous state that are still present
+    seen = bytearray(previous.row_count)
+    created = {}
+    updated = {}
+    for resource in resources:
+        uri = resource.uri
+        row = index(uri)
+        if row < 0:
+            created[uri] = resource
+            continue
+        seen[row] = 1
+        if unchanged(row, resource, lenient):
+            updated.pop(uri, None)
+        else:
+            updated[uri] = resource
+
+    deleted = [previous.resource_at(row, lastmod=False) for row in previous.rows() if not seen[row]]
+    all_changes = {"created": list(created.values()), "updated": list(updated.values()), "deleted": deleted}
+    return all_changes, sum(seen) - len(updated)
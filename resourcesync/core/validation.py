@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+:samp:`Validation of generated resource metadata`
+
+Resources are expected to have a length, md5, lastmod and mime_type. A :class:`ResourceValidator` checks the
+resources that pass through :func:`~resourcesync.core.executors.Executor.resource_generator` according to a
+:class:`~resourcesync.parameters.enum.ValidationMode` and counts violations per field. Violations are reported
+once, in a summary at the end of an execution.
+"""
+import logging
+
+from resync import Resource
+
+from resourcesync.parameters.enum import ValidationMode
+
+LOG = logging.getLogger(__name__)
+
+MANDATORY_FIELDS = ("length", "md5", "lastmod", "mime_type")
+# the field of a violation by a generated object that is not a Resource
+TYPE = "type"
+# in sample mode the first resource and every SAMPLE_INTERVAL-th resource are checked
+SAMPLE_INTERVAL = 1000
+
+
+def violations(resource) -> list:
+    """
+    :samp:`The fields of a resource that violate expectations`
+
+    :param resource: generated resource metadata
+    :return: list of field names, empty if the resource is valid
+    """
+    if not isinstance(resource, Resource):
+        return [TYPE]
+    return [field for field in MANDATORY_FIELDS if not getattr(resource, field)]
+
+
+class ResourceValidator(object):
+    """
+    :samp:`Checks resources and counts violations per field`
+
+    """
+    def __init__(self, mode=ValidationMode.sample):
+        """
+        :samp:`Initialization`
+
+        :param mode: the :class:`~resourcesync.parameters.enum.ValidationMode`
+        """
+        self.mode = mode
+        self.checked = 0
+        self.rejected = 0
+        self.violations = {}
+        # the count of the first resource with a violation of a field
+        self.first_violations = {}
+
+    def check(self, count, resource) -> bool:
+        """
+        :samp:`Check a resource`
+
+        :param int count: the position of the resource in the generated resources
+        :param resource: the resource
+        :return: **False** if the resource is rejected, **True** otherwise
+        """
+        self.checked += 1
+        fields = violations(resource)
+        if not fields:
+            return True
+        for field in fields:
+            self.violations[field] = self.violations.get(field, 0) + 1
+            self.first_violations.setdefault(field, count)
+        if self.mode == ValidationMode.strict:
+            self.rejected += 1
+            return False
+        return True
+
+    def validate(self, resources, count=0) -> iter:
+        """
+        :samp:`Count and check resources`
+
+        :param resources: iter over resource metadata
+        :param int count: the count of the resources before the first resource
+        :return: iter over (count, resource) of the resources that were not rejected
+        """
+        if self.mode == ValidationMode.off:
+            for resource in resources:
+                count += 1
+                yield count, resource
+        elif self.mode == ValidationMode.sample:
+            for resource in resources:
+                count += 1
+                if count % SAMPLE_INTERVAL == 1:
+                    self.check(count, resource)
+                yield count, resource
+        else:
+            check = self.check
+            for resource in resources:
+                if check(count + 1, resource):
+                    count += 1
+                    yield count, resource
+
+    def summary(self) -> dict:
+        """
+        :samp:`The outcome of the validation`
+
+        :return: dict with the mode, the amount of checked and rejected resources and violations per field
+        """
+        return {"mode": self.mode.name, "checked": self.checked, "rejected": self.rejected,
+                "violations": dict(self.violations)}
+
+    def report(self):
+        """
+        :samp:`Log the violations, if any, in one warning`
+
+        """
+        if not self.violations:
+            return
+        fields = ", ".join("%s: %d (first at resource %d)" % (field, amount, self.first_violations[field])
+                           for field, amount in sorted(self.violations.items()))
+        LOG.warning("%s validation of %d resources found violations of %s. %d resources were rejected.",
+                    self.mode.name, self.checked, fields, self.rejected)
@@ -10,12 +10,15 @@ Concrete classes:
 """
 import os
 from abc import ABCMeta
-from glob import glob
 from resync import ChangeDump, ChangeList
 from resync.dump import Dump, DumpError
 from resync import Resource, ResourceList, ResourceDump
-from resync.sitemap import Sitemap
+from resourcesync.core.catalog import DUMP
+from resourcesync.rsxml.sitemap_header import read_header
+from resourcesync.rsxml.sitemap_reader import SitemapReader, SitemapHeader
 from resourcesync.core.executors import Executor, SitemapData, ExecutorEvent
+from resourcesync.core.generator import Generator
+from resourcesync.core.store import ResourceStore, detect_changes
 from resourcesync.parameters.enum import Capability
 from resourcesync.parameters.parameters import Parameters
 from resourcesync.utils import defaults
@@ -28,8 +31,8 @@ class ChangeDumpExecutor(Executor, metaclass=ABCMeta):
 
     """
 
-    def __init__(self, parameters: Parameters=None):
-        Executor.__init__(self, parameters)
+    def __init__(self, parameters: Parameters=None, generator: Generator=None):
+        Executor.__init__(self, parameters, generator)
 
         # next parameters will all be set in the method update_previous_state
         self.previous_resources = None
@@ -55,13 +58,13 @@ class ChangeDumpExecutor(Executor, metaclass=ABCMeta):
         return sitemap_data_iter, rdumps_iter
 
     def create_index(self, sitemap_data_iter: iter) -> SitemapData:
-        changelist_index_path = self.param.abs_metadata_path("changedump-index.xml")
-        changelist_index_uri = self.param.uri_from_path(changelist_index_path)
-        if os.path.exists(changelist_index_path):
-            os.remove(changelist_index_path)
+        changelist_index_path = self.derived().abs_document_path("changedump-index")
+        changelist_index_uri = self.derived().uri_from_path(changelist_index_path)
+        self.remove_document(changelist_index_path)
 
-        changelist_files = sorted(glob(self.param.abs_metadata_path("changedump_*.xml")))
-        changedump_files = sorted(glob(self.param.abs_metadata_path("cd_*.zip")))
+        catalog = self.catalog()
+        changelist_files = catalog.paths(Capability.changedump.name)
+        changedump_files = catalog.paths(Capability.changedump.name, kind=DUMP)
         if len(changelist_files) > 1:
             # changelist_index = ChangeDumpManifest()
             changelist_index = ChangeDump()
@@ -70,8 +73,8 @@ class ChangeDumpExecutor(Executor, metaclass=ABCMeta):
             # changelist_index.modified = self.date_resourcelist_completed
             for cl_file, cd_file in zip(changelist_files, changedump_files):
                 # changelist = self.read_sitemap(cl_file, ChangeDump(md_from=changelist.md_from, md_until=changelist.md_until))
-                changelist = self.read_sitemap(cl_file, ChangeDump())
-                uri = self.param.uri_from_path(cd_file)
+                header = read_header(cl_file)
+                uri = self.derived().uri_from_path(cd_file)
                 lastmod = str(defaults.reformat_datetime(defaults.file_modification_date(cd_file)))
                 md5 = defaults.md5_for_file(cd_file)
                 mime_type = defaults.mime_type(cd_file)
@@ -81,43 +84,34 @@ class ChangeDumpExecutor(Executor, metaclass=ABCMeta):
                 changelist_index.add(cd)
                 
 
-                if self.param.is_saving_sitemaps:
-                    index_link = changelist.link("index")
-                    if index_link is None:
-                        changelist.link_set(rel="index", href=changelist_index_uri)
-                        self.save_sitemap(changelist, cl_file)
+                if self.param.is_saving_sitemaps and catalog.entry(cl_file)["index"] is None:
+                    header.link_set(rel="index", href=changelist_index_uri)
+                    self.patch_header(cl_file, header)
 
             self.finish_sitemap(-1, changelist_index)
 
     def update_previous_state(self):
         if self.previous_resources is None:
-            self.previous_resources = {}
+            self.previous_resources = ResourceStore()
+            reader = SitemapReader()
 
             # search for resourcelists
-            self.resourcelist_files = sorted(glob(self.param.abs_metadata_path("changedump_*.xml")))
+            self.resourcelist_files = self.catalog().paths(Capability.changedump.name)
             for rl_file_name in self.resourcelist_files:
-                resourcelist = ResourceList()
-                with open(rl_file_name, "r", encoding="utf-8") as rl_file:
-                    sm = Sitemap()
-                    sm.parse_xml(rl_file, resources=resourcelist)
+                header = SitemapHeader()
+                for resource in reader.iter_resources(rl_file_name, header=header):
+                    self.previous_resources.add(resource)
 
-                self.date_resourcelist_completed = resourcelist.md_completed
+                self.date_resourcelist_completed = header.md_completed
                 if self.date_resourcelist_completed is None:
-                    self.date_resourcelist_completed = resourcelist.md_at
-
-                self.previous_resources.update({resource.uri: resource for resource in resourcelist.resources})
+                    self.date_resourcelist_completed = header.md_at
 
             # search for changedumps
-            self.changedump_files = sorted(glob(self.param.abs_metadata_path("changedump_*.xml")))
+            self.changedump_files = self.catalog().paths(Capability.changedump.name)
             for cl_file_name in self.changedump_files:
-                changedump = ChangeDump()
-                with open(cl_file_name, "r", encoding="utf-8") as cl_file:
-                    sm = Sitemap()
-                    sm.parse_xml(cl_file, resources=changedump)
-
-                for resource in changedump.resources:
+                for resource in reader.iter_resources(cl_file_name):
                     if resource.change == "created" or resource.change == "updated":
-                        self.previous_resources.update({resource.uri: resource})
+                        self.previous_resources.add(resource)
                     elif resource.change == "deleted" and resource.uri in self.previous_resources:
                         del self.previous_resources[resource.uri]
 
@@ -128,32 +122,24 @@ class ChangeDumpExecutor(Executor, metaclass=ABCMeta):
 
             resource_generator = self.resource_generator()
             self.update_previous_state()
-            prev_r = self.previous_resources
-            curr_r = {resource.uri: resource for count, resource in resource_generator(resource_metadata)}
-            created = [r for r in curr_r.values() if r.uri not in prev_r]
-            updated = [r for r in curr_r.values() if r.uri in prev_r and r.md5 != prev_r[r.uri].md5]
-            deleted = [r for r in prev_r.values() if r.uri not in curr_r]
-            unchang = [r for r in curr_r.values() if r.uri in prev_r and r.md5 == prev_r[r.uri].md5]
-
-            # remove lastmod from deleted resource metadata
-            for resource in deleted:
-                resource.lastmod = None
-
-            num_created = len(created)
-            num_updated = len(updated)
-            num_deleted = len(deleted)
+            all_changes, unchanged = detect_changes(
+                self.previous_resources, (resource for count, resource in resource_generator(resource_metadata)),
+                lenient=self.param.is_lenient_change_detection)
+            num_created = len(all_changes["created"])
+            num_updated = len(all_changes["updated"])
+            num_deleted = len(all_changes["deleted"])
             tot_changes = num_created + num_updated + num_deleted
             self.observers_inform(self, ExecutorEvent.found_changes, created=num_created, updated=num_updated,
-                                  deleted=num_deleted, unchanged=len(unchang))
-            all_changes = {"created": created, "updated": updated, "deleted": deleted}
+                                  deleted=num_deleted, unchanged=unchanged)
 
             ordinal = self.find_ordinal(Capability.changedump.name)
 
+            max_items_in_list = self.derived().max_items_in_list
             resource_count = 0
             if changedump:
                 ordinal -= 1
                 resource_count = len(changedump)
-                if resource_count >= self.param.max_items_in_list:
+                if resource_count >= max_items_in_list:
                     changedump = None
                     ordinal += 1
                     resource_count = 0
@@ -171,14 +157,16 @@ class ChangeDumpExecutor(Executor, metaclass=ABCMeta):
                     resource_count += 1
 
                     # under conditions: yield the current changedump
-                    if resource_count % self.param.max_items_in_list == 0:
+                    if resource_count % max_items_in_list == 0:
                         ordinal += 1
                         # sitemap_data = self.finish_sitemap(ordinal, changedump)
                         d = Dump(resources = changedump)
                         # zipf = os.path.join('/tmp', "cd_" + str(ordinal) + ".zip")
                         zipf = self.param.abs_metadata_path("cd_" + str(ordinal) + ".zip")
                         print (str(zipf))
+                        defaults.break_hard_link(zipf, copy=False)
                         d.write_zip(resources=changedump, dumpfile=zipf)
+                        self.catalog().record_dump(zipf, Capability.changedump.name, ordinal)
                         doc_end = defaults.w3c_now()
 
                         sitemap_data = self.finish_sitemap(ordinal, changedump, doc_start=self.date_start_processing, doc_end=doc_end)
@@ -207,7 +195,9 @@ class ChangeDumpExecutor(Executor, metaclass=ABCMeta):
                 yield sitemap_data, dumpResource
                 # yield sitemap_data, zipf
                 # yield zipf
+                defaults.break_hard_link(zipf, copy=False)
                 d.write_zip(resources=changedump, dumpfile=zipf)
+                self.catalog().record_dump(zipf, Capability.changedump.name, ordinal)
 
 
         return generator
@@ -238,13 +228,13 @@ class NewChangeDumpExecutor(ChangeDumpExecutor):
 
     def post_process_documents(self, sitemap_data_iter: iter):
         # change md:until value of older changedumps - if we created new changedumps.
-        # self.changedump_files was globed before new documents were generated (self.update_previous_state).
+        # self.changedump_files was listed before new documents were generated (self.update_previous_state).
         if len(sitemap_data_iter) > 0 and self.param.is_saving_sitemaps:
             for filename in self.changedump_files:
-                changedump = self.read_sitemap(filename, ChangeDump())
-                if changedump.md_until is None:
-                    changedump.md_until = self.date_start_processing
-                    self.save_sitemap(changedump, filename)
+                if self.catalog().entry(filename)["md_until"] is None:
+                    header = read_header(filename)
+                    header.md["md_until"] = self.date_start_processing
+                    self.patch_header(filename, header)
 
 
 class IncrementalChangeDumpExecutor(ChangeDumpExecutor):
@@ -8,17 +8,21 @@ Concrete classes:
     - :class:`IncrementalChangeListExecutor`
 
 """
-import os
+import logging
 from abc import ABCMeta
-from glob import glob
 from resync import ChangeList
 from resync import Resource
-from resync import ResourceList
-from resync.sitemap import Sitemap
+from resourcesync.rsxml.compression import is_compressed
+from resourcesync.rsxml.sitemap_header import read_header
+from resourcesync.rsxml.sitemap_reader import SitemapReader, SitemapHeader
 from resourcesync.core.executors import Executor, SitemapData, ExecutorEvent
+from resourcesync.core.generator import Generator
+from resourcesync.core.store import ResourceStore, detect_changes
 from resourcesync.parameters.enum import Capability
 from resourcesync.parameters.parameters import Parameters
 
+LOG = logging.getLogger(__name__)
+
 
 class ChangeListExecutor(Executor, metaclass=ABCMeta):
     """
@@ -28,8 +32,8 @@ class ChangeListExecutor(Executor, metaclass=ABCMeta):
     def generate_rs_documents(self, resource_metadata: [Resource]) -> [SitemapData]:
         pass
 
-    def __init__(self, parameters: Parameters=None):
-        Executor.__init__(self, parameters)
+    def __init__(self, parameters: Parameters=None, generator: Generator=None):
+        Executor.__init__(self, parameters, generator)
 
         # next parameters will all be set in the method update_previous_state
         self.previous_resources = None
@@ -40,119 +44,174 @@ class ChangeListExecutor(Executor, metaclass=ABCMeta):
         ##
 
     def create_index(self, sitemap_data_iter: iter) -> SitemapData:
-        changelist_index_path = self.param.abs_metadata_path("changelist-index.xml")
-        changelist_index_uri = self.param.uri_from_path(changelist_index_path)
-        if os.path.exists(changelist_index_path):
-            os.remove(changelist_index_path)
+        changelist_index_path = self.derived().abs_document_path("changelist-index")
+        changelist_index_uri = self.derived().uri_from_path(changelist_index_path)
+        self.remove_document(changelist_index_path)
 
-        changelist_files = sorted(glob(self.param.abs_metadata_path("changelist_*.xml")))
+        catalog = self.catalog()
+        changelist_files = catalog.paths(Capability.changelist.name)
         if len(changelist_files) > 1:
             changelist_index = ChangeList()
             changelist_index.sitemapindex = True
             changelist_index.md_from = self.date_resourcelist_completed
             for cl_file in changelist_files:
-                changelist = self.read_sitemap(cl_file, ChangeList())
-                uri = self.param.uri_from_path(cl_file)
-                changelist_index.resources.append(Resource(uri=uri, md_from=changelist.md_from,
-                                                           md_until=changelist.md_until))
+                entry = catalog.entry(cl_file)
+                uri = self.derived().uri_from_path(cl_file)
+                changelist_index.resources.append(Resource(uri=uri, md_from=entry["md_from"],
+                                                           md_until=entry["md_until"]))
 
-                if self.param.is_saving_sitemaps:
-                    index_link = changelist.link("index")
-                    if index_link is None:
-                        changelist.link_set(rel="index", href=changelist_index_uri)
-                        self.save_sitemap(changelist, cl_file)
+                if self.param.is_saving_sitemaps and entry["index"] is None:
+                    header = read_header(cl_file)
+                    header.link_set(rel="index", href=changelist_index_uri)
+                    self.patch_header(cl_file, header)
 
             self.finish_sitemap(-1, changelist_index)
 
     def update_previous_state(self):
         if self.previous_resources is None:
-            self.previous_resources = {}
+            self.previous_resources = ResourceStore()
+            reader = SitemapReader()
 
             # search for resourcelists
-            self.resourcelist_files = sorted(glob(self.param.abs_metadata_path("resourcelist_*.xml")))
+            self.resourcelist_files = self.catalog().paths(Capability.resourcelist.name)
             for rl_file_name in self.resourcelist_files:
-                resourcelist = ResourceList()
-                with open(rl_file_name, "r", encoding="utf-8") as rl_file:
-                    sm = Sitemap()
-                    sm.parse_xml(rl_file, resources=resourcelist)
+                header = SitemapHeader()
+                for resource in reader.iter_resources(rl_file_name, header=header):
+                    self.previous_resources.add(resource)
 
-                self.date_resourcelist_completed = resourcelist.md_completed
+                self.date_resourcelist_completed = header.md_completed
                 if self.date_resourcelist_completed is None:
-                    self.date_resourcelist_completed = resourcelist.md_at
-
-                self.previous_resources.update({resource.uri: resource for resource in resourcelist.resources})
+                    self.date_resourcelist_completed = header.md_at
 
             # search for changelists
-            self.changelist_files = sorted(glob(self.param.abs_metadata_path("changelist_*.xml")))
+            self.changelist_files = self.catalog().paths(Capability.changelist.name)
             for cl_file_name in self.changelist_files:
-                changelist = ChangeList()
-                with open(cl_file_name, "r", encoding="utf-8") as cl_file:
-                    sm = Sitemap()
-                    sm.parse_xml(cl_file, resources=changelist)
-
-                for resource in changelist.resources:
+                for resource in reader.iter_resources(cl_file_name):
                     if resource.change == "created" or resource.change == "updated":
-                        self.previous_resources.update({resource.uri: resource})
+                        self.previous_resources.add(resource)
                     elif resource.change == "deleted" and resource.uri in self.previous_resources:
                         del self.previous_resources[resource.uri]
 
-    def changelist_generator(self, resource_metadata: [Resource]) -> iter:
-
-        def generator(changelist=None) -> [SitemapData, ChangeList]:
-            resource_generator = self.resource_generator()
-            self.update_previous_state()
-            prev_r = self.previous_resources
-            curr_r = {resource.uri: resource for count, resource in resource_generator(resource_metadata)}
-            created = [r for r in curr_r.values() if r.uri not in prev_r]
-            updated = [r for r in curr_r.values() if r.uri in prev_r and r.md5 != prev_r[r.uri].md5]
-            deleted = [r for r in prev_r.values() if r.uri not in curr_r]
-            unchang = [r for r in curr_r.values() if r.uri in prev_r and r.md5 == prev_r[r.uri].md5]
-
-            # remove lastmod from deleted resource metadata
-            for resource in deleted:
+    def update_previous_documents(self):
+        """
+        :samp:`Find previous documents without reading the previously published state`
+
+        Sets the lists of resourcelist and changelist files and the completion date of the last resourcelist.
+        """
+        catalog = self.catalog()
+        self.resourcelist_files = catalog.paths(Capability.resourcelist.name)
+        self.changelist_files = catalog.paths(Capability.changelist.name)
+        if len(self.resourcelist_files) > 0:
+            entry = catalog.entry(self.resourcelist_files[-1])
+            self.date_resourcelist_completed = entry["md_completed"]
+            if self.date_resourcelist_completed is None:
+                self.date_resourcelist_completed = entry["md_at"]
+
+    def detected_changes(self, resource_metadata: [Resource]) -> dict:
+        """
+        :samp:`Compare all resources to the previously published state`
+
+        See :func:`~resourcesync.core.store.detect_changes` and :param:`is_lenient_change_detection`.
+
+        :param resource_metadata: iter over all current resources
+        :return: dict of change type to list of resources
+        """
+        resource_generator = self.resource_generator()
+        self.update_previous_state()
+        all_changes, unchanged = detect_changes(
+            self.previous_resources, (resource for count, resource in resource_generator(resource_metadata)),
+            lenient=self.param.is_lenient_change_detection)
+
+        self.observers_inform(self, ExecutorEvent.found_changes, created=len(all_changes["created"]),
+                              updated=len(all_changes["updated"]), deleted=len(all_changes["deleted"]),
+                              unchanged=unchanged)
+        return all_changes
+
+    def reported_changes(self, resource_metadata: [Resource]) -> iter:
+        """
+        :samp:`Stream the changes as reported by the generator`
+
+        The resources are passed on in the order of the generator, without comparing them to the previously
+        published state. :attr:`ExecutorEvent.found_changes` is fired when the generator is exhausted.
+
+        :param resource_metadata: iter over changed resources, each with its change set
+        :return: iter over the resources with a valid change
+        """
+        resource_generator = self.resource_generator()
+        counts = {"created": 0, "updated": 0, "deleted": 0}
+        for count, resource in resource_generator(resource_metadata):
+            if resource.change not in counts:
+                LOG.warning("Resource %s does not report a valid change: %s" % (resource.uri, resource.change))
+                continue
+            if resource.change == "deleted":
                 resource.lastmod = None
+            counts[resource.change] += 1
+            yield resource
+
+        self.observers_inform(self, ExecutorEvent.found_changes, created=counts["created"],
+                              updated=counts["updated"], deleted=counts["deleted"], unchanged=None)
 
-            num_created = len(created)
-            num_updated = len(updated)
-            num_deleted = len(deleted)
-            tot_changes = num_created + num_updated + num_deleted
-            self.observers_inform(self, ExecutorEvent.found_changes, created=num_created, updated=num_updated,
-                                  deleted=num_deleted, unchanged=len(unchang))
-            all_changes = {"created": created, "updated": updated, "deleted": deleted}
+    @staticmethod
+    def changed_resources(all_changes: dict) -> iter:
+        for change, resources in all_changes.items():
+            for resource in resources:
+                resource.change = change # type of change: created, updated or deleted
+                yield resource
+
+    def changelist_generator(self, resource_metadata: [Resource]) -> iter:
+
+        def generator(changelist=None, append_path=None) -> [SitemapData, ChangeList]:
+            if self.generator_reports_changes():
+                changes = self.reported_changes(resource_metadata)
+            else:
+                changes = self.changed_resources(self.detected_changes(resource_metadata))
+            tot_changes = 0
 
             ordinal = self.find_ordinal(Capability.changelist.name)
 
+            max_items_in_list = self.derived().max_items_in_list
             resource_count = 0
-            if changelist:
+            if append_path:
+                # the new resources of the last changelist are appended to the saved document
+                ordinal -= 1
+                resource_count = self.catalog().entry(append_path)["resource_count"]
+                changelist = ChangeList()
+            elif changelist:
                 ordinal -= 1
                 resource_count = len(changelist)
-                if resource_count >= self.param.max_items_in_list:
-                    changelist = None
+            if resource_count >= max_items_in_list:
+                changelist = None
+                append_path = None
+                ordinal += 1
+                resource_count = 0
+
+            def finish(changelist):
+                if append_path:
+                    return self.append_sitemap(ordinal, append_path, changelist, resource_count)
+                return self.finish_sitemap(ordinal, changelist)
+
+            for resource in changes:
+                if changelist is None:
+                    changelist = ChangeList()
+                    changelist.md_from = self.date_changelist_from
+
+                resource.md_datetime = self.date_start_processing
+                changelist.add(resource)
+                resource_count += 1
+                tot_changes += 1
+
+                # under conditions: yield the current changelist
+                if resource_count % max_items_in_list == 0:
                     ordinal += 1
-                    resource_count = 0
-
-            for kv in all_changes.items():
-                for resource in kv[1]:
-                    if changelist is None:
-                        changelist = ChangeList()
-                        changelist.md_from = self.date_changelist_from
-
-                    resource.change = kv[0] # type of change: created, updated or deleted
-                    resource.md_datetime = self.date_start_processing
-                    changelist.add(resource)
-                    resource_count += 1
-
-                    # under conditions: yield the current changelist
-                    if resource_count % self.param.max_items_in_list == 0:
-                        ordinal += 1
-                        sitemap_data = self.finish_sitemap(ordinal, changelist)
-                        yield sitemap_data, changelist
-                        changelist = None
+                    sitemap_data = finish(changelist)
+                    yield sitemap_data, changelist
+                    changelist = None
+                    append_path = None
 
             # under conditions: yield the current and last changelist
             if changelist and tot_changes > 0:
                 ordinal += 1
-                sitemap_data = self.finish_sitemap(ordinal, changelist)
+                sitemap_data = finish(changelist)
                 yield sitemap_data, changelist
 
         return generator
@@ -167,7 +226,10 @@ class NewChangeListExecutor(ChangeListExecutor):
     those previous changelists by setting their md:until value to now (start_of_processing)
     """
     def generate_rs_documents(self, resource_metadata: [Resource]):
-        self.update_previous_state()
+        if self.generator_reports_changes():
+            self.update_previous_documents()
+        else:
+            self.update_previous_state()
         if len(self.changelist_files) == 0:
             self.date_changelist_from = self.date_resourcelist_completed
         else:
@@ -182,13 +244,13 @@ class NewChangeListExecutor(ChangeListExecutor):
 
     def post_process_documents(self, sitemap_data_iter: iter):
         # change md:until value of older changelists - if we created new changelists.
-        # self.changelist_files was globed before new documents were generated (self.update_previous_state).
+        # self.changelist_files was listed before new documents were generated (self.update_previous_state).
         if len(sitemap_data_iter) > 0 and self.param.is_saving_sitemaps:
             for filename in self.changelist_files:
-                changelist = self.read_sitemap(filename, ChangeList())
-                if changelist.md_until is None:
-                    changelist.md_until = self.date_start_processing
-                    self.save_sitemap(changelist, filename)
+                if self.catalog().entry(filename)["md_until"] is None:
+                    header = read_header(filename)
+                    header.md["md_until"] = self.date_start_processing
+                    self.patch_header(filename, header)
 
 
 class IncrementalChangeListExecutor(ChangeListExecutor):
@@ -197,19 +259,45 @@ class IncrementalChangeListExecutor(ChangeListExecutor):
 
     An :class:`IncrementalChangeListExecutor` adds changes to an already existing changelist every time
     the executor runs
-    (and is_saving_sitemaps).
+    (and is_saving_sitemaps). If publications are staged, the changes are appended to the last saved changelist,
+    without reading its entries, if it is not compressed and its resource count is cataloged. Otherwise the last
+    changelist is read and written again with the changes.
     """
     def generate_rs_documents(self, resource_metadata: iter):
-        self.update_previous_state()
+        if self.generator_reports_changes():
+            self.update_previous_documents()
+        else:
+            self.update_previous_state()
         self.date_changelist_from = self.date_resourcelist_completed
         changelist = None
+        append_path = None
         if len(self.changelist_files) > 0:
-            changelist = self.read_sitemap(self.changelist_files[-1], ChangeList())
+            if self.is_appendable(self.changelist_files[-1]):
+                append_path = self.changelist_files[-1]
+            else:
+                changelist = self.read_sitemap(self.changelist_files[-1], ChangeList())
 
         sitemap_data_iter = []
         generator = self.changelist_generator(resource_metadata)
 
-        for sitemap_data, changelist in generator(changelist=changelist):
+        for sitemap_data, changelist in generator(changelist=changelist, append_path=append_path):
             sitemap_data_iter.append(sitemap_data)
 
         return sitemap_data_iter
+
+    def is_appendable(self, path) -> bool:
+        """
+        :samp:`Can changes be appended to the changelist at path`
+
+        :param str path: the local path of a changelist
+        :return: **True** if publications are staged, the changelist is saved uncompressed, as the current parameters
+            would save it, and its resource count is cataloged, **False** otherwise
+        """
+        derived = self.derived()
+        # an append is not atomic, clients could read a changelist without closing root element
+        if not self.param.is_staging_publication:
+            return False
+        if not derived.is_saving_sitemaps or is_compressed(path) or not path.endswith(derived.document_extension):
+            return False
+        entry = self.catalog().entry(path)
+        return entry is not None and entry["resource_count"] is not None
@@ -3,7 +3,6 @@
 :samp:`Executor creating resourcedumps`
 
 """
-import os
 
 from resync.dump import Dump, DumpError
 from resourcesync.core.executors import Executor, SitemapData
@@ -43,10 +42,9 @@ class ResourceDumpExecutor(Executor):
             resourcelist_index.sitemapindex = True
             resourcelist_index.md_at = self.date_start_processing
             resourcelist_index.md_completed = self.date_end_processing
-            index_path = self.param.abs_metadata_path("resourcedump-index.xml")
-            rel_index_path = os.path.relpath(index_path, self.param.resource_dir)
-            index_url = self.param.url_prefix + defaults.sanitize_url_path(rel_index_path)
-            resourcelist_index.link_set(rel="up", href=self.param.capabilitylist_url())
+            index_path = self.derived().abs_document_path("resourcedump-index")
+            index_url = self.derived().uri_from_path(index_path)
+            resourcelist_index.link_set(rel="up", href=self.derived().capabilitylist_url)
 
             for resource in rdumps_iter:
                 print(resource.uri)
@@ -62,6 +60,7 @@ class ResourceDumpExecutor(Executor):
             ordinal = self.find_ordinal(Capability.resourcedump.name)
             resource_count = 0
             doc_start = None
+            max_items_in_list = self.derived().max_items_in_list
             resource_generator = self.resource_generator()
             for resource_count, resource in resource_generator(resource_metadata):
                 # stuff resource into resourcedump
@@ -74,7 +73,7 @@ class ResourceDumpExecutor(Executor):
                 resourcedump.add(resource)
 
                 # under conditions: yield the current resourcedump
-                if resource_count % self.param.max_items_in_list == 0:
+                if resource_count % max_items_in_list == 0:
                     ordinal += 1
                     doc_end = defaults.w3c_now()
                     resourcedump.md_completed = doc_end
@@ -82,6 +81,7 @@ class ResourceDumpExecutor(Executor):
                     zipf = self.param.abs_metadata_path("rd_" + str(ordinal) + ".zip")
 
                     print (str(zipf))
+                    defaults.break_hard_link(zipf, copy=False)
                     d.write_zip(resources=resourcedump, dumpfile=zipf)
                     dumpResource = Resource(uri=str(zipf))
                     yield dumpResource
@@ -98,6 +98,7 @@ class ResourceDumpExecutor(Executor):
                 print (str(zipf))
                 dumpResource = Resource(uri=str(zipf))
                 yield dumpResource
+                defaults.break_hard_link(zipf, copy=False)
                 d.write_zip(resources=resourcedump, dumpfile=zipf)
        
         return generator
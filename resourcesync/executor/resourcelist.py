@@ -3,28 +3,107 @@
 :samp:`Executor creating resourcelists`
 
 """
+import logging
 import os
+from itertools import islice
 
 from resync import Resource
 from resync import ResourceList
+from resourcesync.core.checkpoint import Checkpoint, CHECKPOINT_FILENAME
 from resourcesync.core.executors import Executor, SitemapData
+from resourcesync.core.generator import Generator
+from resourcesync.core.shards import ShardSpill, resource_from_state, shard_digest, shard_of
 from resourcesync.parameters.enum import Capability
+from resourcesync.parameters.parameters import Parameters
 from resourcesync.utils import defaults
 
+LOG = logging.getLogger(__name__)
+
 
 class ResourceListExecutor(Executor):
     """
     :samp:`Executes the new resourcelist strategy`
 
     A ResourceListExecutor clears the metadata directory and creates new resourcelist(s) every time
-    the executor runs (and is_saving_sitemaps).
+    the executor runs (and is_saving_sitemaps). If is_checkpointing, an interrupted execution is resumed
+    after the last resourcelist it saved.
     """
+    stages_previous_documents = False
+
+    def __init__(self, parameters: Parameters=None, generator: Generator=None):
+        Executor.__init__(self, parameters, generator)
+        self.checkpoint = None
+        self.resumed_generator = False
+        # ordinal of finished resourcelists to (resource count, resume token) at the time they were finished
+        self.positions = {}
+
+    def resume_generator(self):
+        self.checkpoint = self.load_checkpoint()
+        if self.checkpoint is not None and self.checkpoint.resume_token is not None and self.generator is not None:
+            self.generator.resume(self.checkpoint.resume_token)
+            self.resumed_generator = True
+
+    def load_checkpoint(self):
+        if not self.param.is_checkpointing or not self.param.is_saving_sitemaps or self.param.is_staging_publication:
+            return None
+        return Checkpoint.load(self.param.abs_metadata_path(CHECKPOINT_FILENAME), Capability.resourcelist.name)
+
     def prepare_metadata_dir(self):
-        if self.param.is_saving_sitemaps:
+        if not self.param.is_saving_sitemaps:
+            return
+        if self.checkpoint is None:
+            self.checkpoint = self.load_checkpoint()
+        if self.checkpoint is None:
             self.clear_metadata_dir()
+            if self.param.is_checkpointing and not self.param.is_staging_publication:
+                self.checkpoint = Checkpoint(self.param.abs_metadata_path(CHECKPOINT_FILENAME),
+                                             Capability.resourcelist.name, self.date_start_processing)
+                self.checkpoint.save()
+        else:
+            LOG.info("Resuming execution of %s after resourcelist %d, %d resources"
+                     % (self.checkpoint.date_start_processing, self.checkpoint.ordinal,
+                        self.checkpoint.resource_count))
+            self.date_start_processing = self.checkpoint.date_start_processing
+            # resourcelists saved after the last checkpoint are generated again
+            for path in self.catalog().paths(Capability.resourcelist.name):
+                if self.catalog().entry(path)["ordinal"] > self.checkpoint.ordinal:
+                    self.remove_document(path)
 
-    def generate_rs_documents(self, resource_metadata: [Resource]) -> [SitemapData]:
+    def checkpointed_sitemap_data(self) -> [SitemapData]:
+        """
+        :samp:`Sitemap data of the resourcelists saved before the execution was interrupted`
+
+        :return: list of :class:`SitemapData`
+        """
+        derived = self.derived()
         sitemap_data_iter = []
+        for document in self.checkpoint.documents if self.checkpoint else []:
+            path = derived.abs_metadata_path(document["file_name"])
+            sitemap_data = SitemapData(document["resource_count"], document["ordinal"], derived.uri_from_path(path),
+                                       path, Capability.resourcelist.name, document_saved=True)
+            sitemap_data.doc_start = document["doc_start"]
+            sitemap_data.doc_end = document["doc_end"]
+            sitemap_data_iter.append(sitemap_data)
+        return sitemap_data_iter
+
+    def on_document_saved(self, sitemap_data: SitemapData):
+        if self.checkpoint is not None and sitemap_data.ordinal in self.positions:
+            resource_count, resume_token = self.positions.pop(sitemap_data.ordinal)
+            # a resumed execution finds the documents saved before the checkpoint in the catalog
+            self.catalog().save()
+            self.checkpoint.record(os.path.basename(sitemap_data.path), sitemap_data.ordinal, resource_count,
+                                   sitemap_data.resource_count, resume_token=resume_token,
+                                   doc_start=sitemap_data.doc_start, doc_end=sitemap_data.doc_end)
+
+    def update_resource_sync(self, capabilitylist_data):
+        sitemap_data = Executor.update_resource_sync(self, capabilitylist_data)
+        if self.checkpoint is not None:
+            self.checkpoint.remove()
+            self.checkpoint = None
+        return sitemap_data
+
+    def generate_rs_documents(self, resource_metadata: [Resource]) -> [SitemapData]:
+        sitemap_data_iter = self.checkpointed_sitemap_data()
         generator = self.resourcelist_generator(resource_metadata)
         for sitemap_data, sitemap in generator():
             sitemap_data_iter.append(sitemap_data)
@@ -37,10 +116,9 @@ class ResourceListExecutor(Executor):
             resourcelist_index.sitemapindex = True
             resourcelist_index.md_at = self.date_start_processing
             resourcelist_index.md_completed = self.date_end_processing
-            index_path = self.param.abs_metadata_path("resourcelist-index.xml")
-            rel_index_path = os.path.relpath(index_path, self.param.resource_dir)
-            index_url = self.param.url_prefix + defaults.sanitize_url_path(rel_index_path)
-            resourcelist_index.link_set(rel="up", href=self.param.capabilitylist_url())
+            index_path = self.derived().abs_document_path("resourcelist-index")
+            index_url = self.derived().uri_from_path(index_path)
+            resourcelist_index.link_set(rel="up", href=self.derived().capabilitylist_url)
 
             for sitemap_data in sitemap_data_iter:
                 resourcelist_index.add(Resource(uri=sitemap_data.uri, md_at=sitemap_data.doc_start,
@@ -56,9 +134,16 @@ class ResourceListExecutor(Executor):
             resourcelist = None
             ordinal = self.find_ordinal(Capability.resourcelist.name)
             resource_count = 0
+            if self.checkpoint is not None:
+                resource_count = self.checkpoint.resource_count
+            resources = resource_metadata
+            if resource_count > 0 and not self.resumed_generator:
+                # skip the resources in resourcelists saved before the execution was interrupted
+                resources = islice(resource_metadata, resource_count, None)
             doc_start = None
+            max_items_in_list = self.derived().max_items_in_list
             resource_generator = self.resource_generator()
-            for resource_count, resource in resource_generator(resource_metadata):
+            for resource_count, resource in resource_generator(resources, count=resource_count):
                 # stuff resource into resourcelist
                 if resourcelist is None:
                     resourcelist = ResourceList()
@@ -68,10 +153,11 @@ class ResourceListExecutor(Executor):
                 resourcelist.add(resource)
 
                 # under conditions: yield the current resourcelist
-                if resource_count % self.param.max_items_in_list == 0:
+                if resource_count % max_items_in_list == 0:
                     ordinal += 1
                     doc_end = defaults.w3c_now()
                     resourcelist.md_completed = doc_end
+                    self.positions[ordinal] = (resource_count, self.generator_resume_token())
                     sitemap_data = self.finish_sitemap(ordinal, resourcelist, doc_start=doc_start, doc_end=doc_end)
                     yield sitemap_data, resourcelist
                     resourcelist = None
@@ -81,7 +167,101 @@ class ResourceListExecutor(Executor):
                 ordinal += 1
                 doc_end = defaults.w3c_now()
                 resourcelist.md_completed = doc_end
+                self.positions[ordinal] = (resource_count, self.generator_resume_token())
                 sitemap_data = self.finish_sitemap(ordinal, resourcelist, doc_start=doc_start, doc_end=doc_end)
                 yield sitemap_data, resourcelist
 
         return generator
+
+
+class ShardedResourceListExecutor(ResourceListExecutor):
+    """
+    :samp:`Executes the new resourcelist strategy with resources divided over shards`
+
+    A ShardedResourceListExecutor puts every resource in the resourcelist of its shard, which is determined by
+    a stable hash of its uri (see :func:`shard_of`). Resourcelists of shards whose resources did not change since
+    the previous execution are kept, all other documents in the metadata directory are replaced every time the
+    executor runs (and is_saving_sitemaps). If max_serialization_workers, the resourcelists of changed shards are
+    written in parallel.
+    """
+    # resourcelists of unchanged shards are kept
+    stages_previous_documents = True
+
+    def __init__(self, parameters: Parameters=None, generator: Generator=None):
+        ResourceListExecutor.__init__(self, parameters, generator)
+        # ordinal of finished resourcelists to the digest of their shard
+        self.shard_digests = {}
+
+    def shard_of(self, uri) -> int:
+        """
+        :samp:`The shard of a uri`
+
+        Subclasses that want to divide resources differently, i.e. by prefix of their uri, may override.
+
+        :param str uri: the uri of a resource
+        :return: the shard, a number from 0 up to resourcelist_shards
+        """
+        return shard_of(uri, self.param.resourcelist_shards)
+
+    def shard_path(self, shard):
+        return self.derived().abs_document_path(Capability.resourcelist.name + self.format_ordinal(shard))
+
+    def load_checkpoint(self):
+        # shards are written when all resources are generated, there is no progress to resume
+        return None
+
+    def prepare_metadata_dir(self):
+        if self.param.is_saving_sitemaps:
+            self.clear_metadata_dir(keep=[self.shard_path(shard) for shard in range(self.param.resourcelist_shards)])
+
+    def generate_rs_documents(self, resource_metadata: [Resource]) -> [SitemapData]:
+        sitemap_data_iter = []
+        with ShardSpill(self.param.resourcelist_shards, directory=self.param.abs_metadata_dir()) as spill:
+            resource_generator = self.resource_generator()
+            for count, resource in resource_generator(resource_metadata):
+                shard = self.shard_of(resource.uri)
+                if spill.add(shard, resource) > self.param.max_items_in_list:
+                    raise ValueError("More than %d resources in shard %d, increase resourcelist_shards"
+                                     % (self.param.max_items_in_list, shard))
+
+            unchanged = 0
+            for shard in range(self.param.resourcelist_shards):
+                path = self.shard_path(shard)
+                states = spill.states(shard)
+                if len(states) == 0:
+                    if self.param.is_saving_sitemaps:
+                        self.remove_document(path)
+                    continue
+
+                digest = shard_digest(states)
+                entry = self.catalog().entry(path)
+                if entry is not None and entry.get("shard_digest") == digest and os.path.exists(path):
+                    sitemap_data_iter.append(self.unchanged_sitemap_data(shard, entry))
+                    unchanged += 1
+                    continue
+
+                resourcelist = ResourceList()
+                doc_start = defaults.w3c_now()
+                resourcelist.md_at = doc_start
+                for state in states:
+                    resourcelist.add(resource_from_state(state))
+                doc_end = defaults.w3c_now()
+                resourcelist.md_completed = doc_end
+                self.shard_digests[shard] = digest
+                sitemap_data_iter.append(self.finish_sitemap(shard, resourcelist, doc_start=doc_start,
+                                                             doc_end=doc_end))
+
+        LOG.info("Resourcelists of %d shards unchanged, %d written" % (unchanged, len(self.shard_digests)))
+        return sitemap_data_iter
+
+    def unchanged_sitemap_data(self, shard, entry) -> SitemapData:
+        path = self.shard_path(shard)
+        sitemap_data = SitemapData(entry["resource_count"], shard, self.derived().uri_from_path(path), path,
+                                   Capability.resourcelist.name, document_saved=True)
+        sitemap_data.doc_start = entry["md_at"]
+        sitemap_data.doc_end = entry["md_completed"]
+        return sitemap_data
+
+    def on_document_saved(self, sitemap_data: SitemapData):
+        if sitemap_data.capability_name == Capability.resourcelist.name and sitemap_data.ordinal in self.shard_digests:
+            self.catalog().annotate(sitemap_data.path, shard_digest=self.shard_digests.pop(sitemap_data.ordinal))
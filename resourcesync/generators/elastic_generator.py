@@ -26,6 +26,11 @@ class ElasticGenerator(Generator):
         self.elastic_params = ElasticParameters(**params)
         self.query_manager = ElasticQueryManager(self.elastic_params.elastic_host, self.elastic_params.elastic_port)
 
+    @property
+    def reports_changes(self):
+        # in change strategy mode the generated resources are the changes recorded in the change doc type
+        return self.elastic_params.strategy != Strategy.resourcelist.value
+
     def generate(self) -> [Resource]:
 
             elastic_page_generator = self.elastic_page_generator()
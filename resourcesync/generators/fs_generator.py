@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+"""
+:samp:`A Filesystem Generator.`
+"""
+import logging
+import os
+import sqlite3
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+from resync import Resource
+
+from resourcesync.core.generator import Generator
+from resourcesync.utils import defaults
+
+BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class FileSystemGenerator(Generator):
+    """Generator class for publishing the files found under a directory.
+
+    This generator expects a dictionary supplied via the `params` kwarg with
+    the following keys set:
+
+    resource_dir    the local root directory of the files to publish
+
+    url_prefix      the URL-prefix that substitutes resource_dir when
+        calculating the url of a file
+
+    The following keys are optional:
+
+    exclude_dirs    list of directories that will not be walked, typically
+        the metadata directory where ResourceSync documents are kept
+
+    cache_file      path to a file that keeps the md5 of every file between
+        runs. A file whose (path, size, mtime_ns, inode) did not change since
+        the previous run is not read again.
+
+    max_workers     the amount of threads used for walking directories and
+        hashing files
+    """
+    def __init__(self, params=None, rsxml=None):
+        Generator.__init__(self, params, rsxml=rsxml)
+        self.resource_dir = os.path.abspath(self.params["resource_dir"])
+        self.url_prefix = self.params["url_prefix"]
+        if not self.url_prefix.endswith("/"):
+            self.url_prefix += "/"
+        self.cache_file = self.params.get("cache_file")
+        self.max_workers = self.params.get("max_workers")
+        self.exclude_dirs = {os.path.abspath(d) for d in self.params.get("exclude_dirs") or []}
+        self.exclude_files = set()
+        if self.cache_file:
+            cache_file = os.path.abspath(self.cache_file)
+            self.exclude_files = {cache_file, cache_file + "-journal"}
+        # statistics of the last run
+        self.hashed_count = 0
+        self.cached_count = 0
+
+    def generate(self) -> [Resource]:
+        """Yields a Resource for every regular file under resource_dir.
+
+        Directories are scanned in parallel and files are yielded in
+        breadth-first order, sorted by name within each directory.
+        """
+        self.hashed_count = 0
+        self.cached_count = 0
+        cache = self.load_cache()
+        seen = {}
+        hasher = defaults.FileHasher(algorithms=("md5",), max_workers=self.max_workers)
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            batch = []
+            for file_stat in self.walk(pool):
+                batch.append(file_stat)
+                if len(batch) == BATCH_SIZE:
+                    yield from self.resources_for(batch, cache, seen, hasher)
+                    batch = []
+            yield from self.resources_for(batch, cache, seen, hasher)
+        finally:
+            pool.shutdown(wait=True)
+            hasher.close()
+        self.save_cache(cache, seen)
+
+    def walk(self, pool) -> iter:
+        """Yields (path, os.stat_result) for every regular file under resource_dir."""
+        directories = [self.resource_dir]
+        while directories:
+            next_directories = []
+            for files, sub_directories in pool.map(self.scan_directory, directories):
+                yield from files
+                next_directories.extend(sub_directories)
+            directories = next_directories
+
+    def scan_directory(self, directory):
+        files = []
+        sub_directories = []
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except OSError as err:
+            logger.warning("Cannot scan directory %s: %s", directory, err)
+            return files, sub_directories
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path not in self.exclude_dirs:
+                        sub_directories.append(entry.path)
+                elif entry.path not in self.exclude_files:
+                    st = entry.stat()
+                    if stat.S_ISREG(st.st_mode):
+                        files.append((entry.path, st))
+            except OSError as err:
+                logger.warning("Cannot stat %s: %s", entry.path, err)
+        return files, sub_directories
+
+    def resources_for(self, batch, cache, seen, hasher) -> [Resource]:
+        keys = [(st.st_size, st.st_mtime_ns, st.st_ino) for path, st in batch]
+        to_hash = [path for (path, st), key in zip(batch, keys)
+                   if cache.get(path, (None,))[:3] != key]
+        digests = dict(zip(to_hash, hasher.hash_files(to_hash, ignore_errors=True)))
+        self.hashed_count += len(to_hash)
+        self.cached_count += len(batch) - len(to_hash)
+        for (path, st), key in zip(batch, keys):
+            if path in digests:
+                if digests[path] is None:
+                    logger.warning("Cannot read file %s", path)
+                    continue
+                md5 = digests[path]["md5"]
+            else:
+                md5 = cache[path][3]
+            seen[path] = key + (md5,)
+            rel_path = path[len(self.resource_dir):].lstrip(os.path.sep)
+            yield Resource(uri=self.url_prefix + defaults.sanitize_url_path(rel_path),
+                           length=st.st_size,
+                           lastmod=defaults.w3c_datetime(st.st_mtime),
+                           md5=md5,
+                           mime_type=defaults.mime_type(path))
+
+    def load_cache(self) -> dict:
+        """Returns dict of path to (size, mtime_ns, inode, md5) as saved by the previous run."""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        with closing(sqlite3.connect(self.cache_file)) as conn:
+            self.create_cache_table(conn)
+            rows = conn.execute("SELECT path, size, mtime_ns, inode, md5 FROM files")
+            return {row[0]: tuple(row[1:]) for row in rows}
+
+    def save_cache(self, cache, seen):
+        if not self.cache_file:
+            return
+        changed = [(path,) + value for path, value in seen.items() if cache.get(path) != value]
+        removed = [(path,) for path in cache if path not in seen]
+        with closing(sqlite3.connect(self.cache_file)) as conn, conn:
+            self.create_cache_table(conn)
+            conn.executemany("INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, md5) "
+                             "VALUES (?, ?, ?, ?, ?)", changed)
+            conn.executemany("DELETE FROM files WHERE path = ?", removed)
+        logger.info("Files hashed: %d, digests from cache: %d", self.hashed_count, self.cached_count)
+
+    @staticmethod
+    def create_cache_table(conn):
+        conn.execute("CREATE TABLE IF NOT EXISTS files "
+                     "(path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, md5 TEXT)")
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+"""
+:samp:`A Generator reporting the changes recorded in a change journal.`
+"""
+import logging
+import os
+
+from resync import Resource
+
+from resourcesync.core.generator import Generator
+from resourcesync.generators.fs_generator import FileSystemGenerator
+from resourcesync.utils import defaults
+from resourcesync.utils.journal import ChangeJournal, CREATED, DELETED
+
+logger = logging.getLogger(__name__)
+
+
+class JournalGenerator(Generator):
+    """Generator class for publishing the changes recorded in a
+    :class:`~resourcesync.utils.journal.ChangeJournal`.
+
+    The resources generated have their `change` set to 'created', 'updated'
+    or 'deleted'. Changelist executors publish these changes as reported,
+    without comparing them to the previously published state. The journal is
+    cleared up to the changes generated when :func:`commit` is called after a
+    successful publication.
+
+    If the journal has a rescan marker, because the watcher lost changes, the
+    generator does not report changes. It generates all files under
+    resource_dir, like the
+    :class:`~resourcesync.generators.fs_generator.FileSystemGenerator`, and
+    changelist executors compare these to the previously published state.
+
+    This generator expects a dictionary supplied via the `params` kwarg with
+    the following keys set:
+
+    journal_file    path to the journal file, as written by the
+        :class:`~resourcesync.utils.journal.InotifyWatcher`
+
+    resource_dir    the local root directory of the journaled files
+
+    url_prefix      the URL-prefix that substitutes resource_dir when
+        calculating the url of a file
+
+    The following keys are optional:
+
+    exclude_dirs    list of directories that will not be walked in a full
+        scan, typically the metadata directory
+    """
+
+    def __init__(self, params=None, rsxml=None):
+        Generator.__init__(self, params, rsxml=rsxml)
+        self.journal = ChangeJournal(self.params["journal_file"])
+        self.resource_dir = os.path.abspath(self.params["resource_dir"])
+        self.url_prefix = self.params["url_prefix"]
+        if not self.url_prefix.endswith("/"):
+            self.url_prefix += "/"
+        self.offset = 0
+        self.rescan = None
+
+    @property
+    def reports_changes(self):
+        # decided once per publication, a rescan marker journaled in the mean time is handled by the next one
+        if self.rescan is None:
+            self.rescan = self.journal.needs_rescan()
+            if self.rescan:
+                logger.warning("Changes were lost, publishing a full scan of %s", self.resource_dir)
+        return not self.rescan
+
+    def generate(self) -> [Resource]:
+        if not self.reports_changes:
+            yield from self.generate_all()
+            return
+        self.offset, changes = self.journal.snapshot()
+        for path, change in changes:
+            rel_path = os.path.relpath(path, self.resource_dir)
+            if rel_path.startswith(os.pardir):
+                logger.warning("Journaled path outside of resource_dir: %s", path)
+                continue
+            uri = self.url_prefix + defaults.sanitize_url_path(rel_path)
+            if change != DELETED:
+                try:
+                    st = os.stat(path)
+                    yield Resource(uri=uri, length=st.st_size,
+                                   lastmod=defaults.w3c_datetime(st.st_mtime),
+                                   md5=defaults.md5_for_file(path),
+                                   mime_type=defaults.mime_type(path),
+                                   change=change)
+                    continue
+                except OSError:
+                    # the file disappeared after it was journaled
+                    if change == CREATED:
+                        continue
+                    change = DELETED
+            yield Resource(uri=uri, change=change)
+
+    def generate_all(self) -> [Resource]:
+        self.offset = self.journal.length()
+        fs_generator = FileSystemGenerator(params=self.params)
+        fs_generator.exclude_files.update(os.path.abspath(path) for path in (
+            self.journal.journal_file, self.journal.lock_file, self.journal.tmp_file))
+        yield from fs_generator.generate()
+
+    def commit(self):
+        self.journal.discard(self.offset)
+        self.offset = 0
+        self.rescan = None
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+:samp:`A snapshot of derived parameters`
+
+The derived values of :class:`~resourcesync.parameters.parameters.Parameters`, like
+:func:`~resourcesync.parameters.parameters.Parameters.capabilitylist_url`, are calculated each time they are asked
+for. Executors ask for them for every document they write. A :class:`DerivedParameters` calculates them once, at the
+start of an execution.
+"""
+import os
+
+from resourcesync.utils import defaults
+
+
+class DerivedParameters(object):
+    """
+    :samp:`Derived parameters, calculated once`
+
+    The values do not follow later changes of the parameters they were derived from, a new snapshot is taken for
+    each execution.
+    """
+    def __init__(self, parameters):
+        """
+        :samp:`Initialization`
+
+        :param parameters: :class:`~resourcesync.parameters.parameters.Parameters`, or parameters that wrap them
+        """
+        self.parameters = parameters
+        self.metadata_dir = os.path.normpath(parameters.abs_metadata_dir())
+        self.document_extension = parameters.document_extension()
+        self.max_items_in_list = parameters.max_items_in_list
+        self.zero_fill_filename = parameters.zero_fill_filename
+        self.is_saving_sitemaps = parameters.is_saving_sitemaps
+        self.capabilitylist_path = parameters.abs_document_path("capabilitylist")
+        self.capabilitylist_url = parameters.capabilitylist_url()
+        self.description_path = parameters.abs_description_path()
+        self.description_url = parameters.description_url()
+        self._metadata_prefix = os.path.join(self.metadata_dir, "")
+        # the url of a path in the metadata directory is the url of the directory followed by the file name
+        self._metadata_url = parameters.uri_from_path(self._metadata_prefix + "_")[:-1]
+
+    def abs_metadata_path(self, filename) -> str:
+        """
+        :samp:`The absolute path to file in the metadata directory`
+
+        :param str filename: the filename to position relative to the metadata directory
+        :return: absolute path to file in the metadata directory
+        """
+        return self._metadata_prefix + filename
+
+    def abs_document_path(self, name) -> str:
+        """
+        :samp:`The absolute path to a sitemap in the metadata directory`
+
+        :param str name: the name of the sitemap without extension, i.e. 'changelist-index'
+        :return: absolute path to the sitemap with the :attr:`document_extension`
+        """
+        return self._metadata_prefix + name + self.document_extension
+
+    def uri_from_path(self, path) -> str:
+        """
+        :samp:`Calculate the url of a path`
+
+        Paths in the metadata directory are translated without calculating relative paths. Other paths are
+        translated by the parameters.
+
+        :param str path: the path to calculate the url from
+        :return: the url of the path
+        """
+        if path.startswith(self._metadata_prefix):
+            return self._metadata_url + defaults.sanitize_url_path(path[len(self._metadata_prefix):])
+        return self.parameters.uri_from_path(path)
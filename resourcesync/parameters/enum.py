@@ -166,3 +166,55 @@ class SelectMode(Enum):
                 return SelectMode[mode]
         except KeyError as err:
             raise ValueError(err)
+
+
+class ValidationMode(Enum):
+    """
+    :samp:`Validation of generated resource metadata`
+    """
+    off = 0
+    """
+    ``0`` :samp:`off`
+
+    Resources are not checked.
+    """
+    sample = 1
+    """
+    ``1`` :samp:`sample`
+
+    The first resource and every thousandth resource are checked.
+    """
+    strict = 2
+    """
+    ``2`` :samp:`strict`
+
+    Every resource is checked, resources with violations are not published.
+    """
+    aggregate = 3
+    """
+    ``3`` :samp:`aggregate`
+
+    Every resource is checked, resources with violations are published.
+    """
+
+    @staticmethod
+    def names():
+        """
+        :samp:`Get ValidationMode names`
+
+        :return: List<str> of names
+        """
+        names = dir(ValidationMode)
+        return [x for x in names if not x.startswith("_")]
+
+    @staticmethod
+    def validation_mode_for(mode):
+        try:
+            if isinstance(mode, ValidationMode):
+                return mode
+            elif isinstance(mode, int):
+                return ValidationMode(mode)
+            else:
+                return ValidationMode[mode]
+        except KeyError as err:
+            raise ValueError(err)
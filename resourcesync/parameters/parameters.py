@@ -3,9 +3,11 @@
 import validators
 import os
 import urllib.parse
-from resourcesync.parameters.enum import Strategy
+from resourcesync.parameters.enum import Strategy, ValidationMode
 from numbers import Number
 from resourcesync.utils import defaults
+from resourcesync.rsxml.compression import document_extension
+from resourcesync.parameters.derived import DerivedParameters
 import logging
 from glob import glob
 from configparser import ConfigParser
@@ -18,6 +20,7 @@ CFG_FILENAME = "DEFAULT.cfg"
 CFG_DIRNAME = "core"
 SECTION_CORE = "core"
 EXT = ".cfg"
+LOG = logging.getLogger(__name__)
 
 
 class ParameterUtils(object):
@@ -59,7 +62,7 @@ class ParameterUtils(object):
             raise ValueError("No configuration named '%s'" % name)
         Parameters.reset()
         Parameters._set_configuration_filename(name + EXT)
-        ParameterUtils.__get__logger().info("Loaded configuration %s" % name)
+        ParameterUtils.__get__logger().info("Loaded configuration %s", name)
         return Parameters()
 
     @staticmethod
@@ -79,7 +82,7 @@ class ParameterUtils(object):
         current_cfg = Parameters()
         current_cfg.config_file = config_file
         current_cfg.persist()
-        ParameterUtils.__get__logger().info("Saved configuration %s" % name)
+        ParameterUtils.__get__logger().info("Saved configuration %s", name)
 
     @staticmethod
     def remove_configuration(name: str):
@@ -96,7 +99,7 @@ class ParameterUtils(object):
         config_file = os.path.join(config_path, nam + EXT)
         if os.path.exists(config_file):
             os.remove(config_file)
-            ParameterUtils.__get__logger().info("Removed configuration %s" % name)
+            ParameterUtils.__get__logger().info("Removed configuration %s", name)
             return True
         else:
             return False
@@ -190,6 +193,10 @@ class ParameterUtils(object):
     def get_strategy(value):
         return Strategy.strategy_for(value)
 
+    @staticmethod
+    def get_validation_mode(value):
+        return ValidationMode.validation_mode_for(value)
+
     @staticmethod
     def get_history_dir(path):
         if path and not isinstance(path, str):
@@ -212,6 +219,18 @@ class ParameterUtils(object):
     def assert_zero_fill_filename_range(zfill):
         return ParameterUtils._assert_max_number(zfill, 1, 10, "zero_fill_filename")
 
+    @staticmethod
+    def assert_max_serialization_workers(workers):
+        return ParameterUtils._assert_max_number(workers, 0, 256, "max_serialization_workers")
+
+    @staticmethod
+    def assert_compression_level(level):
+        return ParameterUtils._assert_max_number(level, 0, 9, "compression_level")
+
+    @staticmethod
+    def assert_resourcelist_shards(shards):
+        return ParameterUtils._assert_max_number(shards, 0, 50000, "resourcelist_shards")
+
 
 class Parameters(object):
     """
@@ -356,7 +375,11 @@ class Parameters(object):
     :param str history_dir: ``parameter`` :param:`history_dir`
         ``parameter`` :samp:`Directory for storing reports on executed synchronisations` (str)
 
-        Currently not in use.
+        The directory is relative to the metadata directory. Profiles of executions, see :param:`is_profiling`, are
+        written to this directory.
+
+        ``default:`` **None**, profiles are written to the directory 'resourcesync-profiles' in the temporary
+        directory of the system, outside the published metadata directory
     :param int max_items_in_list: ``parameter`` :param:`max_items_in_list`
         ``parameter`` :samp:`The maximum amount of records in a sitemap` (int, 1 - 50000)
 
@@ -375,12 +398,44 @@ class Parameters(object):
             changelist_0003.xml
 
         ``default:`` 4
+    :param int resourcelist_shards: ``parameter`` :param:`resourcelist_shards`
+        ``parameter`` :samp:`The amount of shards resourcelists are divided in` (int, 0 - 50000)
+
+        With this parameter greater than 0, every resource goes to the resourcelist of its shard, which is
+        determined by a stable hash of its uri. The resourcelist of a shard is only written again if one of its
+        resources changed since the previous execution. Choose enough shards to keep the amount of resources
+        in a shard below :param:`max_items_in_list`.
+
+        ``default:`` 0, resources go to resourcelists in the order in which they are generated
     :param bool is_saving_pretty_xml: ``parameter`` :param:`is_saving_pretty_xml`
         ``parameter`` :samp:`Determines appearance of sitemap xml` (bool)
 
         If no humans need to read or inspect sitemaps there is no need for linebreaks etc.
 
         ``default:`` **True**, with linebreaks
+    :param bool is_saving_fast_xml: ``parameter`` :param:`is_saving_fast_xml`
+        ``parameter`` :samp:`Determines how sitemap xml is written` (bool)
+
+        With this parameter set to **True** sitemaps are written by a serializer that writes strings straight to
+        disk instead of building an element tree first. The documents written are the same.
+
+        ``default:`` **True**, write sitemaps with the fast serializer
+    :param int compression_level: ``parameter`` :param:`compression_level`
+        ``parameter`` :samp:`The gzip compression level of sitemaps` (int, 0 - 9)
+
+        With this parameter greater than 0, sitemaps are gzip compressed while they are written and get the
+        extension `.xml.gz`. Indexes and capabilitylists point to the compressed documents. Sitemaps compress
+        about tenfold, 1 is fastest and 9 compresses best. The description document is never compressed.
+
+        ``default:`` 0, write uncompressed `.xml` sitemaps
+    :param int max_serialization_workers: ``parameter`` :param:`max_serialization_workers`
+        ``parameter`` :samp:`The amount of worker processes that serialize sitemaps` (int, 0 - 256)
+
+        Large sitemaps take time to serialize. With this parameter greater than 0, sitemaps are serialized and
+        written to disk by worker processes, while the executor continues to generate the next sitemaps.
+        The documents written are the same.
+
+        ``default:`` 0, serialize sitemaps in the executing process
     :param bool is_saving_sitemaps: ``parameter`` :param:`is_saving_sitemaps`
         ``parameter`` :samp:`Determines if sitemaps will be written to disk` (bool)
 
@@ -388,6 +443,63 @@ class Parameters(object):
         but not written to disk.
 
         ``default:`` **True**, write sitemaps to disk
+    :param bool is_staging_publication: ``parameter`` :param:`is_staging_publication`
+        ``parameter`` :samp:`Determines if documents are published from a staging directory` (bool)
+
+        With this parameter set to **True** an execution writes its documents to a staging directory next to the
+        metadata directory. The documents are published when the execution completes, an execution that fails
+        leaves the metadata directory untouched. Publication is only atomic if the metadata directory is a symbolic
+        link: the link is swapped to the staging directory in one step. Otherwise the documents are moved into the
+        metadata directory one file at a time, sitemaps before the indexes and capabilitylist that point to them.
+        A reader of the metadata directory can then see a mix of old and new documents while the execution
+        publishes, and an execution that is interrupted while publishing can leave such a mix behind.
+
+        ``default:`` **False**, write documents directly to the metadata directory
+    :param bool is_checkpointing: ``parameter`` :param:`is_checkpointing`
+        ``parameter`` :samp:`Determines if resourcelist executions can be resumed` (bool)
+
+        With this parameter set to **True** the progress of a resourcelist execution is recorded in the metadata
+        directory every time a resourcelist is saved. If the execution is interrupted, the next execution
+        resumes after the last saved resourcelist. A generator that implements
+        :func:`~resourcesync.core.generator.Generator.resume_token` continues where it was, the resources of
+        other generators are generated again and skipped. Executions that stage their documents, see
+        :param:`is_staging_publication`, and sharded executions, see :param:`resourcelist_shards`, are not
+        checkpointed.
+
+        ``default:`` **False**, start every resourcelist execution from scratch
+    :param bool is_lenient_change_detection: ``parameter`` :param:`is_lenient_change_detection`
+        ``parameter`` :samp:`Determines if resources without md5 are compared on length and lastmod` (bool)
+
+        Changelist and changedump executors compare the md5 of generated resources to the md5 of the previously
+        published resources. With this parameter set to **True** a resource of which the md5 is missing, now or
+        before, is unchanged if its length and lastmod did not change. Otherwise such a resource is unchanged
+        only if it had and has no md5.
+
+        ``default:`` **False**, compare md5 values only
+    :param bool is_profiling: ``parameter`` :param:`is_profiling`
+        ``parameter`` :samp:`Determines if the build steps of executions are profiled` (bool)
+
+        With this parameter set to **True** each build step of an execution is profiled with :mod:`cProfile`. A
+        profile and collapsed stacks, for flame graphs, are written per step to the history directory, see
+        :param:`history_dir`, or, if it is not set, to the directory 'resourcesync-profiles' in the temporary
+        directory of the system.
+        Resources that are generated lazily, as by the generators in :mod:`resourcesync.generators`, are generated in
+        the profile of the step 'generate'. Profiling slows down executions.
+
+        ``default:`` **False**, do not profile executions
+    :param Union[ValidationMode, int, str] validation_mode: ``parameter`` :param:`validation_mode`
+        ``parameter`` :samp:`Validation of generated resource metadata` (str | int | :class:`~resourcesync.parameters.enum.ValidationMode`)
+
+        Resources are expected to have a length, md5, lastmod and mime_type. Violations are counted per field and
+        reported in one warning at the end of an execution, and in the event
+        :attr:`~resourcesync.core.executors.ExecutorEvent.execution_end`. Valid values are:
+
+        - ``0`` :attr:`~resourcesync.parameters.enum.ValidationMode.off` - resources are not checked
+        - ``1`` :attr:`~resourcesync.parameters.enum.ValidationMode.sample` - the first and every thousandth resource are checked
+        - ``2`` :attr:`~resourcesync.parameters.enum.ValidationMode.strict` - resources with violations are not published
+        - ``3`` :attr:`~resourcesync.parameters.enum.ValidationMode.aggregate` - every resource is checked
+
+        ``default:`` :attr:`~resourcesync.parameters.enum.ValidationMode.sample`
     :param bool has_wellknown_at_root: ``parameter`` :param:`has_wellknown_at_root`
         ``parameter`` :samp:`Where is the description document {.well-known/resourcesync} on the server` (bool)
 
@@ -432,10 +544,31 @@ class Parameters(object):
         self.__init_param("zero_fill_filename", default=4, convert=None,
                           validator=ParameterUtils.assert_zero_fill_filename_range,
                           metadata={"type": ["int"]}, **kwargs)
+        self.__init_param("resourcelist_shards", default=0, convert=None,
+                          validator=ParameterUtils.assert_resourcelist_shards,
+                          metadata={"type": ["int"]}, **kwargs)
         self.__init_param("is_saving_pretty_xml", default=True, convert=None,
                           validator=None, metadata={"type": ["bool"]}, **kwargs)
+        self.__init_param("is_saving_fast_xml", default=True, convert=None,
+                          validator=None, metadata={"type": ["bool"]}, **kwargs)
+        self.__init_param("compression_level", default=0, convert=None,
+                          validator=ParameterUtils.assert_compression_level,
+                          metadata={"type": ["int"]}, **kwargs)
+        self.__init_param("max_serialization_workers", default=0, convert=None,
+                          validator=ParameterUtils.assert_max_serialization_workers,
+                          metadata={"type": ["int"]}, **kwargs)
         self.__init_param("is_saving_sitemaps", default=True, convert=None,
                           validator=None, metadata={"type": ["bool"]}, **kwargs)
+        self.__init_param("is_staging_publication", default=False, convert=None,
+                          validator=None, metadata={"type": ["bool"]}, **kwargs)
+        self.__init_param("is_checkpointing", default=False, convert=None,
+                          validator=None, metadata={"type": ["bool"]}, **kwargs)
+        self.__init_param("is_lenient_change_detection", default=False, convert=None,
+                          validator=None, metadata={"type": ["bool"]}, **kwargs)
+        self.__init_param("is_profiling", default=False, convert=None,
+                          validator=None, metadata={"type": ["bool"]}, **kwargs)
+        self.__init_param("validation_mode", default=ValidationMode.sample.name,
+                          convert=ParameterUtils.get_validation_mode, validator=None, metadata=None, **kwargs)
         self.__init_param("has_wellknown_at_root", default=True, convert=None,
                           validator=None, metadata={"type": ["bool"]}, **kwargs)
         for key, value in kwargs.items():
@@ -453,7 +586,7 @@ class Parameters(object):
             "validator": validator,
             "metadata": metadata
         }
-        logging.debug("param_dict set for %s\n%s" % (name, self.param_dict.get(name)))
+        Parameters.__get__logger().debug("param_dict set for %s\n%s", name, self.param_dict[name])
         setattr(self, name, self.param_dict[name].get("default"))
 
     def __update_from_config_file(self):
@@ -473,7 +606,7 @@ class Parameters(object):
                     value = self.parser.getboolean(SECTION_CORE, field, fallback=param.get("default"))
                 except ValueError:
                     pass
-            if not value:
+            if value is None:
                 value = self.parser.get(SECTION_CORE, field, fallback=param.get("default"))
             fvalue = self.__convert_and_validate(param, value)
             self.__dict__[field] = fvalue
@@ -499,23 +632,17 @@ class Parameters(object):
 
     def __setattr__(self, key, value):
         if not self.__dict__.get("param_dict"):
-            logging.debug("param_dict not set")
+            Parameters.__get__logger().debug("param_dict not set")
             return
-        Parameters.__get__logger().debug("Setting attribute %s" % key)
         field = self.param_dict.get(key)
-
         if field:
-            fvalue = self.__convert_and_validate(field, value)
-            self.__dict__[key] = fvalue
-            Parameters.__get__logger().debug("Setting attribute %s with value %s" % (key, fvalue))
-        else:
-            self.__dict__[key] = value
-            Parameters.__get__logger().debug("Setting attribute %s with value %s" % (key, value))
+            value = self.__convert_and_validate(field, value)
+        self.__dict__[key] = value
+        Parameters.__get__logger().debug("Setting attribute %s with value %s", key, value)
 
     @staticmethod
     def __get__logger():
-        logger = logging.getLogger(__name__)
-        return logger
+        return LOG
 
     @staticmethod
     def _set_configuration_filename(cfg_filename):
@@ -590,6 +717,23 @@ class Parameters(object):
         """
         return os.path.join(self.abs_metadata_dir(), filename)
 
+    def document_extension(self) -> str:
+        """
+        ``derived`` :samp:`The extension of sitemaps`
+
+        :return: '.xml.gz' if :param:`compression_level` is greater than 0, '.xml' otherwise
+        """
+        return document_extension(self.compression_level)
+
+    def abs_document_path(self, name):
+        """
+        ``derived`` :samp:`The absolute path to a sitemap in the metadata directory`
+
+        :param str name: the name of the sitemap without extension, i.e. 'changelist-index'
+        :return: absolute path to the sitemap with the current :func:`document_extension`
+        """
+        return self.abs_metadata_path(name + self.document_extension())
+
     def abs_description_path(self):
         """
         ``derived`` :samp:`The absolute path to (the local copy of) the file {.well-known/resourcesync}`
@@ -633,11 +777,12 @@ class Parameters(object):
         """
         ``derived`` :samp:`The current capabilitylist url`
 
-        The current capabilitylist url points to 'capabilitylist.xml' in the metadata directory.
+        The current capabilitylist url points to 'capabilitylist.xml', or 'capabilitylist.xml.gz', in the
+        metadata directory.
 
         :return: current capabilitylist url
         """
-        path = self.abs_metadata_path("capabilitylist.xml")
+        path = self.abs_document_path("capabilitylist")
         rel_path = os.path.relpath(path, self.resource_dir)
         return self.url_prefix + defaults.sanitize_url_path(rel_path)
 
@@ -651,13 +796,31 @@ class Parameters(object):
         rel_path = os.path.relpath(path, self.resource_dir)
         return self.url_prefix + defaults.sanitize_url_path(rel_path)
 
+    def derived(self) -> DerivedParameters:
+        """
+        ``derived`` :samp:`A snapshot of the derived parameters`
+
+        :return: :class:`~resourcesync.parameters.derived.DerivedParameters` of the current parameters
+        """
+        return DerivedParameters(self)
+
+    def freeze(self):
+        """
+        ``function`` :samp:`A read-only snapshot of the current parameters`
+
+        The values were validated when they were set, the snapshot copies them without validating them again.
+        Reading a value of the snapshot is as fast as reading an attribute of a plain object, the snapshot cannot
+        be changed. Derived values are calculated as they are by :class:`Parameters`.
+
+        :return: :class:`FrozenParameters` with the current values
+        """
+        return frozen_parameters({name: self.__dict__.get(name) for name in self.param_dict})
+
     def abs_history_dir(self):
         """
         ``derived`` :samp:`The absolute path to directory for reports on synchronizations`
 
-        Currently not in use.
-
-        :return: absolute path to directory for reports
+        :return: absolute path to directory for reports, None if :param:`history_dir` is not set
         """
         if self.history_dir:
             return os.path.join(self.abs_metadata_dir(), self.history_dir)
@@ -666,9 +829,9 @@ class Parameters(object):
 
     def example_filename(self, ordinal):
         if self.strategy == Strategy.resourcelist:
-            return "resourcelist_" + str(ordinal).zfill(self.zero_fill_filename) + ".xml"
+            return "resourcelist_" + str(ordinal).zfill(self.zero_fill_filename) + self.document_extension()
         else:
-            return "changelist_" + str(ordinal).zfill(self.zero_fill_filename) + ".xml"
+            return "changelist_" + str(ordinal).zfill(self.zero_fill_filename) + self.document_extension()
 
     def describe(self, as_string=False, fill=23):
         """
@@ -706,8 +869,17 @@ class Parameters(object):
             [True, "max_items_in_list", self.max_items_in_list],
             [True, "zero_fill_filename", self.zero_fill_filename],
             [False, "example_filename", self.example_filename(42)],
+            [True, "resourcelist_shards", self.resourcelist_shards],
             [True, "is_saving_pretty_xml", self.is_saving_pretty_xml],
+            [True, "is_saving_fast_xml", self.is_saving_fast_xml],
+            [True, "compression_level", self.compression_level],
+            [True, "max_serialization_workers", self.max_serialization_workers],
             [True, "is_saving_sitemaps", self.is_saving_sitemaps],
+            [True, "is_staging_publication", self.is_staging_publication],
+            [True, "is_checkpointing", self.is_checkpointing],
+            [True, "is_lenient_change_detection", self.is_lenient_change_detection],
+            [True, "is_profiling", self.is_profiling],
+            [True, "validation_mode", self.validation_mode],
             [False, "last_execution", self.last_execution]
         ]
         if as_string:
@@ -747,7 +919,7 @@ class Parameters(object):
                 self.parser.remove_option(SECTION_CORE, f)
             else:
                 val = self.__dict__.get(f)
-                if isinstance(val, Strategy):
+                if isinstance(val, (Strategy, ValidationMode)):
                     val = val.name
                 elif type(val) is not str:
                     val = str(val)
@@ -756,3 +928,66 @@ class Parameters(object):
         if on_disk:
             self.persist()
 
+
+class FrozenParameters(object):
+    """
+    :samp:`A read-only snapshot of` :class:`Parameters`
+
+    Created with :func:`Parameters.freeze`. Each set of parameter names has its own subclass with a slot for each
+    parameter.
+    """
+    __slots__ = ()
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Frozen parameters cannot be changed, cannot set '%s'" % key)
+
+    def __delattr__(self, key):
+        raise AttributeError("Frozen parameters cannot be changed, cannot delete '%s'" % key)
+
+    def __reduce__(self):
+        return frozen_parameters, (self.values(),)
+
+    def values(self) -> dict:
+        """
+        :samp:`The parameters of this snapshot`
+
+        :return: dict of parameter name and value
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def freeze(self):
+        return self
+
+    abs_metadata_dir = Parameters.abs_metadata_dir
+    abs_metadata_path = Parameters.abs_metadata_path
+    document_extension = Parameters.document_extension
+    abs_document_path = Parameters.abs_document_path
+    abs_description_path = Parameters.abs_description_path
+    server_root = Parameters.server_root
+    description_url = Parameters.description_url
+    capabilitylist_url = Parameters.capabilitylist_url
+    uri_from_path = Parameters.uri_from_path
+    derived = Parameters.derived
+    abs_history_dir = Parameters.abs_history_dir
+    example_filename = Parameters.example_filename
+
+
+_frozen_classes = {}
+
+
+def frozen_parameters(values: dict) -> FrozenParameters:
+    """
+    :samp:`Create a` :class:`FrozenParameters` :samp:`with the given values`
+
+    :param dict values: parameter name and value, the values are not validated
+    :return: :class:`FrozenParameters`
+    """
+    names = tuple(sorted(values))
+    cls = _frozen_classes.get(names)
+    if cls is None:
+        cls = type("FrozenParameters", (FrozenParameters,), {"__slots__": names})
+        _frozen_classes[names] = cls
+    frozen = cls.__new__(cls)
+    for name in names:
+        object.__setattr__(frozen, name, values[name])
+    return frozen
@@ -95,7 +95,14 @@ Observe execution
 
 :class:`ResourceSync` is a subclass of :class:`~resourcesync.util.observe.Observable`. The executor to which the
 execution is delegated inherits all observers registered with :class:`ResourceSync`. :class:`ResourceSync` it self
-does not fire events.
+does not fire events. After :func:`~resourcesync.utils.observe.Observable.start_dispatch` the events of the executor
+are delivered to observers in a background thread, all events are delivered when :func:`~ResourceSync.execute`
+returns::
+
+    resourcesync.register(my_observer)
+    resourcesync.start_dispatch()
+    resourcesync.execute()
+    resourcesync.stop_dispatch()
 
 .. seealso::  :doc:`resourcesync.util.observe <resourcesync.util.observe>`,
 :class:`resourcesync.core.executors.ExecutorEvent`
@@ -107,7 +114,7 @@ import logging
 from resourcesync.utils.observe import Observable
 from resourcesync.rsxml.rsxml import RsXML
 from resourcesync.parameters.enum import Strategy
-from resourcesync.executor.resourcelist import ResourceListExecutor
+from resourcesync.executor.resourcelist import ResourceListExecutor, ShardedResourceListExecutor
 from resourcesync.executor.resourcedump import ResourceDumpExecutor
 from resourcesync.executor.changedump import ChangeDumpExecutor
 from resourcesync.executor.changedump import NewChangeDumpExecutor
@@ -146,25 +153,34 @@ class ResourceSync(Observable):
     def execute(self):
 
         executor = None
-        if self.params.strategy == Strategy.resourcelist:
-            executor = ResourceListExecutor(parameters=self.params)
-        elif self.params.strategy == Strategy.resourcedump:
-            executor = ResourceDumpExecutor(parameters=self.params)
-        elif self.params.strategy == Strategy.new_changelist:
-            executor = NewChangeListExecutor(parameters=self.params)
-        elif self.params.strategy == Strategy.inc_changelist:
-            executor = IncrementalChangeListExecutor(parameters=self.params)
-        elif self.params.strategy == Strategy.changedump:
-            executor = ChangeDumpExecutor(parameters=self.params)
+        # executors work with a snapshot of the parameters
+        params = self.params.freeze()
+        if params.strategy == Strategy.resourcelist and params.resourcelist_shards > 0:
+            executor = ShardedResourceListExecutor(parameters=params, generator=self.generator)
+        elif params.strategy == Strategy.resourcelist:
+            executor = ResourceListExecutor(parameters=params, generator=self.generator)
+        elif params.strategy == Strategy.resourcedump:
+            executor = ResourceDumpExecutor(parameters=params, generator=self.generator)
+        elif params.strategy == Strategy.new_changelist:
+            executor = NewChangeListExecutor(parameters=params, generator=self.generator)
+        elif params.strategy == Strategy.inc_changelist:
+            executor = IncrementalChangeListExecutor(parameters=params, generator=self.generator)
+        elif params.strategy == Strategy.changedump:
+            executor = ChangeDumpExecutor(parameters=params, generator=self.generator)
         else:
-            raise NotImplementedError("Strategy %s not implemented" % self.params.strategy)
+            raise NotImplementedError("Strategy %s not implemented" % params.strategy)
 
-        LOG.debug("Found executor for the strategy %s." % self.params.strategy)
+        LOG.debug("Found executor for the strategy %s.", params.strategy)
+        executor.register(*self.observers)
+        # the executor delivers events in the background as well
+        executor.dispatcher = self.dispatcher
         LOG.debug("Obtaining list of resource metadata from the generator.")
+        executor.resume_generator()
         resource_metadata = self.get_resource_list()
 
         if executor:
             executor.execute(resource_metadata)
+            self.generator.commit()
 
         self.params.save_configuration(True)
 
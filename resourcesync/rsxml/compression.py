@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+"""
+:samp:`Gzip compressed ResourceSync documents.`
+
+Documents with a name that ends in `.gz` are gzip compressed. They are compressed and decompressed while they are
+written and read, without an uncompressed copy on disk.
+"""
+import gzip
+import io
+
+GZIP_SUFFIX = ".gz"
+XML_EXTENSION = ".xml"
+GZIP_XML_EXTENSION = XML_EXTENSION + GZIP_SUFFIX
+# patterns of the file names of documents in the metadata directory
+DOCUMENT_PATTERNS = ("*" + XML_EXTENSION, "*" + GZIP_XML_EXTENSION)
+DEFAULT_COMPRESSION_LEVEL = 6
+
+
+def is_compressed(path) -> bool:
+    return path.endswith(GZIP_SUFFIX)
+
+
+def document_extension(compression_level) -> str:
+    """
+    :samp:`The extension of documents written with the given compression level`
+
+    :param int compression_level: 0 for uncompressed documents, 1 - 9 for compressed documents
+    :return: '.xml' or '.xml.gz'
+    """
+    return GZIP_XML_EXTENSION if compression_level else XML_EXTENSION
+
+
+def strip_document_extension(file_name) -> str:
+    for extension in (GZIP_XML_EXTENSION, XML_EXTENSION):
+        if file_name.endswith(extension):
+            return file_name[:-len(extension)]
+    return file_name
+
+
+def open_binary(path, mode="rb", compression_level=DEFAULT_COMPRESSION_LEVEL):
+    """
+    :samp:`Open a document in binary mode, compressed if its name ends in .gz`
+
+    :param str path: the local path of the document
+    :param str mode: 'rb' or 'wb'
+    :param int compression_level: compression level of a document opened for writing
+    :return: file object
+    """
+    if is_compressed(path):
+        return gzip.open(path, mode, compresslevel=compression_level or DEFAULT_COMPRESSION_LEVEL)
+    return open(path, mode)
+
+
+def open_text_writer(path, encoding="utf-8", buffer_size=2**16, compression_level=DEFAULT_COMPRESSION_LEVEL):
+    """
+    :samp:`Open a compressed document for writing text`
+
+    Text is collected in a buffer of `buffer_size` bytes before it is compressed.
+
+    :param str path: the local path of the document
+    :param str encoding: the encoding of the text
+    :param int buffer_size: size of the buffer in bytes
+    :param int compression_level: the compression level, 1 - 9
+    :return: text file object
+    """
+    binary = gzip.open(path, "wb", compresslevel=compression_level or DEFAULT_COMPRESSION_LEVEL)
+    return io.TextIOWrapper(io.BufferedWriter(binary, buffer_size=buffer_size), encoding=encoding)
@@ -8,6 +8,8 @@
 
 from resync.sitemap import Sitemap
 
+from resourcesync.rsxml.sitemap_reader import SitemapReader
+
 
 class RsXML(object):
 
@@ -41,8 +43,16 @@ class RsXML(object):
         document was read:
         - False - sitemap
         - True - sitemapindex
+
+        A file handle is read one entry at a time with a
+        :class:`~resourcesync.rsxml.sitemap_reader.SitemapReader`.
         """
 
+        if fh is not None:
+            self.res_container = SitemapReader().read(fh, resources=resources, capability=capability,
+                                                      sitemapindex=sitemapindex)
+            return self.res_container
+
         sitemap = Sitemap()
         self.res_container = sitemap.parse_xml(fh=fh, etree=etree, resources=resources,
                                                capability=capability, sitemapindex=sitemapindex)
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+"""
+:samp:`Reads and patches the header of ResourceSync sitemaps.`
+
+The header of a sitemap is everything before its first entry: the xml declaration, the opening root element and
+the top-level rs:ln and rs:md elements. :func:`write_header` replaces the header of a document that was written
+by an executor, without parsing or rebuilding its entries. :func:`append_entries` adds entries before the closing
+root element of a document. Header and entries are serialized by the
+:class:`~resourcesync.rsxml.sitemap_writer.SitemapWriter`, so a patched document is the same as a document
+written with the new header and all entries from the start.
+"""
+import gzip
+import logging
+import os
+import re
+import shutil
+import tempfile
+
+from resync.sitemap import Sitemap
+
+from resourcesync.rsxml.compression import DEFAULT_COMPRESSION_LEVEL, is_compressed, open_binary
+from resourcesync.rsxml.sitemap_reader import SitemapHeader, SitemapReader
+from resourcesync.rsxml.sitemap_writer import SitemapWriter
+from resourcesync.utils import defaults
+
+LOG = logging.getLogger(__name__)
+
+HEADER_CHUNK_SIZE = 2**13
+# the header ends where the first entry starts, or, if there are no entries, where the root element closes.
+# Markup characters are escaped in attribute values, so these cannot occur within the header.
+HEADER_END = re.compile(rb"[ \t]*<(?:url|sitemap)>|[ \t]*</(?:urlset|sitemapindex)>")
+DECLARED_ENCODING = re.compile(rb"<\?xml[^>]*encoding=['\"]([^'\"]+)['\"]")
+ROOT_START = re.compile(rb"<(?:urlset|sitemapindex)[^>]*>(\n?)")
+CHILD_INDENT = re.compile(rb"\n([ \t]+)<")
+FOOTER_CHUNK_SIZE = 2**10
+FOOTER = re.compile(rb"</(?:urlset|sitemapindex)>\s*$")
+
+
+def read_header(path) -> SitemapHeader:
+    """
+    :samp:`Read the header of the sitemap at path`
+
+    :param str path: the local path of the sitemap
+    :return: the :class:`~resourcesync.rsxml.sitemap_reader.SitemapHeader`
+    """
+    return SitemapReader().read_header(path)
+
+
+def header_span(file) -> bytes:
+    """
+    :samp:`Read the bytes of the header from a file opened in binary mode`
+
+    :param file: file opened for reading in binary mode, positioned at the start
+    :return: the bytes of the header
+    :raises: :exc:`ValueError` if the end of the header is not found
+    """
+    head = b""
+    while True:
+        chunk = file.read(HEADER_CHUNK_SIZE)
+        head += chunk
+        match = HEADER_END.search(head)
+        if match is not None:
+            return head[:match.start()]
+        if not chunk:
+            raise ValueError("No entries or closing root element found in %s" % getattr(file, "name", file))
+
+
+def header_writer(head: bytes) -> (SitemapWriter, str):
+    """
+    :samp:`A writer that produces a header with the same layout as head`
+
+    :param head: the bytes of an existing header
+    :return: a :class:`~resourcesync.rsxml.sitemap_writer.SitemapWriter` and the declared encoding
+    """
+    match = DECLARED_ENCODING.match(head)
+    encoding = match.group(1).decode("ascii") if match else "utf-8"
+    root = ROOT_START.search(head)
+    pretty_xml = root is not None and root.group(1) == b"\n"
+    indent = CHILD_INDENT.search(head, root.end() - 1) if pretty_xml else None
+    return SitemapWriter(pretty_xml=pretty_xml, indent=indent.group(1).decode() if indent else None), encoding
+
+
+def write_header(path, header: SitemapHeader, compression_level=DEFAULT_COMPRESSION_LEVEL):
+    """
+    :samp:`Replace the header of the sitemap at path`
+
+    If the new header has the same length as the old one, it is written in place. Otherwise the new header and
+    the unchanged entries are copied to a temporary file, which replaces the document. Compressed documents,
+    with a path that ends in .gz, are always copied and compressed again.
+
+    :param str path: the local path of the sitemap
+    :param header: the new :class:`~resourcesync.rsxml.sitemap_reader.SitemapHeader`
+    :param int compression_level: the compression level of a compressed document
+    """
+    compressed = is_compressed(path)
+    with open_binary(path) as file:
+        head = header_span(file)
+        writer, encoding = header_writer(head)
+        new_head = writer.header(header, encoding=encoding).encode(encoding)
+        if new_head == head:
+            return
+        # a document with other hard links, i.e. a staged document, is not written in place
+        if len(new_head) != len(head) or compressed or os.fstat(file.fileno()).st_nlink > 1:
+            directory = os.path.dirname(os.path.abspath(path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".header_", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as tmp_file:
+                    out = tmp_file
+                    if compressed:
+                        out = gzip.GzipFile(filename="", mode="wb", fileobj=tmp_file,
+                                            compresslevel=compression_level or DEFAULT_COMPRESSION_LEVEL)
+                    out.write(new_head)
+                    file.seek(len(head))
+                    shutil.copyfileobj(file, out)
+                    out.close()
+                shutil.copymode(path, tmp_path)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+            LOG.debug("Rewrote header of %s", path)
+            return
+
+    with open(path, "r+b") as file:
+        file.write(new_head)
+    LOG.debug("Patched header of %s in place", path)
+
+
+def append_entries(path, sitemap, header: SitemapHeader=None):
+    """
+    :samp:`Append the resources of sitemap to the uncompressed sitemap at path`
+
+    The entries are written in the layout and encoding of the existing document, over its closing root element,
+    which is written again after the new entries. Only the tail of the document is read. If header is given, it
+    replaces the header of the document with :func:`write_header`. The document is changed in place, it has no
+    closing root element until the entries are written. Append to documents that are not yet published, i.e.
+    staged documents.
+
+    :param str path: the local path of the sitemap
+    :param sitemap: the sitemap document with the resources to append
+    :param header: the new :class:`~resourcesync.rsxml.sitemap_reader.SitemapHeader` or None
+    :raises: :exc:`ValueError` if the document is compressed or has no closing root element
+    """
+    if is_compressed(path):
+        raise ValueError("Cannot append to compressed sitemap %s" % path)
+    defaults.break_hard_link(path)
+    with open(path, "r+b") as file:
+        head = header_span(file)
+        writer, encoding = header_writer(head)
+        size = file.seek(0, os.SEEK_END)
+        tail_start = max(len(head), size - FOOTER_CHUNK_SIZE)
+        file.seek(tail_start)
+        match = FOOTER.search(file.read())
+        if match is None:
+            raise ValueError("No closing root element found in %s" % path)
+        entry = writer.entry_serializer(Sitemap(spec_version=sitemap.spec_version, add_lastmod=sitemap.add_lastmod),
+                                        "sitemap" if sitemap.sitemapindex else "url")
+        file.seek(tail_start + match.start())
+        batch = []
+        for resource in sitemap:
+            batch.append(entry(resource))
+            if len(batch) >= writer.batch_size:
+                file.write("".join(batch).encode(encoding))
+                batch = []
+        batch.append(match.group(0).decode(encoding))
+        file.write("".join(batch).encode(encoding))
+        file.truncate()
+    LOG.debug("Appended %d entries to %s", len(sitemap), path)
+    if header is not None:
+        write_header(path, header)
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+
+"""
+:samp:`Reads ResourceSync sitemaps one entry at a time.`
+
+The :class:`SitemapReader` parses sitemaps with `iterparse` and clears every entry after it was converted to a
+:class:`resync.Resource`, so that memory use does not grow with the size of the document. The document header,
+the top-level rs:md and rs:ln elements, can be read on its own without parsing any of the entries.
+"""
+import logging
+import re
+from calendar import timegm
+from datetime import datetime
+
+from defusedxml.ElementTree import iterparse
+from resync import Resource
+from resync.resource_container import ResourceContainer
+from resync.sitemap import SITEMAP_NS, RS_NS, Sitemap, SitemapIndexError, SitemapParseError
+from resync.w3c_datetime import str_to_datetime
+
+from resourcesync.rsxml.compression import open_binary
+
+LOG = logging.getLogger(__name__)
+
+URLSET_TAG = "{%s}urlset" % SITEMAP_NS
+SITEMAPINDEX_TAG = "{%s}sitemapindex" % SITEMAP_NS
+URL_TAG = "{%s}url" % SITEMAP_NS
+SITEMAP_TAG = "{%s}sitemap" % SITEMAP_NS
+LOC_TAG = "{%s}loc" % SITEMAP_NS
+LASTMOD_TAG = "{%s}lastmod" % SITEMAP_NS
+MD_TAG = "{%s}md" % RS_NS
+LN_TAG = "{%s}ln" % RS_NS
+
+W3C_SECONDS = re.compile(r"(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)Z$")
+
+
+def w3c_timestamp(value, context="datetime"):
+    """
+    :samp:`Convert a W3C datetime to a timestamp`
+
+    Datetimes in the form `YYYY-MM-DDThh:mm:ssZ`, as written by executors, are converted without
+    :func:`resync.w3c_datetime.str_to_datetime`, which is slow. Other forms are left to resync.
+
+    :param str value: the W3C datetime
+    :param str context: name of the value in error messages
+    :return: the timestamp, the same as :func:`resync.w3c_datetime.str_to_datetime` returns
+    """
+    match = W3C_SECONDS.match(value) if value else None
+    if match is not None:
+        try:
+            return timegm(datetime(*map(int, match.groups())).timetuple())
+        except ValueError:
+            pass
+    return str_to_datetime(value, context=context)
+
+
+class SitemapHeader(object):
+    """
+    :samp:`The top-level metadata and links of a sitemap`
+
+    """
+    def __init__(self):
+        self.sitemapindex = None
+        self.md = {}
+        self.ln = []
+
+    @property
+    def capability(self):
+        return self.md.get("capability")
+
+    @property
+    def md_at(self):
+        return self.md.get("md_at")
+
+    @property
+    def md_completed(self):
+        return self.md.get("md_completed")
+
+    @property
+    def md_from(self):
+        return self.md.get("md_from")
+
+    @property
+    def md_until(self):
+        return self.md.get("md_until")
+
+    def link(self, rel):
+        """
+        :samp:`The first link with the given relation`
+
+        :param str rel: the relation, i.e. 'up' or 'index'
+        :return: dict with link attributes or None
+        """
+        for ln in self.ln:
+            if ln.get("rel") == rel:
+                return ln
+        return None
+
+    def link_href(self, rel):
+        ln = self.link(rel)
+        return None if ln is None else ln.get("href")
+
+    def link_set(self, rel, href):
+        """
+        :samp:`Set the link with the given relation, overwriting the href of an existing link`
+
+        :param str rel: the relation
+        :param str href: the url the link points to
+        """
+        ln = self.link(rel)
+        if ln is None:
+            self.ln.append({"rel": rel, "href": href})
+        else:
+            ln["href"] = href
+
+
+class SitemapReader(object):
+    """
+    :samp:`Streaming reader for ResourceSync sitemaps`
+
+    Entries are converted with the same rules as :func:`resync.sitemap.Sitemap.parse_xml` uses. Paths that end
+    in .gz are decompressed while they are read.
+    """
+
+    def __init__(self, resource_class=Resource, spec_version="1.1"):
+        """
+        :samp:`Initialization`
+
+        :param resource_class: class of the resources created
+        :param str spec_version: '1.0' or '1.1', see :class:`resync.sitemap.Sitemap`
+        """
+        self.resource_class = resource_class
+        self.sitemap = Sitemap(spec_version=spec_version)
+        self.resources_created = 0
+
+    def read_header(self, source) -> SitemapHeader:
+        """
+        :samp:`Read the header of a sitemap without parsing its entries`
+
+        Parsing stops at the first entry.
+
+        :param source: a path, compressed if it ends in .gz, or a file opened for reading
+        :return: the :class:`SitemapHeader`
+        """
+        header = SitemapHeader()
+        for _ in self._iter_entries(source, header, header_only=True):
+            pass
+        return header
+
+    def iter_resources(self, source, header: SitemapHeader=None) -> iter:
+        """
+        :samp:`Iterate over the entries of a sitemap`
+
+        :param source: a path or a file opened for reading
+        :param header: if given, this :class:`SitemapHeader` is filled in before the first resource is yielded
+        :return: iterator over resources
+        """
+        if header is None:
+            header = SitemapHeader()
+        self.resources_created = 0
+        for element in self._iter_entries(source, header):
+            resource = self.resource_from_element(element)
+            self.resources_created += 1
+            yield resource
+
+    def resource_from_element(self, element) -> Resource:
+        """
+        :samp:`Convert an entry to a resource`
+
+        Follows :func:`resync.sitemap.Sitemap.resource_from_etree`, but converts datetimes with
+        :func:`w3c_timestamp`. Malformed entries are left to resync, to raise the same errors.
+
+        :param element: the url or sitemap element
+        :return: the resource
+        """
+        loc_elements = element.findall(LOC_TAG)
+        lastmod_elements = element.findall(LASTMOD_TAG)
+        md_elements = element.findall(MD_TAG)
+        if len(loc_elements) != 1 or not loc_elements[0].text or len(lastmod_elements) > 1 or len(md_elements) > 1:
+            return self.sitemap.resource_from_etree(element, self.resource_class)
+
+        loc = loc_elements[0].text
+        resource = self.resource_class(uri=loc)
+        if lastmod_elements:
+            resource.timestamp = w3c_timestamp(lastmod_elements[0].text, context="lastmod")
+        if md_elements:
+            md = self.sitemap.md_from_etree(md_elements[0], context=loc)
+            for att in ("capability", "change", "length", "path", "mime_type"):
+                if att in md:
+                    setattr(resource, att, md[att])
+            if "datetime" in md:
+                resource.ts_datetime = w3c_timestamp(md["datetime"], context="ts_datetime")
+            if "hash" in md:
+                try:
+                    resource.hash = md["hash"]
+                except ValueError as e:
+                    LOG.warning("%s in <rs:md> for %s" % (str(e), loc))
+        ln_elements = element.findall(LN_TAG)
+        if ln_elements:
+            resource.ln = [self.sitemap.ln_from_etree(ln_element, loc) for ln_element in ln_elements]
+        return resource
+
+    def read(self, source, resources=None, capability=None, sitemapindex=None):
+        """
+        :samp:`Read a sitemap into a resource container`
+
+        Arguments have the same meaning as the arguments of :func:`resync.sitemap.Sitemap.parse_xml`.
+
+        :param source: a path or a file opened for reading
+        :param resources: the resource container to add resources to
+        :param str capability: if given, the expected capability of the document
+        :param bool sitemapindex: None to read either, True or False to expect a sitemapindex or a sitemap
+        :return: the resource container
+        """
+        if resources is None:
+            resources = ResourceContainer()
+        header = SitemapHeader()
+        resource_iter = self.iter_resources(source, header)
+        first = next(resource_iter, None)
+        self._check_header(header, capability, sitemapindex)
+        if header.md:
+            resources.md = header.md
+        resources.ln.extend(header.ln)
+        if first is not None:
+            resources.add(first)
+            for resource in resource_iter:
+                resources.add(resource)
+        return resources
+
+    def _check_header(self, header, capability, sitemapindex):
+        if sitemapindex is not None and sitemapindex != header.sitemapindex:
+            raise SitemapIndexError("Got %s when expecting %s" % (
+                "sitemapindex" if header.sitemapindex else "sitemap",
+                "sitemapindex" if sitemapindex else "sitemap"))
+        if capability is not None:
+            if "capability" not in header.md:
+                if capability != "resourcelist":
+                    raise SitemapParseError("Expected to read a %s document, but no capability specified in sitemap"
+                                            % capability)
+                LOG.warning("No capability specified in sitemap, assuming resourcelist")
+                header.md["capability"] = "resourcelist"
+            if header.md["capability"] != capability:
+                raise SitemapParseError("Expected to read a %s document, got %s"
+                                        % (capability, header.md["capability"]))
+
+    def _iter_entries(self, source, header, header_only=False):
+        if isinstance(source, str):
+            with open_binary(source) as file:
+                yield from self._iter_entries(file, header, header_only)
+            return
+
+        root = None
+        entry_tag = None
+        depth = 0
+        in_preamble = True
+        seen_md = False
+        for event, element in iterparse(source, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if root is None:
+                    root = element
+                    if element.tag == URLSET_TAG:
+                        header.sitemapindex = False
+                        entry_tag = URL_TAG
+                    elif element.tag == SITEMAPINDEX_TAG:
+                        header.sitemapindex = True
+                        entry_tag = SITEMAP_TAG
+                    else:
+                        raise SitemapParseError("XML is not sitemap or sitemapindex (root element is <%s>)"
+                                                % element.tag)
+                elif depth == 2 and element.tag == entry_tag:
+                    in_preamble = False
+                    if header_only:
+                        return
+                continue
+
+            depth -= 1
+            if depth != 1:
+                continue
+            if element.tag == entry_tag:
+                yield element
+                # drop the entry and everything parsed before it
+                root.clear()
+            elif element.tag == MD_TAG:
+                if not in_preamble:
+                    raise SitemapParseError("Found <rs:md> after first <url> in sitemap")
+                if seen_md:
+                    raise SitemapParseError("Multiple <rs:md> at top level of sitemap")
+                seen_md = True
+                header.md = self.sitemap.md_from_etree(element, "preamble")
+            elif element.tag == LN_TAG:
+                if not in_preamble:
+                    raise SitemapParseError("Found <rs:ln> after first <url> in sitemap")
+                header.ln.append(self.sitemap.ln_from_etree(element, "preamble"))
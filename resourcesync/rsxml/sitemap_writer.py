@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+
+"""
+:samp:`Writes ResourceSync sitemaps without building an element tree.`
+
+The :class:`SitemapWriter` knows the sitemap vocabulary used by ResourceSync documents (urlset, sitemapindex, url,
+sitemap, loc, lastmod, rs:md and rs:ln) and writes escaped strings straight to a buffered file. Without
+indentation, the documents written are byte for byte the same as the documents written by
+:func:`resync.list_base.ListBase.write`, with and without `pretty_xml`.
+"""
+import logging
+
+from resync import Resource
+from resync.list_base import ListBase
+from resync.list_base_with_index import ListBaseWithIndex
+from resync.resource_dump import ResourceDump
+from resync.sitemap import SITEMAP_NS, RS_NS, XML_ATT_NAME, Sitemap
+
+from resourcesync.rsxml.compression import DEFAULT_COMPRESSION_LEVEL, is_compressed, open_binary, open_text_writer
+
+LOG = logging.getLogger(__name__)
+
+# list classes with a write method this writer knows how to reproduce
+SUPPORTED_WRITES = {ListBase.write, ListBaseWithIndex.write, ResourceDump.write}
+
+_CDATA_ESCAPES = (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"))
+_ATTRIB_ESCAPES = _CDATA_ESCAPES + (("\"", "&quot;"), ("\r", "&#13;"), ("\n", "&#10;"), ("\t", "&#09;"))
+
+
+def escape_cdata(text: str) -> str:
+    for char, entity in _CDATA_ESCAPES:
+        if char in text:
+            text = text.replace(char, entity)
+    return text
+
+
+def escape_attrib(text: str) -> str:
+    for char, entity in _ATTRIB_ESCAPES:
+        if char in text:
+            text = text.replace(char, entity)
+    return text
+
+
+def xml_attributes(atts: dict) -> str:
+    """
+    :samp:`Serialize attributes the way resync does`
+
+    Attributes with value None are left out, names are translated to xml attribute names and sorted.
+
+    :param atts: dict of resource attribute names to values
+    :return: the serialized attributes, each preceded by a space, or an empty string
+    """
+    xml_atts = {XML_ATT_NAME.get(att, att): str(val) for att, val in atts.items() if val is not None}
+    return "".join(" %s=\"%s\"" % (name, escape_attrib(xml_atts[name])) for name in sorted(xml_atts))
+
+
+def resync_write(sitemap, path, pretty_xml=False, compression_level=DEFAULT_COMPRESSION_LEVEL):
+    """
+    :samp:`Write sitemap to path with resync`
+
+    :param sitemap: the sitemap document
+    :param str path: the local path of the document, compressed if it ends in .gz
+    :param bool pretty_xml: write the document with linebreaks
+    :param int compression_level: the compression level of a compressed document
+    """
+    sitemap.pretty_xml = pretty_xml
+    if not is_compressed(path):
+        # writing the string sitemap.as_xml() to disk results in encoding=ASCII on some systems.
+        # due to https://docs.python.org/3.4/library/xml.etree.elementtree.html#write
+        sitemap.write(path)
+        return
+    # as_xml declares utf-8
+    with open_binary(path, "wb", compression_level) as file:
+        file.write(sitemap.as_xml().encode("utf-8"))
+
+
+class SitemapWriter(object):
+    """
+    :samp:`Low-allocation writer for ResourceSync sitemaps`
+
+    Entries are serialized as strings and written to the file in batches of `batch_size` entries, so that memory
+    use is bounded by the batch, not by the document.
+    """
+
+    def __init__(self, pretty_xml=False, indent=None, buffer_size=2**16, batch_size=1024,
+                 compression_level=DEFAULT_COMPRESSION_LEVEL):
+        """
+        :samp:`Initialization`
+
+        :param bool pretty_xml: put top-level elements on separate lines, like resync does
+        :param indent: if not None, put every element on a separate line and indent nested elements with
+            this string, or this number of spaces. The output is no longer the same as resync's output
+        :param int buffer_size: size of the file buffer in bytes
+        :param int batch_size: number of entries serialized before they are written
+        :param int compression_level: compression level of documents with a name that ends in .gz
+        """
+        self.pretty_xml = pretty_xml
+        if isinstance(indent, int):
+            indent = " " * indent
+        self.indent = indent
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.compression_level = compression_level
+
+    @staticmethod
+    def supports(sitemap) -> bool:
+        """
+        :samp:`Can sitemap be written by this writer`
+
+        Lists that are too large for one document, and lists with their own way of writing, are not supported.
+
+        :param sitemap: the sitemap document
+        :return: **True** if this writer produces the same document as `sitemap.write`
+        """
+        if not isinstance(sitemap, ListBase) or type(sitemap).write not in SUPPORTED_WRITES:
+            return False
+        if isinstance(sitemap, ListBaseWithIndex):
+            return len(sitemap.resources) <= sitemap.max_sitemap_entries
+        return True
+
+    def write(self, sitemap, path):
+        """
+        :samp:`Write sitemap to path`
+
+        Falls back to `sitemap.write` if the sitemap is not :func:`supports` ed. A document with a name that ends
+        in .gz is compressed while it is written, and encoded in utf-8.
+
+        :param sitemap: the sitemap document
+        :param str path: the local path of the document
+        """
+        if not self.supports(sitemap):
+            LOG.debug("Falling back to resync for %s", type(sitemap).__name__)
+            resync_write(sitemap, path, pretty_xml=self.pretty_xml, compression_level=self.compression_level)
+            return
+        if is_compressed(path):
+            file = open_text_writer(path, buffer_size=self.buffer_size, compression_level=self.compression_level)
+        else:
+            # open with the platform encoding, as resync does, and declare that encoding
+            file = open(path, "w", buffering=self.buffer_size)
+        with file:
+            self.serialize(sitemap, file.write, file.encoding)
+
+    def serialize(self, sitemap, write, encoding="utf-8"):
+        """
+        :samp:`Serialize sitemap`
+
+        :param sitemap: the sitemap document
+        :param write: function that takes a string
+        :param str encoding: the encoding to declare in the xml declaration
+        """
+        if isinstance(sitemap, ListBaseWithIndex):
+            md = dict(sitemap.md)
+            if "capability" not in md and sitemap.capability_name is not None:
+                md["capability"] = sitemap.capability_name
+            resources = iter(sitemap.resources)
+        else:
+            sitemap.default_capability()
+            md = sitemap.md
+            resources = iter(sitemap)
+        entry = self.entry_serializer(Sitemap(spec_version=sitemap.spec_version, add_lastmod=sitemap.add_lastmod),
+                                      "sitemap" if sitemap.sitemapindex else "url")
+        write(self.header(sitemap, md, encoding))
+
+        batch = []
+        for resource in resources:
+            batch.append(entry(resource))
+            if len(batch) >= self.batch_size:
+                write("".join(batch))
+                batch = []
+        batch.append(self.footer(sitemap))
+        write("".join(batch))
+
+    def header(self, sitemap, md=None, encoding="utf-8") -> str:
+        """
+        :samp:`Serialize everything before the first entry`
+
+        :param sitemap: the sitemap document
+        :param md: the top-level metadata, default `sitemap.md`
+        :param str encoding: the encoding to declare in the xml declaration
+        :return: xml declaration, opening root element and top-level rs:ln and rs:md elements
+        """
+        parts = ["<?xml version='1.0' encoding='%s'?>\n" % encoding,
+                 "<%s xmlns=\"%s\" xmlns:rs=\"%s\">" % (self.root_element(sitemap), SITEMAP_NS, RS_NS)]
+        if self.pretty_xml or self.indent is not None:
+            parts.append("\n")
+        for ln in sitemap.ln:
+            parts.append(self.empty_element("rs:ln", ln, 1))
+        parts.append(self.empty_element("rs:md", sitemap.md if md is None else md, 1))
+        return "".join(parts)
+
+    def footer(self, sitemap) -> str:
+        """
+        :samp:`Serialize everything after the last entry`
+
+        :param sitemap: the sitemap document
+        :return: closing root element
+        """
+        return "</%s>" % self.root_element(sitemap)
+
+    @staticmethod
+    def root_element(sitemap) -> str:
+        return "sitemapindex" if sitemap.sitemapindex else "urlset"
+
+    def empty_element(self, name, atts, level, tail=True) -> str:
+        xml_atts = xml_attributes(atts)
+        if not xml_atts:
+            return ""
+        if self.indent is not None:
+            return "%s<%s%s />\n" % (self.indent * level, name, xml_atts)
+        return "<%s%s />%s" % (name, xml_atts, "\n" if tail and self.pretty_xml else "")
+
+    def entry_serializer(self, sitemap: Sitemap, item_element):
+        """
+        :samp:`Function that serializes one resource`
+
+        :param sitemap: a :class:`resync.sitemap.Sitemap` with the spec_version and add_lastmod settings to use
+        :param str item_element: 'url' or 'sitemap'
+        :return: function(resource) -> str
+        """
+        md_att_keys = sitemap.md_att_keys
+        with_datetime = "datetime" in md_att_keys
+        use_datetime = sitemap.spec_1_0 or sitemap.add_lastmod
+        indent = self.indent
+        open_tag = "<%s>" % item_element
+        close_tag = "</%s>" % item_element
+        if indent is not None:
+            open_tag = indent + open_tag + "\n"
+            close_tag = indent + close_tag + "\n"
+            child = indent * 2
+            sep = "\n"
+        else:
+            close_tag += "\n" if self.pretty_xml else ""
+            child = ""
+            sep = ""
+
+        def text_element(name, text):
+            if text:
+                return "%s<%s>%s</%s>%s" % (child, name, escape_cdata(text), name, sep)
+            return "%s<%s />%s" % (child, name, sep)
+
+        def entry(resource) -> str:
+            parts = [open_tag, text_element("loc", resource.uri)]
+            lastmod = resource.lastmod
+            if lastmod is None and use_datetime:
+                lastmod = resource.datetime
+            if lastmod is not None:
+                parts.append(text_element("lastmod", lastmod))
+            if type(resource) is Resource and resource._extra is None:
+                # common case: only attributes kept in slots, written in order of their xml names
+                md = ""
+                if resource.change is not None:
+                    md += " change=\"%s\"" % escape_attrib(resource.change)
+                if with_datetime and resource.ts_datetime is not None:
+                    md += " datetime=\"%s\"" % escape_attrib(resource.datetime)
+                hash = resource.hash
+                if hash is not None:
+                    md += " hash=\"%s\"" % escape_attrib(hash)
+                if resource.length is not None:
+                    md += " length=\"%s\"" % escape_attrib(str(resource.length))
+                if resource.path is not None:
+                    md += " path=\"%s\"" % escape_attrib(str(resource.path))
+                if resource.mime_type is not None:
+                    md += " type=\"%s\"" % escape_attrib(str(resource.mime_type))
+                if md:
+                    parts.append("%s<rs:md%s />%s" % (child, md, sep))
+            else:
+                md = {att: getattr(resource, att, None) for att in md_att_keys}
+                parts.append(self.empty_element("rs:md", md, 2, tail=False))
+            lns = getattr(resource, "ln", None)
+            if lns is not None:
+                for ln in lns:
+                    parts.append(self.empty_element("rs:ln", ln, 2))
+            parts.append(close_tag)
+            return "".join(parts)
+
+        return entry
@@ -4,14 +4,22 @@
 
 """
 import hashlib
+import json
 import mimetypes
+import mmap
+import tempfile
 import time
 import os
+import shutil
 import urllib.parse
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from functools import partial
 
+READ_BLOCK_SIZE = 2**20
+MMAP_THRESHOLD = 2**22
+
 
 def sanitize_url_path(value):
     if value:
@@ -58,18 +66,114 @@ def reformat_datetime(str1):
   datetime_object = datetime.strptime(str1, '%a %b %d %H:%M:%S %Y')
   return datetime_object.strftime("%Y-%m-%dT%H:%M:%SZ")
 
-def md5_for_file(filename, block_size=2**14):
+def md5_for_file(filename, block_size=READ_BLOCK_SIZE):
     """Compute MD5 digest for a file
 
     Optional block_size parameter controls memory used to do MD5 calculation.
     This should be a multiple of 128 bytes.
     """
+    return digests_for_file(filename, algorithms=("md5",), block_size=block_size)["md5"]
+
+
+def digests_for_file(filename, algorithms=("md5", "sha256"), block_size=READ_BLOCK_SIZE,
+                     mmap_threshold=MMAP_THRESHOLD):
+    """Compute several digests for a file in a single pass
+
+    Files smaller than mmap_threshold are read into one reusable buffer of block_size bytes, larger files
+    are memory mapped. Every block is fed to all hash objects before the next block is read.
+
+    :param str filename: the file to hash
+    :param algorithms: names of hashlib algorithms, e.g. ("md5", "sha256")
+    :param int block_size: amount of bytes fed to the hash objects at once
+    :param int mmap_threshold: files of this size or larger are memory mapped
+    :return: dict of algorithm name to hex digest
+    """
+    hashers = [(name, hashlib.new(name)) for name in algorithms]
     with open(filename, mode='rb') as f:
-        d = hashlib.md5()
-        for buf in iter(partial(f.read, block_size), b''):
-            d.update(buf)
-    #return base64.b64encode(d.digest()).decode('utf-8')
-    return d.hexdigest()
+        size = os.fstat(f.fileno()).st_size
+        if size >= mmap_threshold:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                for offset in range(0, size, block_size):
+                    with view[offset:offset + block_size] as block:
+                        for name, d in hashers:
+                            d.update(block)
+        else:
+            buf = bytearray(min(block_size, max(size, 1)))
+            with memoryview(buf) as view:
+                for n in iter(partial(f.readinto, buf), 0):
+                    with view[:n] as block:
+                        for name, d in hashers:
+                            d.update(block)
+    return {name: d.hexdigest() for name, d in hashers}
+
+
+class FileHasher(object):
+    """
+    :samp:`Computes digests for batches of files on a pool of threads`
+
+    hashlib releases the GIL while hashing larger blocks, so files are hashed truly in parallel. Results of
+    :func:`hash_files` are returned in the order of the given filenames::
+
+        with FileHasher(algorithms=("md5", "sha256")) as hasher:
+            for digests in hasher.hash_files(filenames):
+                print(digests["md5"], digests["sha256"])
+
+    """
+    def __init__(self, algorithms=("md5", "sha256"), max_workers=None, block_size=READ_BLOCK_SIZE,
+                 mmap_threshold=MMAP_THRESHOLD):
+        """
+        :samp:`Initialization`
+
+        :param algorithms: names of hashlib algorithms to compute for every file
+        :param int max_workers: size of the thread pool, default is chosen by ThreadPoolExecutor
+        :param int block_size: amount of bytes fed to the hash objects at once
+        :param int mmap_threshold: files of this size or larger are memory mapped
+        """
+        self.algorithms = tuple(algorithms)
+        self.max_workers = max_workers
+        self.block_size = block_size
+        self.mmap_threshold = mmap_threshold
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def hash_file(self, filename):
+        """
+        :samp:`Compute digests for one file in the current thread`
+
+        :param str filename: the file to hash
+        :return: dict of algorithm name to hex digest
+        """
+        return digests_for_file(filename, algorithms=self.algorithms, block_size=self.block_size,
+                                mmap_threshold=self.mmap_threshold)
+
+    def hash_files(self, filenames, ignore_errors=False) -> [dict]:
+        """
+        :samp:`Compute digests for a batch of files in parallel`
+
+        :param filenames: iterable of files to hash
+        :param bool ignore_errors: if **True** files that cannot be read yield **None** instead of raising
+        :return: list of dicts of algorithm name to hex digest, in the order of filenames
+        """
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        func = self._hash_file_or_none if ignore_errors else self.hash_file
+        return list(self._pool.map(func, filenames))
+
+    def _hash_file_or_none(self, filename):
+        try:
+            return self.hash_file(filename)
+        except OSError:
+            return None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
 
 
 def mime_type(filename):
@@ -77,3 +181,61 @@ def mime_type(filename):
     url = urllib.request.pathname2url(filename)
     return mimetypes.guess_type(url)[0]
 
+
+
+def write_json_atomically(path, obj):
+    """Write obj as json to path, replacing an existing file in one step
+
+    The json is written to a temporary file in the same directory, which is
+    synced to disk before it replaces path. Readers see either the old or the
+    new file, also if the process dies while writing.
+    """
+    write_text_atomically(path, json.dumps(obj, indent=1, sort_keys=True))
+
+
+def break_hard_link(path, copy=True):
+    """Give path its own file if the file at path has other hard links
+
+    Staged publications link the published documents into the staging
+    directory. A document is given its own file before it is written, so
+    that the published document does not change.
+
+    :param str path: the path of a file that will be written
+    :param bool copy: True to copy the contents of the file, False to remove
+        the file, if it will be written from scratch
+    """
+    try:
+        if os.stat(path).st_nlink < 2:
+            return
+    except FileNotFoundError:
+        return
+    if not copy:
+        os.remove(path)
+        return
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp",
+                                    prefix="." + os.path.basename(path) + "_")
+    os.close(fd)
+    try:
+        shutil.copy2(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def write_text_atomically(path, text):
+    """Write text to path, replacing an existing file in one step
+
+    See write_json_atomically.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp",
+                                    prefix="." + os.path.basename(path) + "_")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
@@ -0,0 +1,406 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+:samp:`A durable journal of changes to files under a directory`
+
+The :class:`ChangeJournal` keeps created, updated and deleted paths in an append-only file. On Linux the
+:class:`InotifyWatcher` watches a directory tree and records the changes it observes in a :class:`ChangeJournal`.
+The :class:`~resourcesync.generators.journal_generator.JournalGenerator` reads the journal and reports the
+changes to a changelist executor, so that only journaled paths are published. If the watcher lost changes, it
+journals a rescan marker and the generator publishes the next changelist from a full scan of the directory tree.
+
+Run the watcher as a service::
+
+    $ python3 -m resourcesync.utils.journal /var/www/html/resources /var/lib/resourcesync/resources.journal
+
+.. note:: The watcher is based on inotify and is only available on Linux. The files in a directory that is moved
+    out of the watched tree are not known to the watcher, such a move is journaled as a rescan marker.
+"""
+import argparse
+import ctypes
+import ctypes.util
+import errno
+import fcntl
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+from contextlib import contextmanager
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+LOCK_EXTENSION = ".lock"
+TMP_EXTENSION = ".tmp"
+# marker for changes that were lost, the journaled changes are incomplete
+RESCAN = "rescan"
+
+# inotify constants, see <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o0004000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF \
+             | IN_ONLYDIR
+EVENT_HEADER = struct.Struct("iIII")
+
+LOG = logging.getLogger(__name__)
+
+
+class ChangeJournal(object):
+    """
+    :samp:`Append-only, durable journal of changed paths`
+
+    Every change is a line ``{change}\\t{path}`` in the journal file. Writers append under an exclusive lock and
+    sync the file to disk before releasing the lock. The lock is held on a separate lock file, next to the journal
+    file. Readers take a :func:`snapshot` of the coalesced changes and,
+    once these are published, :func:`discard` the journaled lines up to the snapshot, leaving changes that were
+    appended in the mean time untouched. A line ``rescan\t{path}`` marks that changes were lost, see
+    :func:`needs_rescan`. Paths are encoded like the file system encodes them, so paths that are not valid UTF-8
+    are journaled as well.
+    """
+
+    def __init__(self, journal_file, fsync=True):
+        """
+        :samp:`Initialization`
+
+        :param str journal_file: path to the journal file, it is created if it does not exist
+        :param bool fsync: sync the journal to disk after every write
+        """
+        self.journal_file = journal_file
+        self.lock_file = journal_file + LOCK_EXTENSION
+        self.tmp_file = journal_file + TMP_EXTENSION
+        self.fsync = fsync
+
+    @contextmanager
+    def _locked(self, mode):
+        # the journal file is replaced by discard, the lock is held on a file that is never replaced
+        with open(self.lock_file, "ab") as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                with open(self.journal_file, mode) as file:
+                    yield file
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def record(self, change, path):
+        """
+        :samp:`Record one change`
+
+        :param str change: one of 'created', 'updated', 'deleted' or 'rescan'
+        :param str path: the path that changed
+        """
+        self.record_many([(change, path)])
+
+    def record_many(self, changes):
+        """
+        :samp:`Record changes in one write`
+
+        :param changes: iterable of (change, path) tuples
+        """
+        lines = "".join("%s\t%s\n" % (change, path) for change, path in changes
+                        if "\n" not in path)
+        if not lines:
+            return
+        with self._locked("ab") as file:
+            file.write(lines.encode("utf-8", errors="surrogateescape"))
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+
+    def snapshot(self) -> (int, [(str, str)]):
+        """
+        :samp:`Read and coalesce all journaled changes`
+
+        Multiple changes to the same path are coalesced into one. A path that was created and deleted
+        disappears from the snapshot, a path that was deleted and created again is updated. The snapshot ends
+        before the first rescan marker, the marker stays in the journal when the snapshot is discarded.
+
+        :return: the offset up to which the journal was read and a list of (path, change) in order of
+            first appearance
+        """
+        if not os.path.exists(self.journal_file):
+            return 0, []
+        changes = {}
+        with self._locked("rb") as file:
+            data = file.read()
+        offset = 0
+        for line in data.split(b"\n"):
+            change, sep, path = line.decode("utf-8", errors="surrogateescape").partition("\t")
+            if change == RESCAN:
+                break
+            offset += len(line) + 1
+            if not sep:
+                continue
+            previous = changes.get(path)
+            coalesced = self.coalesce(previous, change)
+            if coalesced is None:
+                changes.pop(path, None)
+            else:
+                changes[path] = coalesced
+        return min(offset, len(data)), list(changes.items())
+
+    def needs_rescan(self) -> bool:
+        """
+        :samp:`Were changes lost since the journal was last discarded`
+
+        :return: **True** if the journal contains a rescan marker, **False** otherwise
+        """
+        if not os.path.exists(self.journal_file):
+            return False
+        with self._locked("rb") as file:
+            data = file.read()
+        marker = RESCAN.encode() + b"\t"
+        return any(line.startswith(marker) for line in data.split(b"\n"))
+
+    def length(self) -> int:
+        """
+        :samp:`The offset of the end of the journal`
+
+        :return: the offset after the last journaled change
+        """
+        if not os.path.exists(self.journal_file):
+            return 0
+        with self._locked("rb") as file:
+            return file.seek(0, os.SEEK_END)
+
+    @staticmethod
+    def coalesce(previous, change):
+        if previous is None:
+            return change
+        if previous == CREATED:
+            return None if change == DELETED else CREATED
+        if previous == DELETED:
+            return DELETED if change == DELETED else UPDATED
+        return change if change == DELETED else UPDATED
+
+    def discard(self, offset):
+        """
+        :samp:`Remove journaled changes up to offset`
+
+        The remaining changes are written to a temporary file that replaces the journal file, so that the journal
+        is complete if the process dies while discarding.
+
+        :param int offset: offset as returned by :func:`snapshot`
+        """
+        if offset <= 0 or not os.path.exists(self.journal_file):
+            return
+        with self._locked("rb") as file:
+            file.seek(offset)
+            remainder = file.read()
+            with open(self.tmp_file, "wb") as tmp:
+                tmp.write(remainder)
+                tmp.flush()
+                if self.fsync:
+                    os.fsync(tmp.fileno())
+            os.replace(self.tmp_file, self.journal_file)
+
+
+class InotifyWatcher(object):
+    """
+    :samp:`Watches a directory tree with inotify and records changes in a` :class:`ChangeJournal`
+
+    Files that are written and closed, or whose attributes change, are journaled as updated. New files and files
+    moved into the tree are created, removed files and files moved out of the tree are deleted. Directories that
+    are created or moved into the tree are watched as well and the files found in them are journaled as created.
+    A directory can only be removed when it is empty, the removal of its files is journaled before. Directories
+    moved out of the tree and overflows of the event queue are journaled as a rescan marker.
+    """
+
+    def __init__(self, resource_dir, journal: ChangeJournal, exclude_dirs=None):
+        """
+        :samp:`Initialization`
+
+        :param str resource_dir: the root of the directory tree to watch
+        :param journal: the journal that will record the changes
+        :param exclude_dirs: list of directories that will not be watched, typically the metadata directory
+        """
+        if not sys.platform.startswith("linux"):
+            raise NotImplementedError("InotifyWatcher is only available on Linux. Platform: %s" % sys.platform)
+        self.resource_dir = os.path.abspath(resource_dir)
+        self.journal = journal
+        self.exclude_dirs = {os.path.abspath(d) for d in exclude_dirs or []}
+        self.exclude_files = {os.path.abspath(path) for path in (journal.journal_file, journal.lock_file,
+                                                                  journal.tmp_file)}
+        self.watches = {}
+        self.fd = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+    def open(self):
+        """
+        :samp:`Start watching the directory tree`
+        """
+        if self.fd is None:
+            fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                err = ctypes.get_errno()
+                raise OSError(err, os.strerror(err))
+            self.fd = fd
+            self.add_watches(self.resource_dir)
+
+    def close(self):
+        self.stop()
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+            self.watches.clear()
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def add_watches(self, directory, created=None):
+        """
+        :samp:`Watch directory and all directories under it`
+
+        :param str directory: the directory to watch
+        :param list created: if given, paths of the files found are appended to it
+        """
+        for root, directories, filenames in os.walk(directory):
+            directories[:] = [d for d in directories if os.path.join(root, d) not in self.exclude_dirs]
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(root), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    LOG.error("Inotify watch limit reached, see /proc/sys/fs/inotify/max_user_watches")
+                LOG.warning("Cannot watch %s: %s", root, os.strerror(err))
+                continue
+            self.watches[wd] = root
+            if created is not None:
+                created.extend(os.path.join(root, f) for f in filenames)
+
+    def remove_watches(self, directory):
+        """
+        :samp:`Stop watching directory and all directories under it`
+
+        :param str directory: the directory that is no longer in the watched tree
+        """
+        prefix = os.path.join(directory, "")
+        for wd, path in list(self.watches.items()):
+            if path == directory or path.startswith(prefix):
+                self._libc.inotify_rm_watch(self.fd, wd)
+                del self.watches[wd]
+
+    def read_changes(self, timeout=1.0) -> [(str, str)]:
+        """
+        :samp:`Wait at most timeout seconds for changes`
+
+        :param float timeout: seconds to wait for changes
+        :return: list of (change, path) tuples, empty if nothing changed
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 2**16)
+        except BlockingIOError:
+            return []
+        changes = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            self.handle_event(wd, mask, name, changes)
+        return changes
+
+    def handle_event(self, wd, mask, name, changes):
+        if mask & IN_Q_OVERFLOW:
+            LOG.error("Inotify event queue overflow, changes were lost. The next changelist is a full scan.")
+            changes.append((RESCAN, self.resource_dir))
+            return
+        directory = self.watches.get(wd)
+        if mask & IN_IGNORED:
+            self.watches.pop(wd, None)
+            return
+        if directory is None or not name:
+            return
+        path = os.path.join(directory, name)
+        if path in self.exclude_files or path in self.exclude_dirs:
+            return
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                created = []
+                self.add_watches(path, created=created)
+                changes.extend((CREATED, p) for p in created)
+            elif mask & IN_MOVED_FROM:
+                LOG.warning("Directory moved out of watched tree: %s. The next changelist is a full scan.", path)
+                self.remove_watches(path)
+                changes.append((RESCAN, path))
+            elif mask & IN_DELETE:
+                self.remove_watches(path)
+        elif mask & (IN_CREATE | IN_MOVED_TO):
+            changes.append((CREATED, path))
+        elif mask & (IN_CLOSE_WRITE | IN_ATTRIB):
+            changes.append((UPDATED, path))
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            changes.append((DELETED, path))
+
+    def run(self, timeout=1.0):
+        """
+        :samp:`Journal changes until` :func:`stop` :samp:`is called`
+
+        Changes that arrive within one read are written to the journal at once.
+
+        :param float timeout: seconds between checks for :func:`stop`
+        """
+        self.open()
+        self._stop.clear()
+        while not self._stop.is_set():
+            changes = self.read_changes(timeout)
+            if changes:
+                self.journal.record_many(changes)
+
+    def start(self, timeout=1.0):
+        """
+        :samp:`Journal changes in a background thread`
+        """
+        self.open()
+        self._thread = threading.Thread(target=self.run, kwargs={"timeout": timeout}, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+            self._thread = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Journal changes to files under a directory.")
+    parser.add_argument("resource_dir", help="the root of the directory tree to watch")
+    parser.add_argument("journal_file", help="path to the journal file")
+    parser.add_argument("--exclude", action="append", default=[], help="directory that will not be watched")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    watcher = InotifyWatcher(args.resource_dir, ChangeJournal(args.journal_file), exclude_dirs=args.exclude)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,212 @@
 #! /usr/bin/env python3
 # -*- coding: utf-8 -*-
+"""
+:samp:`Observe events`
+
+An :class:`Observable` informs its observers of events. Observers that are only interested in some events say so
+in :func:`Observer.accepts`, an event that is accepted by none of the observers is not delivered at all. Sources of
+high-frequency events can ask :func:`Observable.has_observers` before they collect the information of an event.
+High-frequency events are opt-in, see :func:`is_opt_in`: they are only delivered to observers that accept them by
+name.
+
+By default observers are informed in the thread that fires the event. After :func:`Observable.start_dispatch`
+events are queued and delivered by an :class:`EventDispatcher` in a background thread, in batches to observers
+that implement :func:`Observer.inform_batch`. Confirmation events are always delivered synchronously, after all
+queued events were delivered.
+"""
 import logging
+import os
+import queue
+import sys
+import threading
+import time
 from abc import ABCMeta, abstractmethod
 
+from resourcesync.utils import defaults
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+LOG = logging.getLogger(__name__)
+
+DISPATCH_BATCH_SIZE = 1000
+DISPATCH_QUEUE_SIZE = 100000
+
 
 class ObserverInterruptException(RuntimeError):
     pass
 
 
+class EventDispatcher(object):
+    """
+    :samp:`Delivers events to observers in a background thread`
+
+    """
+    def __init__(self, batch_size=DISPATCH_BATCH_SIZE, queue_size=DISPATCH_QUEUE_SIZE):
+        """
+        :samp:`Initialization`
+
+        Starts the background thread.
+
+        :param int batch_size: the maximum amount of events delivered to an observer at once
+        :param int queue_size: the maximum amount of queued events, firing an event blocks when the queue is full
+        """
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self._run, name="event-dispatcher", daemon=True)
+        self.thread.start()
+
+    def submit(self, observers, args, kwargs):
+        self.queue.put((observers, args, kwargs))
+
+    def flush(self):
+        """
+        :samp:`Wait until all queued events were delivered`
+
+        """
+        self.queue.join()
+
+    def close(self):
+        """
+        :samp:`Deliver all queued events and stop the background thread`
+
+        """
+        self.queue.put(None)
+        self.thread.join()
+
+    def _run(self):
+        running = True
+        while running:
+            items = [self.queue.get()]
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if items[-1] is None:
+                items.pop()
+                running = False
+            try:
+                self._deliver(items)
+            finally:
+                for _ in range(len(items) + (0 if running else 1)):
+                    self.queue.task_done()
+
+    @staticmethod
+    def _deliver(items):
+        batches = {}
+        for observers, args, kwargs in items:
+            for observer in observers:
+                batches.setdefault(id(observer), (observer, []))[1].append((args, kwargs))
+        for observer, events in batches.values():
+            try:
+                inform_batch = getattr(observer, "inform_batch", None)
+                if inform_batch is None:
+                    for args, kwargs in events:
+                        observer.inform(*args, **kwargs)
+                else:
+                    inform_batch(events)
+            except Exception:
+                LOG.exception("Observer %s failed to handle events", observer)
+
+
+def is_opt_in(event) -> bool:
+    """
+    :samp:`Is an event only delivered to observers that accept it explicitly`
+
+    :param event: the event
+    :return: **True** if the event has a true attribute ``is_opt_in``, **False** otherwise
+    """
+    return getattr(event, "is_opt_in", False)
+
+
 class Observable(object):
     def __init__(self):
         self.observers = []
+        self.dispatcher = None
+        self._accepting = {}
 
     def register(self, *observers):
         for observer in observers:
             if not observer in self.observers:
                 self.observers.append(observer)
+        self._accepting.clear()
 
     def unregister(self, observer):
         if observer in self.observers:
             self.observers.remove(observer)
+        self._accepting.clear()
 
     def unregister_all(self):
         if self.observers:
             del self.observers[:]
+        self._accepting.clear()
+
+    def observers_for(self, event) -> list:
+        """
+        :samp:`The observers that accept an event`
+
+        :param event: the event
+        :return: list of observers
+        """
+        observers = self._accepting.get(event)
+        if observers is None:
+            observers = [observer for observer in self.observers
+                         if (observer.accepts(event) if hasattr(observer, "accepts") else not is_opt_in(event))]
+            self._accepting[event] = observers
+        return observers
+
+    def has_observers(self, event) -> bool:
+        """
+        :samp:`Is an event accepted by any of the observers`
+
+        :param event: the event
+        :return: **True** if at least one observer accepts the event, **False** otherwise
+        """
+        return len(self.observers_for(event)) > 0
+
+    def start_dispatch(self, batch_size=DISPATCH_BATCH_SIZE, queue_size=DISPATCH_QUEUE_SIZE):
+        """
+        :samp:`Inform observers in a background thread`
+
+        :param int batch_size: the maximum amount of events delivered to an observer at once
+        :param int queue_size: the maximum amount of queued events
+        """
+        if self.dispatcher is None:
+            self.dispatcher = EventDispatcher(batch_size=batch_size, queue_size=queue_size)
+
+    def stop_dispatch(self):
+        """
+        :samp:`Deliver queued events and inform observers in the thread that fires events again`
+
+        """
+        if self.dispatcher is not None:
+            self.dispatcher.close()
+            self.dispatcher = None
+
+    def flush_observers(self):
+        """
+        :samp:`Wait until queued events were delivered`
+
+        """
+        if self.dispatcher is not None:
+            self.dispatcher.flush()
 
     def observers_inform(self, *args, **kwargs):
-        for observer in self.observers:
-            observer.inform(*args, **kwargs)
+        observers = self.observers_for(args[1]) if len(args) > 1 else self.observers
+        if not observers:
+            return
+        if self.dispatcher is not None:
+            self.dispatcher.submit(observers, args, kwargs)
+        else:
+            for observer in observers:
+                observer.inform(*args, **kwargs)
 
     def observers_confirm(self, *args, **kwargs):
+        # observers are asked to confirm after they were informed of all previous events
+        self.flush_observers()
         confirm = True
         for observer in self.observers:
             if not observer.confirm(*args, **kwargs):
@@ -42,9 +219,34 @@ class Observable(object):
 class Observer(object):
     __metaclass__ = ABCMeta
 
+    def accepts(self, event) -> bool:
+        """
+        :samp:`Does this observer want to be informed of an event`
+
+        Events that are not accepted are not delivered. The answer for an event should not change while the
+        observer is registered. Observers that want opt-in events, see :func:`is_opt_in`, override and accept them
+        by name.
+
+        :param event: the event
+        :return: **True** by default, **False** for opt-in events
+        """
+        return not is_opt_in(event)
+
     def inform(self, *args, **kwargs):
         pass
 
+    def inform_batch(self, events):
+        """
+        :samp:`Be informed of several events at once`
+
+        Called instead of :func:`inform` by an :class:`EventDispatcher`. Observers that can handle a batch of
+        events more efficiently may override.
+
+        :param events: list of (args, kwargs) of the events
+        """
+        for args, kwargs in events:
+            self.inform(*args, **kwargs)
+
     def confirm(self, *args, **kwargs):
         # raise ObserverInterruptError("Some message")
         # return False
@@ -87,6 +289,9 @@ class EventPrinter(Observer):
         self.event_level = event_level
         self.print_kwargs = print_kwargs
 
+    def accepts(self, event):
+        return not is_opt_in(event) and getattr(event, "value", self.event_level) >= self.event_level
+
     def inform(self, *args, **kwargs):
         if len(args) == 2:
             try:
@@ -114,17 +319,21 @@ class EventLogger(Observer):
         self.logging_level = logging_level
         self.event_level = event_level
 
+    def accepts(self, event):
+        return self.logger.isEnabledFor(self.logging_level) and not is_opt_in(event) \
+            and getattr(event, "value", self.event_level) >= self.event_level
+
     def inform(self, *args, **kwargs):
         if len(args) == 2:
             try:
                 source = args[0].__class__.__name__
                 event = args[1]
                 if event.value >= self.event_level:
-                    self.logger.log(self.logging_level, "%s, %s, %s" % (source, event.name, kwargs))
+                    self.logger.log(self.logging_level, "%s, %s, %s", source, event.name, kwargs)
             except AttributeError:
-                self.logger.warn("unexpected args: " % args)
+                self.logger.warning("unexpected args: %s", args)
         else:
-            self.logger.log(self.logging_level, "%s, %s" % (args, kwargs))
+            self.logger.log(self.logging_level, "%s, %s", args, kwargs)
 
     def confirm(self, *args, **kwargs):
         self.inform(*args, **kwargs)
@@ -136,6 +345,9 @@ class SelectiveEventPrinter(Observer):
     def __init__(self, *events):
         self.events = events
 
+    def accepts(self, event):
+        return self.events is not None and event in self.events
+
     def inform(self, *args, **kwargs):
         if len(args) > 1:
             event = args[1]
@@ -155,6 +367,9 @@ class SelectiveEventLogger(Observer):
         self.logger = logging.getLogger(__name__)
         self.level = level
 
+    def accepts(self, event):
+        return self.events is not None and event in self.events and self.logger.isEnabledFor(self.level)
+
     def inform(self, *args, **kwargs):
         if len(args) > 1:
             event = args[1]
@@ -162,6 +377,142 @@ class SelectiveEventLogger(Observer):
                 if event in self.events:
                     try:
                         source = args[0].__class__.__name__
-                        self.logger.log(self.level, "%s, %s, %s" % (source, event.name, kwargs))
+                        self.logger.log(self.level, "%s, %s, %s", source, event.name, kwargs)
                     except AttributeError:
-                        self.logger.warn("unexpected args: %s" % args)
\ No newline at end of file
+                        self.logger.warning("unexpected args: %s", args)
+
+
+class MetricsObserver(EventObserver):
+    """
+    :samp:`Measures executions`
+
+    Records the wall time and processor time of each build step, the resources and bytes written per document,
+    the throughput of the generate step and the peak resident set size of the process. At the end of an execution
+    the measurements are available in :func:`report` and, if paths were given, written as a json run report and as
+    metrics in the Prometheus text format, i.e. for the textfile collector of the node exporter.
+    """
+    # the events this observer is informed of
+    METRIC_EVENTS = ("execution_start", "step_end", "completed_document", "execution_end")
+
+    def __init__(self, json_path=None, prometheus_path=None):
+        """
+        :samp:`Initialization`
+
+        :param str json_path: path of the json run report, written at the end of each execution, or None
+        :param str prometheus_path: path of the Prometheus metrics, written at the end of each execution, or None
+        """
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+        self.reset()
+
+    def reset(self):
+        self.executor = None
+        self.start = None
+        self.wall_time = None
+        self.date_start_processing = None
+        self.date_end_processing = None
+        self.steps = {}
+        self.documents = []
+
+    def accepts(self, event):
+        return getattr(event, "name", None) in self.METRIC_EVENTS
+
+    def inform_execution_start(self, *args, **kwargs):
+        self.reset()
+        self.executor = args[0].__class__.__name__
+        self.start = time.perf_counter()
+        self.date_start_processing = kwargs.get("date_start_processing")
+
+    def inform_step_end(self, *args, **kwargs):
+        self.steps[kwargs["step"].name] = {"wall_time": kwargs["wall_time"], "cpu_time": kwargs["cpu_time"]}
+
+    def inform_completed_document(self, *args, **kwargs):
+        sitemap_data = kwargs["sitemap_data"]
+        size = None
+        if sitemap_data.document_saved and os.path.exists(sitemap_data.path):
+            size = os.path.getsize(sitemap_data.path)
+        self.documents.append({"capability": sitemap_data.capability_name, "ordinal": sitemap_data.ordinal,
+                               "resource_count": sitemap_data.resource_count, "bytes": size})
+
+    def inform_execution_end(self, *args, **kwargs):
+        if self.start is not None:
+            self.wall_time = time.perf_counter() - self.start
+        self.date_end_processing = kwargs.get("date_end_processing")
+        if self.json_path:
+            defaults.write_json_atomically(self.json_path, self.report())
+        if self.prometheus_path:
+            defaults.write_text_atomically(self.prometheus_path, self.prometheus())
+
+    def resources(self) -> int:
+        # indexes, capabilitylists and descriptions have no ordinal
+        return sum(document["resource_count"] for document in self.documents if document["ordinal"] >= 0)
+
+    def bytes_written(self) -> int:
+        return sum(document["bytes"] or 0 for document in self.documents)
+
+    def resources_per_second(self):
+        seconds = self.steps["generate"]["wall_time"] if "generate" in self.steps else self.wall_time
+        return self.resources() / seconds if seconds else None
+
+    @staticmethod
+    def peak_rss():
+        """
+        :samp:`The peak resident set size of this process`
+
+        :return: size in bytes, or None if not available on this platform
+        """
+        if resource is None:
+            return None
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+    def report(self) -> dict:
+        """
+        :samp:`The measurements of the last execution`
+
+        :return: dict that can be serialized as json
+        """
+        return {
+            "executor": self.executor,
+            "date_start_processing": self.date_start_processing,
+            "date_end_processing": self.date_end_processing,
+            "wall_time": self.wall_time,
+            "steps": self.steps,
+            "documents": self.documents,
+            "resources": self.resources(),
+            "bytes_written": self.bytes_written(),
+            "resources_per_second": self.resources_per_second(),
+            "peak_rss_bytes": self.peak_rss()
+        }
+
+    def prometheus(self) -> str:
+        """
+        :samp:`The measurements of the last execution in the Prometheus text format`
+
+        :return: metrics as text
+        """
+        lines = []
+
+        def metric(name, kind, description, samples):
+            lines.append("# HELP resourcesync_%s %s" % (name, description))
+            lines.append("# TYPE resourcesync_%s %s" % (name, kind))
+            for labels, value in samples:
+                if value is not None:
+                    lines.append("resourcesync_%s%s %s" % (name, labels, repr(value)))
+
+        executor = '{executor="%s"}' % self.executor
+        metric("execution_seconds", "gauge", "Wall time of the execution.", [(executor, self.wall_time)])
+        metric("step_wall_seconds", "gauge", "Wall time of a build step.",
+               [('{executor="%s",step="%s"}' % (self.executor, step), times["wall_time"])
+                for step, times in self.steps.items()])
+        metric("step_cpu_seconds", "gauge", "Processor time of a build step.",
+               [('{executor="%s",step="%s"}' % (self.executor, step), times["cpu_time"])
+                for step, times in self.steps.items()])
+        metric("documents", "gauge", "Documents written.", [(executor, len(self.documents))])
+        metric("resources", "gauge", "Resources in the documents written.", [(executor, self.resources())])
+        metric("written_bytes", "gauge", "Bytes of the documents written.", [(executor, self.bytes_written())])
+        metric("resources_per_second", "gauge", "Resources per second in the generate step.",
+               [(executor, self.resources_per_second())])
+        metric("peak_rss_bytes", "gauge", "Peak resident set size of the process.", [(executor, self.peak_rss())])
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+:samp:`Profiles of the build steps of an execution`
+
+A :class:`StepProfiler` profiles steps with :mod:`cProfile`. The profile of each step is written to a directory as
+a :mod:`pstats` file, `{prefix}_{step}.prof`, and as collapsed stacks, `{prefix}_{step}.collapsed`. Collapsed
+stacks can be turned into a flame graph with i.e. `flamegraph.pl` or speedscope::
+
+    $ flamegraph.pl 20170614T100000_generate.collapsed > generate.svg
+
+The profile of a step records calls and the time spent in functions, not complete stacks. The collapsed stacks are
+reconstructed from the callers of functions: the time of a function is divided over its callers in proportion to
+the time it spent for each of them.
+"""
+import cProfile
+import logging
+import os
+import pstats
+import tempfile
+from contextlib import contextmanager
+
+LOG = logging.getLogger(__name__)
+
+PROFILE_EXTENSION = ".prof"
+COLLAPSED_EXTENSION = ".collapsed"
+# directory for profiles if no other directory is given, not in the published metadata directory
+DEFAULT_PROFILE_DIR = os.path.join(tempfile.gettempdir(), "resourcesync-profiles")
+# maximum depth of reconstructed stacks
+MAX_STACK_DEPTH = 64
+
+
+def frame_name(func) -> str:
+    file_name, line, name = func
+    return "%s:%d:%s" % (os.path.basename(file_name), line, name)
+
+
+def collapsed_stacks(stats: pstats.Stats) -> dict:
+    """
+    :samp:`Reconstruct stacks from a profile`
+
+    :param stats: the :class:`pstats.Stats` of a profile
+    :return: dict of stack, as frame names separated by ';', and time spent in its last frame in microseconds
+    """
+    callees = {}
+    roots = []
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        if not callers:
+            roots.append(func)
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    stacks = {}
+
+    def walk(func, stack, fraction):
+        tt, ct = stats.stats[func][2:4]
+        stack = stack + [func]
+        micros = tt * fraction * 1e6
+        if micros >= 1:
+            key = ";".join(frame_name(frame) for frame in stack)
+            stacks[key] = stacks.get(key, 0) + int(micros)
+        if len(stack) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_ct in callees.get(func, []):
+            callee_ct = stats.stats[callee][3]
+            if callee in stack or callee_ct <= 0:
+                continue
+            walk(callee, stack, fraction * edge_ct / callee_ct)
+
+    for root in roots:
+        walk(root, [], 1.0)
+    return stacks
+
+
+class StepProfiler(object):
+    """
+    :samp:`Profiles steps and writes their profiles to a directory`
+
+    """
+    def __init__(self, directory, prefix):
+        """
+        :samp:`Initialization`
+
+        :param str directory: the directory for the profiles, created if it does not exist
+        :param str prefix: prefix of the file names of the profiles
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.paths = []
+
+    def path(self, step, extension) -> str:
+        return os.path.join(self.directory, "%s_%s%s" % (self.prefix, step, extension))
+
+    @contextmanager
+    def profile(self, step):
+        """
+        :samp:`Profile a step for the duration of the context`
+
+        The profile is written when the context exits, also if the step fails.
+
+        :param str step: the name of the step
+        """
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self.write(step, profiler)
+
+    def write(self, step, profiler):
+        os.makedirs(self.directory, exist_ok=True)
+        profile_path = self.path(step, PROFILE_EXTENSION)
+        profiler.dump_stats(profile_path)
+        collapsed_path = self.path(step, COLLAPSED_EXTENSION)
+        stacks = collapsed_stacks(pstats.Stats(profiler))
+        with open(collapsed_path, "w", encoding="utf-8") as file:
+            for stack, micros in sorted(stacks.items()):
+                file.write("%s %d\n" % (stack, micros))
+        self.paths.extend([profile_path, collapsed_path])
+        LOG.info("Profile of %s written to %s", step, profile_path)
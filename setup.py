@@ -80,6 +80,6 @@ setup(
     license=license,
     zip_safe=False,
     packages=find_packages(exclude=("tests", "docs")),
-    install_requires=["validators", "resync>=1.0.8", "bs4", "sickle", "elasticsearch>=1.0.0,<2.0.0"],
+    install_requires=["validators", "resync>=2.0,<3", "defusedxml", "bs4", "sickle", "elasticsearch>=1.0.0,<2.0.0"],
     test_requires=["pytest", "bs4", "sickle", "requests_mock", "elasticsearch>=1.0.0,<2.0.0", "urllib3_mock"]
 )
\ No newline at end of file
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from resourcesync.batch import BatchPublisher
+from resourcesync.parameters.parameters import ParameterUtils, Parameters
+
+
+class BatchPublisherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        # configurations are saved under the home directory
+        self.home = os.environ.get("HOME")
+        os.environ["HOME"] = self.tmp_dir
+        Parameters.reset()
+        for name in ("spam", "eggs"):
+            resource_dir = os.path.join(self.tmp_dir, name)
+            os.makedirs(resource_dir)
+            params = Parameters(resource_dir=resource_dir, metadata_dir="metadata",
+                                url_prefix="http://example.com/" + name)
+            params.save_configuration(on_disk=False)
+            ParameterUtils.save_configuration_as(name)
+            Parameters.reset()
+
+    def tearDown(self):
+        Parameters.reset()
+        if self.home is None:
+            del os.environ["HOME"]
+        else:
+            os.environ["HOME"] = self.home
+        shutil.rmtree(self.tmp_dir)
+
+    def test_publish(self):
+        publisher = BatchPublisher("resourcesync.generators.eg_generator:EgGenerator", max_workers=2)
+        report = publisher.publish(["spam", "eggs", "ham"])
+
+        self.assertEqual([result.name for result in report.results], ["spam", "eggs", "ham"])
+        self.assertEqual([result.name for result in report.failed], ["ham"])
+        self.assertIn("ValueError", report.failed[0].error)
+        for name in ("spam", "eggs"):
+            self.assertTrue(os.path.exists(os.path.join(self.tmp_dir, name, "metadata", "capabilitylist.xml")))
+        # a resourcelist, the capabilitylist and the description, for each collection
+        self.assertEqual(report.documents, 6)
+        self.assertEqual(report.resources, 2)
+
+        report = publisher.publish()
+        self.assertEqual(sorted(result.name for result in report.results), ["eggs", "spam"])
+        self.assertEqual(report.failed, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from resync import Resource
+
+from resourcesync.core.catalog import Catalog, CATALOG_FILENAME
+from resourcesync.executor.changelist import NewChangeListExecutor
+from resourcesync.executor.resourcelist import ResourceListExecutor
+from resourcesync.parameters.parameters import Parameters
+from resourcesync.utils import defaults
+
+
+def resources(count, version=0):
+    for i in range(count):
+        yield Resource(uri="http://example.com/r/%d" % i, lastmod="2017-06-14T10:00:00Z",
+                       md5="%032x" % (i + version), length=i, mime_type="text/plain")
+
+
+class CatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.params = Parameters(resource_dir=self.tmp_dir, metadata_dir="metadata", url_prefix="http://example.com",
+                                 max_items_in_list=10)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def publish(self):
+        ResourceListExecutor(self.params).execute(resources(25))
+        NewChangeListExecutor(self.params).execute(resources(30, version=1))
+        NewChangeListExecutor(self.params).execute(resources(30, version=2))
+
+    def test_catalog_follows_executors(self):
+        self.publish()
+        catalog = Catalog(self.params.abs_metadata_dir())
+        self.assertEqual([os.path.basename(path) for path in catalog.paths("resourcelist")],
+                         ["resourcelist_0000.xml", "resourcelist_0001.xml", "resourcelist_0002.xml"])
+        self.assertEqual(catalog.last_ordinal("changelist"), 5)
+        self.assertEqual(catalog.index_path("changelist"), self.params.abs_metadata_path("changelist-index.xml"))
+        self.assertEqual(catalog.last_ordinal("changedump"), -1)
+
+        for path in catalog.paths("changelist"):
+            entry = catalog.entry(path)
+            self.assertIsNone(entry["md5"])
+            self.assertEqual(catalog.md5(path), defaults.md5_for_file(path))
+            self.assertEqual(entry["size"], os.path.getsize(path))
+            self.assertEqual(entry["index"], self.params.uri_from_path(catalog.index_path("changelist")))
+        # the changelists of the first run were closed by the second run
+        self.assertIsNotNone(catalog.entry(catalog.paths("changelist")[0])["md_until"])
+        self.assertEqual(catalog.entry(catalog.paths("changelist")[0])["resource_count"], 10)
+        self.assertIsNone(catalog.entry(catalog.paths("changelist")[-1])["md_until"])
+        self.assertEqual(catalog.entry(catalog.paths("resourcelist")[-1])["resource_count"], 5)
+
+    def test_rebuild(self):
+        self.publish()
+        catalog = Catalog(self.params.abs_metadata_dir())
+        os.remove(catalog.catalog_file)
+        rebuilt = Catalog(self.params.abs_metadata_dir())
+        self.assertTrue(os.path.exists(rebuilt.catalog_file))
+        self.assertEqual(sorted(rebuilt.documents), sorted(catalog.documents))
+        for name, entry in catalog.documents.items():
+            entry = dict(entry, resource_count=None)
+            self.assertEqual(rebuilt.documents[name], entry)
+
+    def test_unsaved_changes(self):
+        self.publish()
+        catalog = Catalog(self.params.abs_metadata_dir())
+        catalog.remove(catalog.paths("resourcelist")[0])
+        # the process died before the catalog was saved, it is built from the documents
+        self.assertEqual(len(Catalog(self.params.abs_metadata_dir()).paths("resourcelist")), 3)
+        catalog.save()
+        self.assertEqual(len(Catalog(self.params.abs_metadata_dir()).paths("resourcelist")), 2)
+
+    def test_clear_metadata_dir(self):
+        self.publish()
+        ResourceListExecutor(self.params).execute(resources(5))
+        catalog = Catalog(self.params.abs_metadata_dir())
+        self.assertEqual(sorted(catalog.documents), ["capabilitylist.xml", "resourcelist_0000.xml"])
+        self.assertNotIn(CATALOG_FILENAME, catalog.documents)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,15 @@
 # -*- coding: utf-8 -*-
 import unittest
+from unittest import mock
 from hashlib import md5
-from resync import Resource
+from resync import ChangeList, Resource
 from resourcesync.resourcesync import ResourceSync
 from resourcesync.core.generator import Generator
 from resourcesync.generators.eg_generator import EgGenerator
+from resourcesync.executor.changelist import IncrementalChangeListExecutor
 from resourcesync.parameters.parameters import ParameterUtils
+from resourcesync.core.sink import write_sitemap
+from resourcesync.rsxml.sitemap_reader import SitemapReader
 import shutil
 import os
 
@@ -30,6 +34,31 @@ class ChangeGenerator(Generator):
         )
         return [rm]
 
+class ListGenerator(Generator):
+
+    def __init__(self, resources, params=None, rsxml=None):
+        Generator.__init__(self, params, rsxml=rsxml)
+        self.resources = resources
+
+    def generate(self):
+        return [Resource(uri=uri, lastmod="2017-06-14", md5=digest, length=len(digest),
+                         mime_type="text/plain")
+                for uri, digest in self.resources.items()]
+
+
+class ReportingGenerator(Generator):
+    reports_changes = True
+
+    def __init__(self, changes, params=None, rsxml=None):
+        Generator.__init__(self, params, rsxml=rsxml)
+        self.changes = changes
+
+    def generate(self):
+        for uri, change in self.changes:
+            yield Resource(uri=uri, lastmod="2017-06-14", md5="%032x" % len(uri), length=len(uri),
+                           mime_type="text/plain", change=change)
+
+
 eg_gen = EgGenerator()
 ch_gen = ChangeGenerator()
 
@@ -48,4 +77,46 @@ class ResourceSyncTest(unittest.TestCase):
         ch_rs = ResourceSync(generator=ch_gen, strategy="new_changelist", metadata_dir="test_md")
         ch_rs.execute()
 
+    def test_incremental_change_list_appends(self):
+        metadata_dir = os.path.join(ParameterUtils.get_resource_dir("~"), "test_md")
+        resources = {"http://example.com/%d" % i: "%032x" % i for i in range(3)}
+        ResourceSync(generator=ListGenerator(resources), strategy="resourcelist", metadata_dir="test_md",
+                     max_items_in_list=4, is_saving_pretty_xml=True, is_staging_publication=True).execute()
+        for i in range(3, 8):
+            resources["http://example.com/%d" % i] = "%032x" % i
+            with mock.patch.object(IncrementalChangeListExecutor, "read_sitemap", autospec=True,
+                                   side_effect=IncrementalChangeListExecutor.read_sitemap) as read_sitemap:
+                ResourceSync(generator=ListGenerator(resources), strategy="inc_changelist", metadata_dir="test_md",
+                             max_items_in_list=4, is_saving_pretty_xml=True, is_staging_publication=True).execute()
+            # the last changelist is not read
+            self.assertFalse([c for c in read_sitemap.call_args_list if "changelist" in c[0][1]])
+
+        path = os.path.join(metadata_dir, "changelist_0000.xml")
+        changelist = SitemapReader().read(path, resources=ChangeList())
+        self.assertEqual([r.uri for r in changelist], ["http://example.com/%d" % i for i in range(3, 7)])
+        self.assertTrue(changelist.link("up")["href"].endswith("/capabilitylist.xml"))
+        # the appended document is the same as the document written at once
+        rewritten = os.path.join(metadata_dir, "rewritten.xml")
+        write_sitemap(changelist, rewritten, pretty_xml=True)
+        with open(path, "rb") as appended, open(rewritten, "rb") as written:
+            self.assertEqual(appended.read(), written.read())
+        changelist = SitemapReader().read(os.path.join(metadata_dir, "changelist_0001.xml"))
+        self.assertEqual([r.uri for r in changelist], ["http://example.com/7"])
+
+    def test_reported_changes(self):
+        metadata_dir = os.path.join(ParameterUtils.get_resource_dir("~"), "test_md")
+        resources = {"http://example.com/%d" % i: "%032x" % i for i in range(3)}
+        ResourceSync(generator=ListGenerator(resources), strategy="resourcelist", metadata_dir="test_md").execute()
+        # reported changes are published as reported and in the order of the generator, without a diff
+        changes = [("http://example.com/9", "updated"), ("http://example.com/0", "deleted"),
+                   ("http://example.com/1", "updated"), ("http://example.com/0", "created"),
+                   ("http://example.com/2", None)]
+        ResourceSync(generator=ReportingGenerator(changes), strategy="new_changelist", metadata_dir="test_md",
+                     max_items_in_list=3).execute()
 
+        published = []
+        for name in ("changelist_0000.xml", "changelist_0001.xml"):
+            changelist = SitemapReader().read(os.path.join(metadata_dir, name), resources=ChangeList())
+            published.extend((r.uri, r.change) for r in changelist)
+        self.assertEqual(published, changes[:4])
+        self.assertFalse(os.path.exists(os.path.join(metadata_dir, "changelist_0002.xml")))
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from resync import Resource, ResourceList
+
+from resourcesync.core.catalog import Catalog
+from resourcesync.core.checkpoint import Checkpoint, CHECKPOINT_FILENAME
+from resourcesync.core.executors import ExecutorEvent
+from resourcesync.core.generator import Generator
+from resourcesync.executor.resourcelist import ResourceListExecutor
+from resourcesync.parameters.parameters import Parameters
+from resourcesync.rsxml.sitemap_reader import SitemapReader
+from resourcesync.utils.observe import Observer
+
+
+class CountingGenerator(Generator):
+
+    def __init__(self, count, fail_at=None):
+        Generator.__init__(self)
+        self.count = count
+        self.fail_at = fail_at
+        self.start = 0
+        self.position = 0
+        self.generated = 0
+
+    def generate(self):
+        for i in range(self.start, self.count):
+            if i == self.fail_at:
+                raise IOError("resource %d not readable" % i)
+            self.generated += 1
+            self.position = i + 1
+            yield Resource(uri="http://example.com/r/%d" % i, lastmod="2017-06-14T10:00:00Z",
+                           md5="%032x" % i, length=i, mime_type="text/plain")
+
+
+class ResumableGenerator(CountingGenerator):
+
+    def resume_token(self):
+        return {"position": self.position}
+
+    def resume(self, token):
+        self.start = token["position"]
+
+
+class DocumentRecorder(Observer):
+
+    def __init__(self):
+        self.completed = []
+
+    def inform(self, *args, **kwargs):
+        if args[1] == ExecutorEvent.completed_document and kwargs["sitemap_data"].capability_name == "resourcelist":
+            self.completed.append(kwargs["sitemap_data"].ordinal)
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.params = Parameters(resource_dir=self.tmp_dir, metadata_dir="metadata", url_prefix="http://example.com",
+                                 max_items_in_list=10, is_checkpointing=True)
+        self.checkpoint_path = self.params.abs_metadata_path(CHECKPOINT_FILENAME)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def execute(self, generator):
+        executor = ResourceListExecutor(self.params, generator)
+        self.recorder = DocumentRecorder()
+        executor.register(self.recorder)
+        executor.resume_generator()
+        executor.execute(generator.generate())
+        return executor
+
+    def interrupt(self, generator):
+        with self.assertRaises(IOError):
+            self.execute(generator)
+        checkpoint = Checkpoint.load(self.checkpoint_path, "resourcelist")
+        self.assertEqual(checkpoint.ordinal, 1)
+        self.assertEqual(checkpoint.resource_count, 20)
+        return checkpoint
+
+    def assert_published(self, count):
+        catalog = Catalog(self.params.abs_metadata_dir())
+        uris = []
+        for path in catalog.paths("resourcelist"):
+            uris.extend(resource.uri for resource in SitemapReader().iter_resources(path))
+        self.assertEqual(uris, ["http://example.com/r/%d" % i for i in range(count)])
+        index = SitemapReader().read(catalog.index_path("resourcelist"), ResourceList())
+        self.assertEqual(len(index), len(catalog.paths("resourcelist")))
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    def test_resume_by_skipping_resources(self):
+        checkpoint = self.interrupt(CountingGenerator(35, fail_at=25))
+        generator = CountingGenerator(35)
+        self.execute(generator)
+        self.assert_published(35)
+        # saved resourcelists were not generated again
+        self.assertEqual(self.recorder.completed, [2, 3, -1])
+        index = SitemapReader().read(self.params.abs_metadata_path("resourcelist-index.xml"), ResourceList())
+        self.assertEqual(index.md_at, checkpoint.date_start_processing)
+
+    def test_resume_with_token(self):
+        self.interrupt(ResumableGenerator(35, fail_at=25))
+        generator = ResumableGenerator(35)
+        self.execute(generator)
+        self.assertEqual(generator.generated, 15)
+        self.assert_published(35)
+
+    def test_new_execution_without_checkpoint(self):
+        self.execute(CountingGenerator(35))
+        self.execute(CountingGenerator(12))
+        self.assert_published(12)
+
+
+if __name__ == "__main__":
+    unittest.main()
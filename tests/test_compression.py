@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from resync import Resource, ResourceList
+
+from resourcesync.core.catalog import Catalog
+from resourcesync.core.sink import write_sitemap
+from resourcesync.executor.changelist import NewChangeListExecutor
+from resourcesync.executor.resourcelist import ResourceListExecutor
+from resourcesync.parameters.parameters import Parameters
+from resourcesync.rsxml.sitemap_header import read_header, write_header
+from resourcesync.rsxml.sitemap_reader import SitemapReader
+
+
+def resources(count, version=0):
+    for i in range(count):
+        yield Resource(uri="http://example.com/r/%d" % i, lastmod="2017-06-14T10:00:00Z",
+                       md5="%032x" % (i + version), length=i, mime_type="text/plain")
+
+
+class CompressionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.params = Parameters(resource_dir=self.tmp_dir, metadata_dir="metadata", url_prefix="http://example.com",
+                                 max_items_in_list=10, compression_level=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_write_read_and_patch(self):
+        resourcelist = ResourceList(resources=list(resources(20)))
+        resourcelist.md_at = "2017-06-14T10:00:00Z"
+        path = os.path.join(self.tmp_dir, "resourcelist.xml.gz")
+        for fast_xml in (True, False):
+            write_sitemap(resourcelist, path, fast_xml=fast_xml, compression_level=1)
+            with gzip.open(path, "rb") as file:
+                self.assertTrue(file.read().startswith(b"<?xml"))
+            read = SitemapReader().read(path, ResourceList())
+            self.assertEqual(sorted(r.uri for r in read), sorted(r.uri for r in resourcelist))
+
+        header = read_header(path)
+        header.link_set(rel="index", href="http://example.com/metadata/resourcelist-index.xml.gz")
+        write_header(path, header, 1)
+        self.assertEqual(read_header(path).link_href("index"), "http://example.com/metadata/resourcelist-index.xml.gz")
+        self.assertEqual(len(SitemapReader().read(path, ResourceList())), 20)
+
+    def test_executors_write_compressed_documents(self):
+        ResourceListExecutor(self.params).execute(resources(25))
+        NewChangeListExecutor(self.params).execute(resources(30, version=1))
+
+        catalog = Catalog(self.params.abs_metadata_dir())
+        self.assertEqual([os.path.basename(path) for path in catalog.paths("resourcelist")],
+                         ["resourcelist_0000.xml.gz", "resourcelist_0001.xml.gz", "resourcelist_0002.xml.gz"])
+        self.assertEqual(len(catalog.paths("changelist")), 3)
+        capabilitylist_path = self.params.abs_metadata_path("capabilitylist.xml.gz")
+        capabilitylist = SitemapReader().read(capabilitylist_path)
+        self.assertEqual(sorted(r.uri for r in capabilitylist),
+                         ["http://example.com/metadata/changelist-index.xml.gz",
+                          "http://example.com/metadata/resourcelist-index.xml.gz"])
+        for path in catalog.paths("changelist"):
+            self.assertEqual(read_header(path).link_href("index"),
+                             "http://example.com/metadata/changelist-index.xml.gz")
+            self.assertEqual(read_header(path).link_href("up"), self.params.capabilitylist_url())
+        self.assertEqual([name for name in os.listdir(self.params.abs_metadata_dir()) if name.endswith(".xml")], [])
+
+        # documents written without compression replace the compressed documents
+        self.params.compression_level = 0
+        ResourceListExecutor(self.params).execute(resources(5))
+        self.assertEqual(sorted(name for name in os.listdir(self.params.abs_metadata_dir()) if "xml" in name),
+                         ["capabilitylist.xml", "resourcelist_0000.xml"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,58 @@
 # -*- coding: utf-8 -*-
 
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
 
+from resourcesync.utils import defaults
+
+
+class DigestsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.contents = [b"", b"spam", os.urandom(3 * 2**10 + 7), os.urandom(2**16 + 13)]
+        self.files = []
+        for i, content in enumerate(self.contents):
+            filename = os.path.join(self.tmp_dir, "file_%d" % i)
+            with open(filename, "wb") as f:
+                f.write(content)
+            self.files.append(filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_md5_for_file(self):
+        for filename, content in zip(self.files, self.contents):
+            self.assertEqual(defaults.md5_for_file(filename), hashlib.md5(content).hexdigest())
+
+    def test_digests_for_file(self):
+        for filename, content in zip(self.files, self.contents):
+            digests = defaults.digests_for_file(filename, block_size=2**10)
+            self.assertEqual(digests["md5"], hashlib.md5(content).hexdigest())
+            self.assertEqual(digests["sha256"], hashlib.sha256(content).hexdigest())
+
+    def test_digests_for_file_mmap(self):
+        for filename, content in zip(self.files, self.contents):
+            digests = defaults.digests_for_file(filename, block_size=2**10, mmap_threshold=1)
+            self.assertEqual(digests["md5"], hashlib.md5(content).hexdigest())
+            self.assertEqual(digests["sha256"], hashlib.sha256(content).hexdigest())
+
+    def test_file_hasher_keeps_order(self):
+        missing = os.path.join(self.tmp_dir, "missing")
+        with defaults.FileHasher(algorithms=("md5",), max_workers=3) as hasher:
+            results = hasher.hash_files(self.files)
+            self.assertEqual([r["md5"] for r in results], [hashlib.md5(c).hexdigest() for c in self.contents])
+
+            results = hasher.hash_files([missing] + self.files, ignore_errors=True)
+            self.assertIsNone(results[0])
+            self.assertEqual(len(results), len(self.files) + 1)
+
+            with self.assertRaises(OSError):
+                hasher.hash_files([missing])
+
+
+if __name__ == "__main__":
+    unittest.main()
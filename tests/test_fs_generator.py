@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+from resourcesync.generators.fs_generator import FileSystemGenerator
+from resourcesync.executor.resourcelist import ResourceListExecutor
+from resourcesync.parameters.parameters import Parameters
+
+
+class FileSystemGeneratorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.resource_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.files = {
+            "a.txt": b"spam",
+            "sub/b.xml": b"<eggs/>",
+            "sub/deeper/c d.bin": os.urandom(4096),
+        }
+        for rel_path, content in self.files.items():
+            self.write(rel_path, content)
+        os.makedirs(os.path.join(self.resource_dir, "metadata"))
+        self.write("metadata/resourcelist_0001.xml", b"<urlset/>")
+        self.params = {
+            "resource_dir": self.resource_dir,
+            "url_prefix": "http://example.com/files",
+            "exclude_dirs": [os.path.join(self.resource_dir, "metadata")],
+            "cache_file": os.path.join(self.cache_dir, "cache.db"),
+            "max_workers": 2
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.resource_dir)
+        shutil.rmtree(self.cache_dir)
+
+    def write(self, rel_path, content):
+        path = os.path.join(self.resource_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+
+    def test_generate(self):
+        generator = FileSystemGenerator(params=self.params)
+        resources = {r.uri: r for r in generator.generate()}
+        self.assertEqual(len(resources), 3)
+        self.assertIn("http://example.com/files/sub/deeper/c%20d.bin", resources)
+        resource = resources["http://example.com/files/sub/b.xml"]
+        self.assertEqual(resource.md5, hashlib.md5(b"<eggs/>").hexdigest())
+        self.assertEqual(resource.length, 7)
+        self.assertEqual(resource.mime_type, "application/xml")
+        self.assertEqual(generator.hashed_count, 3)
+
+    def test_cache_skips_unchanged_files(self):
+        list(FileSystemGenerator(params=self.params).generate())
+        self.write("a.txt", b"new spam")
+        os.remove(os.path.join(self.resource_dir, "sub", "b.xml"))
+
+        generator = FileSystemGenerator(params=self.params)
+        resources = {r.uri: r for r in generator.generate()}
+        self.assertEqual(len(resources), 2)
+        self.assertEqual(generator.hashed_count, 1)
+        self.assertEqual(generator.cached_count, 1)
+        self.assertEqual(resources["http://example.com/files/a.txt"].md5, hashlib.md5(b"new spam").hexdigest())
+
+        generator = FileSystemGenerator(params=self.params)
+        list(generator.generate())
+        self.assertEqual(generator.hashed_count, 0)
+
+    def test_resourcelist_with_fs_generator(self):
+        params = Parameters(resource_dir=self.resource_dir, metadata_dir="metadata",
+                            url_prefix="http://example.com/files")
+        executor = ResourceListExecutor(params)
+        executor.execute(FileSystemGenerator(params=self.params).generate())
+        self.assertTrue(os.path.exists(os.path.join(self.resource_dir, "metadata", "resourcelist_0000.xml")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from resync import ChangeList
+
+from resourcesync.core.generator import Generator
+from resourcesync.executor.changelist import IncrementalChangeListExecutor
+from resourcesync.executor.resourcelist import ResourceListExecutor
+from resourcesync.generators.fs_generator import FileSystemGenerator
+from resourcesync.generators.journal_generator import JournalGenerator
+from resourcesync.parameters.parameters import Parameters
+from resourcesync.utils.journal import ChangeJournal, InotifyWatcher
+
+
+class ChangeJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.journal = ChangeJournal(os.path.join(self.tmp_dir, "changes.journal"), fsync=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_coalesce(self):
+        self.journal.record_many([("created", "/a"), ("updated", "/a"),
+                                  ("created", "/b"), ("deleted", "/b"),
+                                  ("deleted", "/c"), ("created", "/c"),
+                                  ("updated", "/d"), ("deleted", "/d")])
+        offset, changes = self.journal.snapshot()
+        self.assertEqual(changes, [("/a", "created"), ("/c", "updated"), ("/d", "deleted")])
+
+    def test_discard_keeps_later_changes(self):
+        self.journal.record("created", "/a")
+        offset, changes = self.journal.snapshot()
+        self.journal.record("updated", "/b")
+        self.journal.discard(offset)
+        offset, changes = self.journal.snapshot()
+        self.assertEqual(changes, [("/b", "updated")])
+
+    def test_discard_replaces_journal(self):
+        self.journal.record_many([("created", "/a"), ("updated", "/b")])
+        offset, changes = self.journal.snapshot()
+        self.journal.record("deleted", "/c")
+        inode = os.stat(self.journal.journal_file).st_ino
+        self.journal.discard(offset)
+        self.assertNotEqual(os.stat(self.journal.journal_file).st_ino, inode)
+        self.assertFalse(os.path.exists(self.journal.tmp_file))
+        self.assertEqual(self.journal.snapshot()[1], [("/c", "deleted")])
+
+    def test_undecodable_path(self):
+        path = os.fsdecode(b"/caf\xe9.txt")
+        self.journal.record("created", path)
+        offset, changes = self.journal.snapshot()
+        self.assertEqual(changes, [(path, "created")])
+
+    def test_rescan(self):
+        self.journal.record_many([("created", "/a"), ("rescan", "/"), ("updated", "/b")])
+        self.assertTrue(self.journal.needs_rescan())
+        offset, changes = self.journal.snapshot()
+        self.assertEqual(changes, [("/a", "created")])
+        self.journal.discard(offset)
+        self.assertTrue(self.journal.needs_rescan())
+        self.journal.discard(self.journal.length())
+        self.assertFalse(self.journal.needs_rescan())
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "inotify is only available on Linux")
+class InotifyWatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.resource_dir = tempfile.mkdtemp()
+        self.journal_dir = tempfile.mkdtemp()
+        self.journal = ChangeJournal(os.path.join(self.journal_dir, "changes.journal"), fsync=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.resource_dir)
+        shutil.rmtree(self.journal_dir)
+
+    def read_all(self, watcher):
+        changes = []
+        while True:
+            read = watcher.read_changes(timeout=0.1)
+            if not read:
+                return changes
+            changes.extend(read)
+
+    def test_watch(self):
+        with open(os.path.join(self.resource_dir, "old.txt"), "w") as f:
+            f.write("old")
+        with InotifyWatcher(self.resource_dir, self.journal) as watcher:
+            with open(os.path.join(self.resource_dir, "new.txt"), "w") as f:
+                f.write("new")
+            os.remove(os.path.join(self.resource_dir, "old.txt"))
+            os.makedirs(os.path.join(self.resource_dir, "sub"))
+            self.journal.record_many(self.read_all(watcher))
+            with open(os.path.join(self.resource_dir, "sub", "deep.txt"), "w") as f:
+                f.write("deep")
+            self.journal.record_many(self.read_all(watcher))
+
+        offset, changes = self.journal.snapshot()
+        self.assertEqual(dict(changes), {
+            os.path.join(self.resource_dir, "new.txt"): "created",
+            os.path.join(self.resource_dir, "old.txt"): "deleted",
+            os.path.join(self.resource_dir, "sub", "deep.txt"): "created"
+        })
+
+    def test_directory_moved_out(self):
+        outside = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.resource_dir, "sub", "deeper"))
+        with open(os.path.join(self.resource_dir, "sub", "deep.txt"), "w") as f:
+            f.write("deep")
+        try:
+            with InotifyWatcher(self.resource_dir, self.journal) as watcher:
+                self.assertEqual(len(watcher.watches), 3)
+                os.rename(os.path.join(self.resource_dir, "sub"), os.path.join(outside, "sub"))
+                changes = self.read_all(watcher)
+                self.assertEqual(changes, [("rescan", os.path.join(self.resource_dir, "sub"))])
+                self.assertEqual(list(watcher.watches.values()), [self.resource_dir])
+        finally:
+            shutil.rmtree(outside)
+
+
+class JournalGeneratorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.resource_dir = tempfile.mkdtemp()
+        self.journal_dir = tempfile.mkdtemp()
+        self.journal_file = os.path.join(self.journal_dir, "changes.journal")
+        for name in ("a.txt", "b.txt", "c.txt"):
+            self.write(name, name)
+        self.params = Parameters(resource_dir=self.resource_dir, metadata_dir="metadata",
+                                 url_prefix="http://example.com")
+
+    def tearDown(self):
+        shutil.rmtree(self.resource_dir)
+        shutil.rmtree(self.journal_dir)
+
+    def write(self, name, content):
+        with open(os.path.join(self.resource_dir, name), "w") as f:
+            f.write(content)
+
+    def test_incremental_changelist_from_journal(self):
+        fs_generator = FileSystemGenerator(params={
+            "resource_dir": self.resource_dir,
+            "url_prefix": "http://example.com",
+            "exclude_dirs": [self.params.abs_metadata_dir()]})
+        ResourceListExecutor(self.params).execute(fs_generator.generate())
+
+        journal = ChangeJournal(self.journal_file, fsync=False)
+        self.write("b.txt", "changed")
+        self.write("d.txt", "d")
+        journal.record_many([("updated", os.path.join(self.resource_dir, "b.txt")),
+                             ("created", os.path.join(self.resource_dir, "d.txt")),
+                             ("deleted", os.path.join(self.resource_dir, "c.txt"))])
+
+        generator = JournalGenerator(params={"journal_file": self.journal_file,
+                                             "resource_dir": self.resource_dir,
+                                             "url_prefix": "http://example.com"})
+        self.assertTrue(isinstance(generator, Generator) and generator.reports_changes)
+        executor = IncrementalChangeListExecutor(self.params, generator=generator)
+        executor.execute(generator.generate())
+        generator.commit()
+
+        changelist = executor.read_sitemap(self.params.abs_metadata_path("changelist_0000.xml"), ChangeList())
+        changes = {r.uri: r.change for r in changelist.resources}
+        self.assertEqual(changes, {"http://example.com/b.txt": "updated",
+                                   "http://example.com/d.txt": "created",
+                                   "http://example.com/c.txt": "deleted"})
+        self.assertEqual(journal.snapshot(), (0, []))
+
+    def test_rescan(self):
+        metadata_dir = self.params.abs_metadata_dir()
+        fs_generator = FileSystemGenerator(params={
+            "resource_dir": self.resource_dir,
+            "url_prefix": "http://example.com",
+            "exclude_dirs": [metadata_dir]})
+        ResourceListExecutor(self.params).execute(fs_generator.generate())
+
+        journal = ChangeJournal(self.journal_file, fsync=False)
+        self.write("b.txt", "changed")
+        os.remove(os.path.join(self.resource_dir, "c.txt"))
+        journal.record_many([("rescan", self.resource_dir)])
+
+        generator = JournalGenerator(params={"journal_file": self.journal_file,
+                                             "resource_dir": self.resource_dir,
+                                             "url_prefix": "http://example.com",
+                                             "exclude_dirs": [metadata_dir]})
+        self.assertFalse(generator.reports_changes)
+        executor = IncrementalChangeListExecutor(self.params, generator=generator)
+        executor.execute(generator.generate())
+        generator.commit()
+
+        changelist = executor.read_sitemap(self.params.abs_metadata_path("changelist_0000.xml"), ChangeList())
+        changes = {r.uri: r.change for r in changelist.resources}
+        self.assertEqual(changes, {"http://example.com/b.txt": "updated",
+                                   "http://example.com/c.txt": "deleted"})
+        self.assertFalse(journal.needs_rescan())
+        self.assertTrue(generator.reports_changes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from resync import Resource
+
+from resourcesync.batch import PublicationCounter
+from resourcesync.core.executors import ExecutorEvent
+from resourcesync.executor.resourcelist import ResourceListExecutor
+from resourcesync.parameters.parameters import Parameters
+from resourcesync.utils.observe import EventLogger, EventPrinter, MetricsObserver, Observable, Observer
+
+
+class Recorder(Observer):
+
+    def __init__(self, *events):
+        self.events = events
+        self.informed = []
+        self.batches = 0
+        self.threads = set()
+
+    def accepts(self, event):
+        return event in self.events
+
+    def inform(self, *args, **kwargs):
+        self.threads.add(threading.current_thread())
+        self.informed.append((args[1], kwargs.get("count")))
+
+    def inform_batch(self, events):
+        self.batches += 1
+        Observer.inform_batch(self, events)
+
+    def confirm(self, *args, **kwargs):
+        self.informed.append((args[1], None))
+        return True
+
+
+class ObservableTest(unittest.TestCase):
+
+    def test_accepts(self):
+        observable = Observable()
+        self.assertFalse(observable.has_observers(ExecutorEvent.created_resource))
+        recorder = Recorder(ExecutorEvent.completed_document)
+        observable.register(recorder, EventPrinter(event_level=ExecutorEvent.execution_start.value))
+        self.assertFalse(observable.has_observers(ExecutorEvent.created_resource))
+        self.assertEqual(len(observable.observers_for(ExecutorEvent.completed_document)), 1)
+        self.assertEqual(len(observable.observers_for(ExecutorEvent.execution_end)), 1)
+
+        observable.observers_inform(observable, ExecutorEvent.created_resource, count=1)
+        observable.observers_inform(observable, ExecutorEvent.completed_document, count=2)
+        self.assertEqual(recorder.informed, [(ExecutorEvent.completed_document, 2)])
+
+        observable.unregister_all()
+        self.assertFalse(observable.has_observers(ExecutorEvent.completed_document))
+
+    def test_opt_in(self):
+        observable = Observable()
+        counter = PublicationCounter()
+        observable.register(Observer(), EventPrinter(), EventLogger(logging_level=logging.WARNING), counter)
+        # created_resource is only delivered to observers that accept it by name
+        self.assertFalse(observable.has_observers(ExecutorEvent.created_resource))
+        self.assertEqual(len(observable.observers_for(ExecutorEvent.completed_document)), 4)
+        self.assertNotIn(counter, observable.observers_for(ExecutorEvent.step_end))
+
+        recorder = Recorder(ExecutorEvent.created_resource)
+        observable.register(recorder)
+        self.assertEqual(observable.observers_for(ExecutorEvent.created_resource), [recorder])
+
+    def test_dispatch(self):
+        observable = Observable()
+        recorder = Recorder(ExecutorEvent.created_resource, ExecutorEvent.clear_metadata_directory)
+        observable.register(recorder)
+        observable.start_dispatch(batch_size=100)
+        for count in range(1000):
+            observable.observers_inform(observable, ExecutorEvent.created_resource, count=count)
+        # confirmation events are delivered after the events before them
+        self.assertTrue(observable.observers_confirm(observable, ExecutorEvent.clear_metadata_directory))
+        self.assertEqual(len(recorder.informed), 1001)
+        observable.observers_inform(observable, ExecutorEvent.created_resource, count=1000)
+        observable.stop_dispatch()
+
+        self.assertEqual([count for event, count in recorder.informed if event == ExecutorEvent.created_resource],
+                         list(range(1001)))
+        self.assertEqual(recorder.informed[1000], (ExecutorEvent.clear_metadata_directory, None))
+        self.assertNotIn(threading.current_thread(), recorder.threads)
+        self.assertLess(recorder.batches, 1001)
+
+
+class MetricsObserverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_metrics(self):
+        params = Parameters(resource_dir=self.tmp_dir, metadata_dir="metadata", url_prefix="http://example.com",
+                            max_items_in_list=10)
+        json_path = os.path.join(self.tmp_dir, "report.json")
+        prometheus_path = os.path.join(self.tmp_dir, "resourcesync.prom")
+        metrics = MetricsObserver(json_path=json_path, prometheus_path=prometheus_path)
+        executor = ResourceListExecutor(params)
+        executor.register(metrics)
+        executor.execute(Resource(uri="http://example.com/r/%d" % i, lastmod="2017-06-14T10:00:00Z",
+                                  md5="%032x" % i, length=i + 1, mime_type="text/plain") for i in range(25))
+
+        with open(json_path) as file:
+            report = json.load(file)
+        self.assertEqual(report["executor"], "ResourceListExecutor")
+        self.assertEqual(sorted(report["steps"]),
+                         ["capabilitylist", "description", "generate", "index", "post_process", "prepare"])
+        self.assertEqual(report["resources"], 25)
+        # three resourcelists, the index, capabilitylist and description
+        self.assertEqual(len(report["documents"]), 6)
+        self.assertTrue(all(document["bytes"] > 0 for document in report["documents"]))
+        self.assertEqual(report["documents"][-1]["bytes"], os.path.getsize(params.abs_description_path()))
+        self.assertEqual(report["bytes_written"], sum(document["bytes"] for document in report["documents"]))
+        self.assertGreater(report["resources_per_second"], 0)
+        self.assertGreater(report["peak_rss_bytes"], 0)
+
+        with open(prometheus_path) as file:
+            prometheus = file.read()
+        self.assertIn('resourcesync_resources{executor="ResourceListExecutor"} 25\n', prometheus)
+        self.assertIn('resourcesync_step_wall_seconds{executor="ResourceListExecutor",step="generate"} ',
+                      prometheus)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
 
+from resourcesync.core.publication import StagedParameters
 from resourcesync.parameters.parameters import Parameters
+import os
+import pickle
+import shutil
+import tempfile
 import unittest
 import logging
 
@@ -144,6 +149,52 @@ class ParametersTest(unittest.TestCase):
         with self.assertRaises(TypeError):
             Parameters(has_wellknown_at_root="asssssfasfda")
 
+    def test_derived(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            params = Parameters(resource_dir=tmp_dir, metadata_dir="meta data", url_prefix="http://example.com/a",
+                                has_wellknown_at_root=False, compression_level=0)
+            derived = params.derived()
+            path = params.abs_metadata_path("resourcelist_0001.xml")
+            self.assertEqual(derived.uri_from_path(path), params.uri_from_path(path))
+            self.assertEqual(derived.uri_from_path(path), "http://example.com/a/meta%20data/resourcelist_0001.xml")
+            self.assertEqual(derived.uri_from_path(tmp_dir + "/r/1.txt"), params.uri_from_path(tmp_dir + "/r/1.txt"))
+            self.assertEqual(derived.capabilitylist_url, params.capabilitylist_url())
+            self.assertEqual(derived.description_url, params.description_url())
+            self.assertEqual(derived.abs_document_path("changelist-index"), params.abs_document_path("changelist-index"))
+
+            # a snapshot does not follow changes of parameters
+            params.compression_level = 9
+            self.assertTrue(params.capabilitylist_url().endswith(".xml.gz"))
+            self.assertTrue(derived.capabilitylist_url.endswith(".xml"))
+
+            staged = StagedParameters(params, os.path.join(tmp_dir, ".staging"))
+            derived = staged.derived()
+            staged_path = staged.abs_document_path("resourcelist_0001")
+            self.assertEqual(derived.abs_document_path("resourcelist_0001"), staged_path)
+            self.assertEqual(derived.uri_from_path(staged_path),
+                             "http://example.com/a/meta%20data/resourcelist_0001.xml.gz")
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_freeze(self):
+        params = Parameters(url_prefix="http://example.com/a", max_items_in_list=10, extra_param="x")
+        frozen = params.freeze()
+        self.assertEqual(frozen.max_items_in_list, 10)
+        self.assertEqual(frozen.extra_param, "x")
+        self.assertEqual(frozen.capabilitylist_url(), params.capabilitylist_url())
+        self.assertEqual(frozen.derived().description_url, params.description_url())
+        with self.assertRaises(AttributeError):
+            frozen.max_items_in_list = 20
+        with self.assertRaises(AttributeError):
+            frozen.new_attribute = 20
+
+        params.max_items_in_list = 20
+        self.assertEqual(frozen.max_items_in_list, 10)
+        copy = pickle.loads(pickle.dumps(frozen))
+        self.assertEqual(copy.values(), frozen.values())
+        self.assertIs(type(copy), type(frozen))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+import cProfile
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from resync import Resource
+
+from resourcesync.executor.resourcelist import ResourceListExecutor
+from resourcesync.parameters.parameters import Parameters
+from resourcesync.utils.profiling import collapsed_stacks
+
+
+def leaf(n):
+    return sum(i * i for i in range(n))
+
+
+def branch():
+    return leaf(20000) + leaf(40000)
+
+
+class ProfilingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_collapsed_stacks(self):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        branch()
+        profiler.disable()
+        stacks = collapsed_stacks(pstats.Stats(profiler))
+        leaf_stacks = [stack for stack in stacks if stack.split(";")[-1].endswith(":leaf")]
+        self.assertTrue(leaf_stacks)
+        self.assertTrue(all(stack.split(";")[-2].endswith(":branch") for stack in leaf_stacks))
+
+    def test_profiled_execution(self):
+        params = Parameters(resource_dir=self.tmp_dir, metadata_dir="metadata", url_prefix="http://example.com",
+                            max_items_in_list=10, history_dir="history", is_profiling=True)
+        executor = ResourceListExecutor(params)
+        executor.execute(Resource(uri="http://example.com/r/%d" % i, lastmod="2017-06-14T10:00:00Z",
+                                  md5="%032x" % i, length=i + 1, mime_type="text/plain") for i in range(25))
+        self.assertIsNone(executor.profiler)
+
+        names = os.listdir(params.abs_history_dir())
+        steps = sorted(name.split("_", 1)[1][:-len(".prof")] for name in names if name.endswith(".prof"))
+        self.assertEqual(steps, ["capabilitylist", "description", "generate", "index", "post_process", "prepare"])
+        self.assertEqual(len([name for name in names if name.endswith(".collapsed")]), 6)
+        generate = [name for name in names if name.endswith("_generate.collapsed")][0]
+        with open(os.path.join(params.abs_history_dir(), generate)) as file:
+            self.assertIn("generate_rs_documents", file.read())
+
+    def test_profiles_not_published(self):
+        params = Parameters(resource_dir=self.tmp_dir, metadata_dir="metadata", url_prefix="http://example.com",
+                            is_profiling=True)
+        profile_dir = os.path.join(self.tmp_dir, "profiles")
+        with mock.patch("resourcesync.core.executors.DEFAULT_PROFILE_DIR", profile_dir):
+            ResourceListExecutor(params).execute(iter([]))
+        self.assertEqual(len(os.listdir(profile_dir)), 12)
+        for dir_path, dir_names, file_names in os.walk(params.abs_metadata_dir()):
+            self.assertFalse([name for name in file_names if name.endswith((".prof", ".collapsed"))])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from resync import ChangeList, Resource
+
+from resourcesync.core.catalog import Catalog
+from resourcesync.core.publication import StagedPublication
+from resourcesync.core.sink import write_sitemap
+from resourcesync.executor.changelist import NewChangeListExecutor
+from resourcesync.executor.resourcelist import ResourceListExecutor
+from resourcesync.parameters.parameters import Parameters
+from resourcesync.rsxml.sitemap_header import read_header, write_header
+from resourcesync.rsxml.sitemap_reader import SitemapReader
+
+
+def resources(count, version=0, fail_at=None):
+    for i in range(count):
+        if i == fail_at:
+            raise IOError("resource %d not readable" % i)
+        yield Resource(uri="http://example.com/r/%d" % i, lastmod="2017-06-14T10:00:00Z",
+                       md5="%032x" % (i + version), length=i, mime_type="text/plain")
+
+
+class StagedPublicationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def parameters(self, **kwargs):
+        return Parameters(resource_dir=self.tmp_dir, metadata_dir="metadata", url_prefix="http://example.com",
+                          max_items_in_list=10, has_wellknown_at_root=False, **kwargs)
+
+    def published(self, params):
+        metadata_dir = params.abs_metadata_dir()
+        return sorted(os.path.relpath(os.path.join(dir_path, file_name), metadata_dir)
+                      for dir_path, dir_names, file_names in os.walk(metadata_dir) for file_name in file_names)
+
+    def assert_no_staging_urls(self, params):
+        for rel_path in self.published(params):
+            with open(os.path.join(params.abs_metadata_dir(), rel_path), "rb") as file:
+                content = file.read()
+                self.assertNotIn(b".staging-", content)
+                self.assertNotIn(b".gen-", content)
+
+    def test_rename_publication(self):
+        params = self.parameters(is_staging_publication=False)
+        ResourceListExecutor(params).execute(resources(25))
+        NewChangeListExecutor(params).execute(resources(30, version=1))
+        ResourceListExecutor(params).execute(resources(5))
+        expected = self.published(params)
+
+        shutil.rmtree(params.abs_metadata_dir())
+        params = self.parameters(is_staging_publication=True)
+        ResourceListExecutor(params).execute(resources(25))
+        NewChangeListExecutor(params).execute(resources(30, version=1))
+        self.assertIn("changelist_0000.xml", self.published(params))
+        ResourceListExecutor(params).execute(resources(5))
+
+        self.assertEqual(self.published(params), expected)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ["metadata"])
+        self.assert_no_staging_urls(params)
+        self.assertEqual(len(Catalog(params.abs_metadata_dir()).paths("resourcelist")), 1)
+
+    def test_failed_execution_leaves_metadata_dir(self):
+        params = self.parameters(is_staging_publication=True)
+        ResourceListExecutor(params).execute(resources(25))
+        expected = {rel_path: open(os.path.join(params.abs_metadata_dir(), rel_path), "rb").read()
+                    for rel_path in self.published(params)}
+
+        with self.assertRaises(IOError):
+            ResourceListExecutor(params).execute(resources(25, fail_at=15))
+        self.assertEqual({rel_path: open(os.path.join(params.abs_metadata_dir(), rel_path), "rb").read()
+                          for rel_path in self.published(params)}, expected)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ["metadata"])
+
+    def test_staged_documents_are_linked(self):
+        params = self.parameters(is_staging_publication=True)
+        ResourceListExecutor(params).execute(resources(25))
+        NewChangeListExecutor(params).execute(resources(30, version=1))
+        expected = {rel_path: open(os.path.join(params.abs_metadata_dir(), rel_path), "rb").read()
+                    for rel_path in self.published(params)}
+
+        publication = StagedPublication(params)
+        try:
+            staged = publication.parameters
+            path = staged.abs_metadata_path("changelist_0000.xml")
+            published = params.abs_metadata_path("changelist_0000.xml")
+            self.assertTrue(os.path.samefile(path, published))
+            header = read_header(path)
+            header.md["md_until"] = "2017-06-14T11:00:00Z"
+            write_header(path, header)
+            write_sitemap(SitemapReader().read(path, resources=ChangeList()), staged.abs_metadata_path("changelist_0001.xml"))
+            self.assertFalse(os.path.samefile(path, published))
+            self.assertEqual({rel_path: open(os.path.join(params.abs_metadata_dir(), rel_path), "rb").read()
+                              for rel_path in self.published(params)}, expected)
+        finally:
+            publication.discard()
+
+    def test_symlink_publication(self):
+        os.mkdir(os.path.join(self.tmp_dir, "first"))
+        os.symlink("first", os.path.join(self.tmp_dir, "metadata"))
+        params = self.parameters(is_staging_publication=True)
+
+        ResourceListExecutor(params).execute(resources(25))
+        first_generation = os.readlink(params.abs_metadata_dir())
+        self.assertTrue(first_generation.startswith("metadata.gen-"))
+        # directories not created by a publication are kept
+        self.assertTrue(os.path.isdir(os.path.join(self.tmp_dir, "first")))
+
+        NewChangeListExecutor(params).execute(resources(30, version=1))
+        self.assertNotEqual(os.readlink(params.abs_metadata_dir()), first_generation)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, first_generation)))
+        self.assertIn("resourcelist_0002.xml", self.published(params))
+        self.assertIn("changelist_0002.xml", self.published(params))
+        self.assert_no_staging_urls(params)
+        self.assertEqual(len(os.listdir(self.tmp_dir)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from resync import Resource, ResourceList
+
+from resourcesync.core.catalog import Catalog
+from resourcesync.core.executors import ExecutorEvent
+from resourcesync.core.shards import STATE_FIELDS, ShardSpill, resource_from_state, resource_state, shard_of
+from resourcesync.executor.resourcelist import ShardedResourceListExecutor
+from resourcesync.parameters.parameters import Parameters
+from resourcesync.rsxml.sitemap_reader import SitemapReader
+from resourcesync.utils.observe import Observer
+
+
+def resources(count, changed=()):
+    for i in range(count):
+        resource = Resource(uri="http://example.com/r/%d" % i, lastmod="2017-06-14T10:00:00Z",
+                            md5="%032x" % (i + (1 if i in changed else 0)), length=i, mime_type="text/plain")
+        if i % 7 == 0:
+            resource.ln = [{"rel": "describedby", "href": "http://example.com/d/%d" % i}]
+        yield resource
+
+
+class DocumentRecorder(Observer):
+
+    def __init__(self):
+        self.completed = []
+
+    def inform(self, *args, **kwargs):
+        if args[1] == ExecutorEvent.completed_document and kwargs["sitemap_data"].capability_name == "resourcelist":
+            self.completed.append(kwargs["sitemap_data"].ordinal)
+
+
+class ShardsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.params = Parameters(resource_dir=self.tmp_dir, metadata_dir="metadata", url_prefix="http://example.com",
+                                 max_items_in_list=50, resourcelist_shards=8)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def execute(self, resource_metadata):
+        executor = ShardedResourceListExecutor(self.params)
+        recorder = DocumentRecorder()
+        executor.register(recorder)
+        executor.execute(resource_metadata)
+        return recorder.completed
+
+    def test_spill(self):
+        expected = list(resources(100))
+        with ShardSpill(3, directory=self.tmp_dir, batch_size=10) as spill:
+            for resource in reversed(expected):
+                spill.add(shard_of(resource.uri, 3), resource)
+            spilled = [resource_from_state(state) for shard in range(3) for state in spill.states(shard)]
+            self.assertEqual(len(os.listdir(spill.spill_dir)), 3)
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+        self.assertEqual(sorted(spilled, key=lambda r: r.uri), sorted(expected, key=lambda r: r.uri))
+        for resource in spilled:
+            self.assertEqual(resource.ln, expected[int(resource.length)].ln)
+
+    def test_resource_state(self):
+        resource = Resource(uri="http://example.com/r/0", lastmod="2017-06-14T10:00:00Z", md5="%032x" % 0,
+                            sha256="%064x" % 0, length=0, change="updated", datetime="2017-06-15T10:00:00Z",
+                            md_at="2017-06-16T10:00:00Z", path="/r/0")
+        restored = resource_from_state(resource_state(resource))
+        for field in STATE_FIELDS:
+            self.assertEqual(getattr(restored, field), getattr(resource, field), field)
+
+    def test_only_changed_shards_are_written(self):
+        self.assertEqual(self.execute(resources(100)), [0, 1, 2, 3, 4, 5, 6, 7, -1])
+        catalog = Catalog(self.params.abs_metadata_dir())
+        for path in catalog.paths("resourcelist"):
+            shard = catalog.entry(path)["ordinal"]
+            for resource in SitemapReader().iter_resources(path):
+                self.assertEqual(shard_of(resource.uri, 8), shard)
+
+        # the order in which resources are generated does not matter
+        self.assertEqual(self.execute(reversed(list(resources(100)))), [-1])
+        changed_shard = shard_of("http://example.com/r/42", 8)
+        self.assertEqual(self.execute(resources(100, changed=(42,))), [changed_shard, -1])
+
+        catalog = Catalog(self.params.abs_metadata_dir())
+        self.assertEqual(len(catalog.paths("resourcelist")), 8)
+        index = SitemapReader().read(catalog.index_path("resourcelist"), ResourceList())
+        self.assertEqual(len(index), 8)
+        uris = {resource.uri: resource for path in catalog.paths("resourcelist")
+                for resource in SitemapReader().iter_resources(path)}
+        self.assertEqual(len(uris), 100)
+        self.assertEqual(uris["http://example.com/r/42"].md5, "%032x" % 43)
+
+    def test_shard_too_large(self):
+        self.params.resourcelist_shards = 1
+        with self.assertRaises(ValueError):
+            self.execute(resources(60))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from resync import Resource, ResourceList
+
+from resourcesync.core.executors import ExecutorEvent
+from resourcesync.core.sink import DocumentSink, ProcessPoolDocumentSink, write_sitemap
+from resourcesync.executor.resourcelist import ResourceListExecutor
+from resourcesync.parameters.parameters import Parameters
+from resourcesync.utils.observe import Observer
+
+
+def resources(count):
+    for i in range(count):
+        yield Resource(uri="http://example.com/r/%d?a=1&b=2" % i, lastmod="2017-06-14T10:%02d:00Z" % (i % 60),
+                       md5="%032x" % i, length=i, mime_type="text/plain")
+
+
+class EventRecorder(Observer):
+
+    def __init__(self):
+        self.saved = []
+
+    def inform(self, *args, **kwargs):
+        if args[1] == ExecutorEvent.completed_document:
+            self.saved.append((kwargs["sitemap_data"].ordinal, kwargs["sitemap_data"].document_saved))
+
+
+class DocumentSinkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def resourcelist(self, start):
+        resourcelist = ResourceList()
+        resourcelist.md_at = "2017-06-14T10:00:00Z"
+        for resource in resources(start + 50):
+            if int(resource.length) >= start:
+                resourcelist.add(resource)
+        return resourcelist
+
+    def test_process_pool_output_is_identical(self):
+        for pretty_xml in (True, False):
+            paths = []
+            with DocumentSink(lambda sitemap, path: write_sitemap(sitemap, path, pretty_xml=pretty_xml)) as sink:
+                for i in range(4):
+                    path = os.path.join(self.tmp_dir, "sync_%d.xml" % i)
+                    sink.submit(self.resourcelist(i * 50), path)
+                    paths.append(path)
+            completed = []
+            with ProcessPoolDocumentSink(2, writer_options={"pretty_xml": pretty_xml}, max_pending=2) as sink:
+                for i in range(4):
+                    sink.submit(self.resourcelist(i * 50), os.path.join(self.tmp_dir, "pool_%d.xml" % i),
+                                on_saved=lambda i=i: completed.append(i))
+            self.assertEqual(completed, [0, 1, 2, 3])
+            for i, path in enumerate(paths):
+                with open(path, "rb") as sync_file, open(os.path.join(self.tmp_dir, "pool_%d.xml" % i), "rb") as f:
+                    self.assertEqual(sync_file.read(), f.read())
+
+    def test_executor_with_serialization_workers(self):
+        params = Parameters(resource_dir=self.tmp_dir, metadata_dir="metadata", url_prefix="http://example.com",
+                            max_items_in_list=10, max_serialization_workers=2)
+        executor = ResourceListExecutor(params)
+        recorder = EventRecorder()
+        executor.register(recorder)
+        executor.execute(resources(35))
+
+        self.assertEqual(recorder.saved[:4], [(0, True), (1, True), (2, True), (3, True)])
+        for ordinal in range(4):
+            path = params.abs_metadata_path("resourcelist_%04d.xml" % ordinal)
+            self.assertIn(b'rel="index"', open(path, "rb").read())
+        self.assertTrue(os.path.exists(params.abs_metadata_path("resourcelist-index.xml")))
+        self.assertTrue(isinstance(executor.document_sink, DocumentSink))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from resync import ChangeList, Resource
+
+from resourcesync.rsxml.sitemap_header import read_header, write_header
+from resourcesync.rsxml.sitemap_writer import SitemapWriter
+
+
+def create_changelist(count, md_until=None, index=None):
+    changelist = ChangeList()
+    changelist.md_from = "2017-06-14T10:00:00Z"
+    if md_until:
+        changelist.md_until = md_until
+    changelist.link_set(rel="up", href="http://example.com/capabilitylist.xml")
+    if index:
+        changelist.link_set(rel="index", href=index)
+    for i in range(count):
+        changelist.add(Resource(uri="http://example.com/r/%d" % i, lastmod="2017-06-14T10:00:00Z",
+                                md5="%032x" % i, length=i, change="updated"))
+    return changelist
+
+
+class SitemapHeaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "changelist_0000.xml")
+        self.expected_path = os.path.join(self.tmp_dir, "expected.xml")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def read(self, path):
+        with open(path, "rb") as file:
+            return file.read()
+
+    def test_patch_is_same_as_rewrite(self):
+        for count in (0, 3000):
+            for writer in (SitemapWriter(pretty_xml=True), SitemapWriter(), SitemapWriter(indent=2)):
+                writer.write(create_changelist(count), self.path)
+                header = read_header(self.path)
+                header.md["md_until"] = "2017-06-15T10:00:00Z"
+                header.link_set(rel="index", href="http://example.com/changelist-index.xml")
+                write_header(self.path, header)
+
+                writer.write(create_changelist(count, md_until="2017-06-15T10:00:00Z",
+                                               index="http://example.com/changelist-index.xml"),
+                             self.expected_path)
+                self.assertEqual(self.read(self.path), self.read(self.expected_path))
+
+    def test_patch_resync_document(self):
+        changelist = create_changelist(10)
+        changelist.pretty_xml = True
+        changelist.write(self.path)
+        header = read_header(self.path)
+        header.md["md_until"] = "2017-06-15T10:00:00Z"
+        write_header(self.path, header)
+
+        expected = create_changelist(10, md_until="2017-06-15T10:00:00Z")
+        expected.pretty_xml = True
+        expected.write(self.expected_path)
+        self.assertEqual(self.read(self.path), self.read(self.expected_path))
+
+    def test_patch_in_place(self):
+        SitemapWriter().write(create_changelist(10, md_until="2017-06-15T10:00:00Z"), self.path)
+        inode = os.stat(self.path).st_ino
+        header = read_header(self.path)
+        header.md["md_until"] = "2017-06-16T10:00:00Z"
+        write_header(self.path, header)
+        self.assertEqual(os.stat(self.path).st_ino, inode)
+        self.assertEqual(read_header(self.path).md_until, "2017-06-16T10:00:00Z")
+        self.assertEqual(os.listdir(self.tmp_dir), ["changelist_0000.xml"])
+
+
+if __name__ == "__main__":
+    unittest.main()
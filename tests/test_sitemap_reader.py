@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+
+from resync import ChangeList, Resource
+from resync.sitemap import Sitemap, SitemapIndexError, SitemapParseError
+from resync.w3c_datetime import str_to_datetime
+
+from resourcesync.rsxml.sitemap_reader import SitemapReader, SitemapHeader, w3c_timestamp
+from resourcesync.rsxml.sitemap_writer import SitemapWriter
+
+
+def create_changelist(count):
+    changelist = ChangeList()
+    changelist.md_from = "2017-06-14T10:00:00Z"
+    changelist.link_set(rel="up", href="http://example.com/capabilitylist.xml")
+    changelist.link_set(rel="index", href="http://example.com/changelist-index.xml")
+    for i in range(count):
+        resource = Resource(uri="http://example.com/r/%d?a=1&b=2" % i, lastmod="2017-06-14T10:00:00Z",
+                            md5="%032x" % i, length=i, mime_type="text/plain",
+                            change=("created", "updated", "deleted")[i % 3])
+        if i % 5 == 0:
+            resource.ln = [{"rel": "describedby", "href": "http://example.com/d/%d" % i}]
+        changelist.add(resource)
+    return changelist
+
+
+class SitemapReaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "changelist.xml")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_same_as_resync(self):
+        SitemapWriter(pretty_xml=True).write(create_changelist(20), self.path)
+        with open(self.path) as file:
+            expected = Sitemap().parse_xml(file, resources=ChangeList())
+        changelist = SitemapReader().read(self.path, ChangeList())
+
+        self.assertEqual(changelist.md, expected.md)
+        self.assertEqual(changelist.ln, expected.ln)
+        self.assertEqual(len(changelist), 20)
+        for resource, expected_resource in zip(changelist, expected):
+            self.assertEqual(resource, expected_resource)
+            self.assertEqual(resource.change, expected_resource.change)
+            self.assertEqual(resource.ln, expected_resource.ln)
+
+    def test_w3c_timestamp(self):
+        for value in ("2017-06-14T10:00:00Z", "2016-02-29T23:59:59Z", "2017-06-14", "2017-06-14T10:00:00.5Z",
+                      "2017-06-14T10:00+02:00"):
+            self.assertEqual(w3c_timestamp(value), str_to_datetime(value))
+        with self.assertRaises(ValueError):
+            w3c_timestamp("2017-02-30T10:00:00Z")
+
+    def test_read_checks(self):
+        SitemapWriter().write(create_changelist(2), self.path)
+        with self.assertRaises(SitemapIndexError):
+            SitemapReader().read(self.path, sitemapindex=True)
+        with self.assertRaises(SitemapParseError):
+            SitemapReader().read(self.path, capability="resourcelist")
+        with self.assertRaises(SitemapParseError):
+            SitemapReader().read(io.StringIO("<?xml version='1.0'?><html />"))
+
+    def test_read_header_only(self):
+        SitemapWriter(pretty_xml=True).write(create_changelist(5000), self.path)
+        # entries after the header are not parsed
+        with open(self.path, "a") as file:
+            file.write("<url>broken")
+
+        header = SitemapReader().read_header(self.path)
+        self.assertFalse(header.sitemapindex)
+        self.assertEqual(header.capability, "changelist")
+        self.assertEqual(header.md_from, "2017-06-14T10:00:00Z")
+        self.assertIsNone(header.md_until)
+        self.assertEqual(header.link_href("index"), "http://example.com/changelist-index.xml")
+        with self.assertRaises(Exception):
+            list(SitemapReader().iter_resources(self.path))
+
+    def test_iter_resources_in_constant_memory(self):
+        SitemapWriter().write(create_changelist(3000), self.path)
+        header = SitemapHeader()
+        tracemalloc.start()
+        try:
+            count = 0
+            for resource in SitemapReader().iter_resources(self.path, header=header):
+                count += 1
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(count, 3000)
+        self.assertEqual(header.capability, "changelist")
+        self.assertLess(peak, 2**19)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from resync import CapabilityList, ChangeList, Resource, ResourceDump, ResourceList, SourceDescription
+from resync.sitemap import Sitemap
+
+from resourcesync.rsxml.sitemap_writer import SitemapWriter
+
+
+def create_sitemap(cls, count, **kwargs):
+    sitemap = cls(**kwargs)
+    sitemap.md_at = "2017-06-14T10:00:00Z"
+    sitemap.link_set(rel="up", href="http://example.com/capabilitylist.xml?a=1&b=2")
+    for i in range(count):
+        resource = Resource(uri="http://example.com/r/%d?a=1&b=<2>" % i, length=i,
+                            lastmod="2017-06-14T10:%02d:00Z" % i if i % 3 else None,
+                            md5="%032x" % i if i % 2 else None,
+                            mime_type="text/plain" if i % 4 else None)
+        if i % 5 == 0:
+            resource.ln = [{"rel": "describedby", "href": "http://example.com/d/%d\t\"x\"" % i}]
+        if cls is ChangeList:
+            resource.change = ("created", "updated", "deleted")[i % 3]
+            resource.datetime = "2017-06-15T10:%02d:00Z" % i
+        if i % 7 == 6:
+            resource.md_at = "2017-06-14T11:00:00Z"
+        sitemap.add(resource)
+    return sitemap
+
+
+class SitemapWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def assertSameAsResync(self, create, pretty_xml):
+        expected_path = os.path.join(self.tmp_dir, "expected.xml")
+        path = os.path.join(self.tmp_dir, "written.xml")
+        expected = create()
+        expected.pretty_xml = pretty_xml
+        expected.write(expected_path)
+        SitemapWriter(pretty_xml=pretty_xml, batch_size=3).write(create(), path)
+        with open(expected_path, "rb") as expected_file, open(path, "rb") as file:
+            self.assertEqual(expected_file.read(), file.read())
+
+    def test_same_as_resync(self):
+        for cls in (ResourceList, ChangeList, ResourceDump, SourceDescription):
+            for pretty_xml in (True, False):
+                for sitemapindex in (False, True):
+                    def create():
+                        sitemap = create_sitemap(cls, 12)
+                        sitemap.sitemapindex = sitemapindex
+                        return sitemap
+                    self.assertSameAsResync(create, pretty_xml)
+
+    def test_same_as_resync_special_cases(self):
+        for pretty_xml in (True, False):
+            self.assertSameAsResync(lambda: create_sitemap(ChangeList, 0), pretty_xml)
+            self.assertSameAsResync(lambda: create_sitemap(ChangeList, 6, spec_version="1.0"), pretty_xml)
+            self.assertSameAsResync(lambda: create_sitemap(ChangeList, 6, add_lastmod=True), pretty_xml)
+
+            def capabilitylist():
+                capabilitylist = CapabilityList()
+                capabilitylist.add(Resource(uri="http://example.com/changelist.xml", capability="changelist"))
+                capabilitylist.add(Resource(uri="http://example.com/resourcelist.xml", capability="resourcelist"))
+                return capabilitylist
+            self.assertSameAsResync(capabilitylist, pretty_xml)
+
+    def test_falls_back_for_multifile_lists(self):
+        resourcelist = create_sitemap(ResourceList, 3)
+        resourcelist.max_sitemap_entries = 2
+        self.assertFalse(SitemapWriter.supports(resourcelist))
+        self.assertTrue(SitemapWriter.supports(create_sitemap(ResourceList, 3)))
+
+    def test_indent(self):
+        buffer = io.StringIO()
+        SitemapWriter(indent=2).serialize(create_sitemap(ChangeList, 6), buffer.write)
+        xml = buffer.getvalue()
+        self.assertIn("\n  <url>\n    <loc>http://example.com/r/1?a=1&amp;b=&lt;2&gt;</loc>\n", xml)
+
+        changelist = Sitemap().parse_xml(io.StringIO(xml), resources=ChangeList())
+        expected = create_sitemap(ChangeList, 6)
+        self.assertEqual([r.uri for r in changelist], [r.uri for r in expected])
+        self.assertEqual([r.change for r in changelist], [r.change for r in expected])
+        self.assertEqual(changelist.md_at, expected.md_at)
+
+
+if __name__ == "__main__":
+    unittest.main()
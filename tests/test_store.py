@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import tracemalloc
+import unittest
+
+from resync import Resource
+
+from resourcesync.core.store import ResourceStore, detect_changes
+
+
+def resources(count, md5_format="%032x"):
+    for i in range(count):
+        yield Resource(uri="http://example.com/collection/%03d/item_%d.xml" % (i % 97, i),
+                       lastmod="2017-06-14T10:%02d:%02dZ" % (i // 60 % 60, i % 60), md5=md5_format % i,
+                       length=i, mime_type=("text/plain", "application/xml")[i % 2])
+
+
+class ResourceStoreTest(unittest.TestCase):
+
+    def test_mapping(self):
+        store = ResourceStore(resources(1000))
+        self.assertEqual(len(store), 1000)
+        for resource in resources(1000):
+            self.assertIn(resource.uri, store)
+            self.assertEqual(store[resource.uri], resource)
+            self.assertEqual(store[resource.uri].lastmod, resource.lastmod)
+            self.assertEqual(store[resource.uri].mime_type, resource.mime_type)
+        self.assertEqual(list(store), [resource.uri for resource in resources(1000)])
+        self.assertNotIn("http://example.com/collection/000/item_1000.xml", store)
+
+        uri = "http://example.com/collection/001/item_1.xml"
+        store.add(Resource(uri=uri, md5="c2RmZ2hqa2w7Jy4vLC5tbg==", length=None))
+        self.assertEqual(len(store), 1000)
+        self.assertEqual(store[uri].md5, "c2RmZ2hqa2w7Jy4vLC5tbg==")
+        self.assertIsNone(store[uri].length)
+        self.assertIsNone(store[uri].lastmod)
+        del store[uri]
+        self.assertNotIn(uri, store)
+        self.assertEqual(len(store), 999)
+        with self.assertRaises(KeyError):
+            del store[uri]
+        store.add(Resource(uri=uri, md5="not an md5", path="/data/item_1.xml"))
+        self.assertEqual(store[uri].md5, "not an md5")
+        self.assertEqual(store[uri].path, "/data/item_1.xml")
+        self.assertEqual(list(store)[-1], uri)
+        self.assertEqual(sum(1 for _ in store.values()), 1000)
+
+    def test_detect_changes(self):
+        previous = ResourceStore(resources(10))
+        previous.add(Resource(uri="http://example.com/no_md5", lastmod="2017-06-14T10:00:00Z", length=3))
+        current = list(resources(9))
+        # the same digest, base64 encoded
+        current[1] = Resource(uri=current[1].uri, md5="AAAAAAAAAAAAAAAAAAAAAQ==", length=1)
+        current[2] = Resource(uri=current[2].uri, md5="%032x" % 200, length=2)
+        # the md5 is missing, length and lastmod did not change
+        current[3] = Resource(uri=current[3].uri, lastmod="2017-06-14T10:00:03Z", length=3)
+        current.append(Resource(uri="http://example.com/no_md5", lastmod="2017-06-14T10:00:00Z", length=3))
+        current.append(Resource(uri="http://example.com/new", md5="%032x" % 300))
+
+        all_changes, unchanged = detect_changes(previous, current)
+        self.assertEqual([r.uri for r in all_changes["created"]], ["http://example.com/new"])
+        self.assertEqual([r.uri for r in all_changes["updated"]], [current[2].uri, current[3].uri])
+        self.assertEqual([r.uri for r in all_changes["deleted"]], ["http://example.com/collection/009/item_9.xml"])
+        self.assertIsNone(all_changes["deleted"][0].lastmod)
+        self.assertEqual(unchanged, 8)
+
+        all_changes, unchanged = detect_changes(previous, current, lenient=True)
+        self.assertEqual([r.uri for r in all_changes["updated"]], [current[2].uri])
+        self.assertEqual(unchanged, 9)
+
+    def test_memory(self):
+        tracemalloc.start()
+        try:
+            start = tracemalloc.get_traced_memory()[0]
+            state = {resource.uri: resource for resource in resources(5000)}
+            dict_size = tracemalloc.get_traced_memory()[0] - start
+            del state
+            start = tracemalloc.get_traced_memory()[0]
+            store = ResourceStore(resources(5000))
+            store_size = tracemalloc.get_traced_memory()[0] - start
+        finally:
+            tracemalloc.stop()
+        self.assertLess(store_size * 3, dict_size)
+        self.assertEqual(len(store), 5000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import shutil
+import tempfile
+import unittest
+
+from resync import Resource, ResourceList
+
+from resourcesync.core.executors import ExecutorEvent
+from resourcesync.core.validation import ResourceValidator, SAMPLE_INTERVAL
+from resourcesync.executor.resourcelist import ResourceListExecutor
+from resourcesync.parameters.enum import ValidationMode
+from resourcesync.parameters.parameters import Parameters
+from resourcesync.rsxml.sitemap_reader import SitemapReader
+from resourcesync.utils.observe import Observer
+
+
+def resources(count):
+    for i in range(count):
+        # every third resource has no mime_type, every fifth no md5
+        yield Resource(uri="http://example.com/r/%d" % i, lastmod="2017-06-14T10:00:00Z",
+                       md5=None if i % 5 == 0 else "%032x" % i, length=i + 1,
+                       mime_type=None if i % 3 == 0 else "text/plain")
+
+
+class EventRecorder(Observer):
+
+    def __init__(self):
+        self.validation = None
+
+    def inform(self, *args, **kwargs):
+        if args[1] == ExecutorEvent.execution_end:
+            self.validation = kwargs["validation"]
+
+
+class ValidationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.params = Parameters(resource_dir=self.tmp_dir, metadata_dir="metadata", url_prefix="http://example.com",
+                                 max_items_in_list=50)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def execute(self, mode, count=30):
+        self.params.validation_mode = mode
+        executor = ResourceListExecutor(self.params)
+        recorder = EventRecorder()
+        executor.register(recorder)
+        executor.execute(resources(count))
+        published = SitemapReader().read(self.params.abs_metadata_path("resourcelist_0000.xml"), ResourceList())
+        return recorder.validation, len(published)
+
+    def test_modes(self):
+        with self.assertLogs("resourcesync.core.validation", level="WARNING") as logs:
+            validation, published = self.execute("aggregate")
+        self.assertEqual(len(logs.output), 1)
+        self.assertEqual(validation, {"mode": "aggregate", "checked": 30, "rejected": 0,
+                                      "violations": {"mime_type": 10, "md5": 6}})
+        self.assertEqual(published, 30)
+
+        validation, published = self.execute(ValidationMode.strict)
+        self.assertEqual(validation["rejected"], 14)
+        self.assertEqual(published, 16)
+
+        validation, published = self.execute(0)
+        self.assertEqual(validation["checked"], 0)
+        self.assertEqual(published, 30)
+
+        self.assertEqual(Parameters().validation_mode, ValidationMode.sample)
+        with self.assertRaises(ValueError):
+            self.params.validation_mode = "lenient"
+
+    def test_sample(self):
+        validator = ResourceValidator(ValidationMode.sample)
+        counts = [count for count, resource in validator.validate(resources(2 * SAMPLE_INTERVAL + 1), count=5)]
+        self.assertEqual(counts, list(range(6, 2 * SAMPLE_INTERVAL + 7)))
+        self.assertEqual(validator.checked, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()